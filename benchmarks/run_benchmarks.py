@@ -0,0 +1,290 @@
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+from queue import Empty
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from setup.analysis import EcommerceAnalyzer
+from setup.data_generators import DEFAULT_BATCH_SIZE, DataGenerator
+from setup.database import EcommerceDatabase
+from setup.fixtures import FixtureCache
+
+
+SIZES = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000, "100m": 100_000_000}
+
+ANALYSES = [
+    "analyze_discount_effectiveness",
+    "analyze_product_popularity",
+    "analyze_geo_performance",
+    "analyze_discount_tier_profitability"
+]
+
+# Run settings that change the data or schema; timings are only comparable when they match
+COMPARABLE_META = ["analytics_schema", "seed", "batch_size", "fixture", "population"]
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB"""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def timed(results, step, rows, func, *args, **kwargs):
+    """Run one benchmark step with its output suppressed and record the measurements"""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        value = func(*args, **kwargs)
+    seconds = time.perf_counter() - start
+    
+    results.append({
+        "step": step,
+        "seconds": seconds,
+        "rows": rows,
+        "rows_per_second": rows / seconds if rows and seconds else None,
+        "peak_rss_mb": peak_rss_mb()
+    })
+    print(f"   {step:<40} {seconds:10.3f} s")
+    return value
+
+
+def benchmark_size(size_name, num_transactions, analytics_schema, seed, use_fixture, population, queue):
+    """Build one database and time every step (runs in a child process so RSS is per size)"""
+    results = []
+    random.seed(seed)
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_name = os.path.join(tmp_dir, "bench.db")
+        
+        if use_fixture:
+            # Only the analyses are timed; the database comes from the fixture cache
+            timed(results, "restore_fixture", num_transactions, FixtureCache().restore,
+                  db_name, seed, num_transactions, analytics_schema=analytics_schema)
+        else:
+            build_and_time(results, db_name, num_transactions, analytics_schema, seed, population)
+        
+        analyzer = EcommerceAnalyzer(db_name)
+        for name in ANALYSES:
+            timed(results, name, num_transactions, getattr(analyzer, name))
+        timed(results, "run_all_analyses", num_transactions, analyzer.run_all_analyses)
+        timed(results, "run_all_analyses_fused", num_transactions, analyzer.run_all_analyses, fused=True)
+        analyzer.close()
+    
+    for result in results:
+        result["size"] = size_name
+        result["transactions"] = num_transactions
+    queue.put(results)
+
+
+def build_and_time(results, db_name, num_transactions, analytics_schema, seed, population):
+    """Create and fill the database, timing each generation and load step
+    
+    population holds users, products_per_tier (0 = the small fixed sets) and the
+    user_skew, product_skew and seasonality of the generator.
+    """
+    db = EcommerceDatabase(db_name)
+    with contextlib.redirect_stdout(io.StringIO()):
+        db.connect()
+    timed(results, "create_tables", 0, db.create_tables, analytics_schema=analytics_schema)
+    
+    generator = DataGenerator(db.conn, user_skew=population["user_skew"],
+                              product_skew=population["product_skew"],
+                              seasonality=population["seasonality"])
+    if population["products_per_tier"]:
+        timed(results, "generate_products_vectorized", population["products_per_tier"] * 3,
+              generator.generate_products_vectorized, population["products_per_tier"], seed=seed)
+    else:
+        timed(results, "generate_products", 0, generator.generate_products)
+    if population["users"]:
+        timed(results, "generate_users_vectorized", population["users"],
+              generator.generate_users_vectorized, population["users"], seed=seed)
+    else:
+        timed(results, "generate_users", 0, generator.generate_users)
+    
+    with contextlib.redirect_stdout(io.StringIO()):
+        db.begin_bulk_load()
+    timed(results, "generate_transactions_vectorized", num_transactions,
+          generator.generate_transactions_vectorized, num_transactions, seed=seed)
+    timed(results, "end_bulk_load", num_transactions, db.end_bulk_load)
+    with contextlib.redirect_stdout(io.StringIO()):
+        db.close()
+
+
+def meta_mismatches(meta, baseline_meta):
+    """Run settings that differ from the baseline as (name, baseline value, current value)"""
+    return [
+        (name, baseline_meta.get(name), meta.get(name))
+        for name in COMPARABLE_META
+        if baseline_meta.get(name) != meta.get(name)
+    ]
+
+
+def run_size(size_name, args, population):
+    """Benchmark one size in a child process and return its results
+    
+    Raises RuntimeError when the child dies or exits with an error before
+    reporting, or when it takes longer than args.timeout seconds.
+    """
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(
+        target=benchmark_size,
+        args=(size_name, SIZES[size_name], args.analytics_schema, args.seed, args.fixture, population, queue)
+    )
+    process.start()
+    deadline = time.monotonic() + args.timeout if args.timeout else None
+    
+    try:
+        # Poll, so a child killed before reporting (e.g. by the OOM killer) does not hang the run
+        while True:
+            try:
+                results = queue.get(timeout=1)
+                break
+            except Empty:
+                if not process.is_alive():
+                    raise RuntimeError(f"{size_name}: benchmark process exited with code {process.exitcode}")
+                if deadline is not None and time.monotonic() > deadline:
+                    raise RuntimeError(f"{size_name}: no results after {args.timeout} s")
+        
+        process.join()
+        if process.exitcode != 0:
+            raise RuntimeError(f"{size_name}: benchmark process exited with code {process.exitcode}")
+        return results
+    finally:
+        if process.is_alive():
+            process.terminate()
+            process.join()
+
+
+def compare(results, baseline, tolerance):
+    """Print the comparison with a baseline run and return the regressed steps"""
+    previous = {(r["size"], r["step"]): r for r in baseline["results"]}
+    regressions = []
+    
+    print("\n=== Comparison with baseline ===")
+    for result in results:
+        base = previous.get((result["size"], result["step"]))
+        if base is None or not base["seconds"]:
+            continue
+        
+        ratio = result["seconds"] / base["seconds"]
+        marker = ""
+        # Sub-10ms steps are too noisy to gate on
+        if ratio > 1 + tolerance and result["seconds"] > 0.01:
+            marker = "  <-- regression"
+            regressions.append(result)
+        print(f"   {result['size']:>5} {result['step']:<40} {ratio:6.2f}x{marker}")
+    
+    return regressions
+
+
+def main():
+    """Run the benchmark suite"""
+    parser = argparse.ArgumentParser(description="Benchmark generation, load and analysis")
+    parser.add_argument("--sizes", default="10k,1m", help=f"Comma-separated sizes from {', '.join(SIZES)}")
+    parser.add_argument("--analytics-schema", action="store_true", help="Use the indexed analytics schema")
+    parser.add_argument("--seed", type=int, default=42,
+                        help="Generator seed (rows also depend on the generator's batch size)")
+    parser.add_argument("--output", default="benchmarks/results.json", help="Results JSON file")
+    parser.add_argument("--baseline", default="benchmarks/baseline.json", help="Baseline JSON to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--fixture", action="store_true",
+                        help="Restore databases from the fixture cache and time only the analyses")
+    parser.add_argument("--users", type=int, default=0,
+                        help="Generate this many users with the vectorized generator (0 = the fixed ~46)")
+    parser.add_argument("--products-per-tier", type=int, default=0,
+                        help="Generate this many products per tier (0 = one product per tier)")
+    parser.add_argument("--user-skew", type=float, default=0.0, help="Zipf exponent of user selection")
+    parser.add_argument("--product-skew", type=float, default=0.0, help="Zipf exponent of product selection")
+    parser.add_argument("--seasonality", type=float, default=0.0, help="Seasonal amplitude of dates (0-1)")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown before a step counts as a regression")
+    parser.add_argument("--timeout", type=float, default=0,
+                        help="Seconds to wait for the results of one size (0 = no limit)")
+    args = parser.parse_args()
+    
+    population = {
+        "users": args.users,
+        "products_per_tier": args.products_per_tier,
+        "user_skew": args.user_skew,
+        "product_skew": args.product_skew,
+        "seasonality": args.seasonality
+    }
+    if args.fixture and any(population.values()):
+        parser.error("--fixture databases use the default population; drop the population options")
+    
+    # Checked before anything runs, so a typo does not surface after the first sizes finished
+    size_names = [size_name.strip().lower() for size_name in args.sizes.split(",")]
+    unknown = [size_name for size_name in size_names if size_name not in SIZES]
+    if unknown:
+        parser.error(f"unknown --sizes {', '.join(unknown)} (choose from {', '.join(SIZES)})")
+    
+    results = []
+    for size_name in size_names:
+        print(f"\n=== {size_name} transactions ===")
+        
+        try:
+            results.extend(run_size(size_name, args, population))
+        except RuntimeError as e:
+            print(f"\n❌ {e}")
+            return 1
+    
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "analytics_schema": args.analytics_schema,
+            "seed": args.seed,
+            "batch_size": DEFAULT_BATCH_SIZE,
+            "fixture": args.fixture,
+            "population": population
+        },
+        "results": results
+    }
+    
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+    
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        
+        mismatches = meta_mismatches(report["meta"], baseline.get("meta", {}))
+        if mismatches:
+            print(f"\n❌ Baseline {args.baseline} was recorded with other settings; not comparing:")
+            for name, expected, actual in mismatches:
+                print(f"   {name}: baseline {expected!r}, this run {actual!r}")
+            print("   Rerun with matching options or --save-baseline")
+            return 1
+        
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} steps slower than baseline by more than {args.tolerance:.0%}")
+            return 1
+        print("\n✅ No regressions against baseline")
+    
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
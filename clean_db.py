@@ -1,7 +1,15 @@
 import os
+import shutil
 import sqlite3
 import sys
 
+# Файлы, которые SQLite создаёт рядом с базой данных
+SIDECAR_SUFFIXES = ("-wal", "-shm", "-journal")
+
+# Таблицы-описания схемы: при truncate секции остаются, поэтому их описания не очищаем;
+# в deferred_indexes лежат определения индексов, удалённых на время массовой загрузки
+SCHEMA_TABLES = ("transaction_partitions", "partition_template", "deferred_indexes")
+
 def clean_database(db_name="ecommerce.db"):
     """
     Очищает базу данных: удаляет все таблицы и пересоздает их
@@ -34,6 +42,12 @@ def clean_database(db_name="ecommerce.db"):
                     cursor.execute(f"DROP TABLE IF EXISTS {table}")
                     print(f"🗑️  Удалена таблица: {table}")
                 
+                # Представление transactions секционированной схемы ссылается на удалённые таблицы
+                cursor.execute("SELECT name FROM sqlite_master WHERE type='view'")
+                for (view,) in cursor.fetchall():
+                    cursor.execute(f"DROP VIEW IF EXISTS {view}")
+                    print(f"🗑️  Удалено представление: {view}")
+                
                 # Включаем обратно проверку внешних ключей
                 cursor.execute("PRAGMA foreign_keys=ON")
                 
@@ -42,6 +56,10 @@ def clean_database(db_name="ecommerce.db"):
             else:
                 print("ℹ️  Таблицы не найдены")
             
+            # Флаги схемы в user_version относились к удалённым таблицам
+            cursor.execute("PRAGMA user_version = 0")
+            conn.commit()
+            
             conn.close()
             
         else:
@@ -54,19 +72,205 @@ def clean_database(db_name="ecommerce.db"):
     return True
 
 
-def main():
+def remove_database_files(db_name):
+    """
+    Удаляет файл базы данных вместе с -wal/-shm/-journal
+    """
+    removed = []
+    for path in [db_name] + [db_name + suffix for suffix in SIDECAR_SUFFIXES]:
+        if os.path.exists(path):
+            os.remove(path)
+            removed.append(path)
+    return removed
+
+
+def reset_database_file(db_name="ecommerce.db"):
+    """
+    Полный сброс удалением файлов: время не зависит от размера базы
+    """
+    print("🧹 Удаление файлов базы данных...")
+    
+    try:
+        removed = remove_database_files(db_name)
+        for path in removed:
+            print(f"🗑️  Удалён файл: {path}")
+        if not removed:
+            print(f"ℹ️  Файл базы данных {db_name} не найден")
+    except OSError as e:
+        print(f"❌ Ошибка при удалении файлов: {e}")
+        return False
+    
+    return True
+
+
+def truncate_database(db_name="ecommerce.db"):
+    """
+    Очищает все таблицы одной транзакцией, сохраняя схему, индексы (и отложенные в deferred_indexes) и user_version
+    """
+    print("🧹 Очистка таблиц...")
+    
+    if not os.path.exists(db_name):
+        print(f"ℹ️  Файл базы данных {db_name} не найден")
+        return True
+    
+    conn = sqlite3.connect(db_name, isolation_level=None)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'")
+        tables = [row[0] for row in cursor.fetchall() if row[0] not in SCHEMA_TABLES]
+        
+        # DELETE без WHERE (и без триггеров) SQLite выполняет как truncate: страницы
+        # таблицы освобождаются целиком, без построчного удаления
+        cursor.execute("PRAGMA foreign_keys=OFF")
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            for table in tables:
+                cursor.execute(f'DELETE FROM "{table}"')
+            cursor.execute("COMMIT")
+        except sqlite3.Error:
+            cursor.execute("ROLLBACK")
+            raise
+        
+        print(f"✅ Очищено таблиц: {len(tables)}")
+    except sqlite3.Error as e:
+        print(f"❌ Ошибка при очистке таблиц: {e}")
+        return False
+    finally:
+        conn.close()
+    
+    return True
+
+
+def create_template(template_path, analytics_schema=False, integer_cents=False, partitioned=False):
+    """
+    Создаёт пустую базу данных-шаблон с таблицами и индексами
+    """
+    from setup.database import EcommerceDatabase
+    
+    remove_database_files(template_path)
+    db = EcommerceDatabase(template_path)
+    db.connect()
+    db.create_tables(analytics_schema=analytics_schema, integer_cents=integer_cents, partitioned=partitioned)
+    db.close()
+
+
+def swap_in_template(db_name="ecommerce.db", template_path="ecommerce_template.db"):
+    """
+    Заменяет базу данных копией пустого шаблона (атомарно, через os.replace)
+    """
+    print(f"🧹 Замена базы данных шаблоном {template_path}...")
+    
+    if not os.path.exists(template_path):
+        print(f"❌ Шаблон {template_path} не найден")
+        return False
+    
+    try:
+        tmp_path = db_name + ".tmp"
+        shutil.copyfile(template_path, tmp_path)
+        
+        # Старые -wal/-shm относятся к старому файлу и не должны попасть на новый
+        for suffix in SIDECAR_SUFFIXES:
+            if os.path.exists(db_name + suffix):
+                os.remove(db_name + suffix)
+        os.replace(tmp_path, db_name)
+        print(f"✅ База данных {db_name} заменена шаблоном")
+    except OSError as e:
+        print(f"❌ Ошибка при замене базы данных: {e}")
+        return False
+    
+    return True
+
+
+def compact_database(db_name="ecommerce.db", mode="into"):
+    """
+    Сжимает файл базы данных после очистки
+    
+    mode="into" переписывает базу через VACUUM INTO во временный файл и атомарно
+    подменяет исходный; mode="incremental" освобождает свободные страницы через
+    PRAGMA incremental_vacuum (работает только при auto_vacuum=INCREMENTAL).
+    """
+    print("🗜️  Сжатие базы данных...")
+    
+    if not os.path.exists(db_name):
+        print(f"ℹ️  Файл базы данных {db_name} не найден")
+        return True
+    
+    size_before = os.path.getsize(db_name)
+    
+    try:
+        conn = sqlite3.connect(db_name, isolation_level=None)
+        try:
+            if mode == "incremental":
+                auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+                if auto_vacuum != 2:
+                    print("ℹ️  auto_vacuum не INCREMENTAL, incremental_vacuum ничего не освободит")
+                # execute() шагает по PRAGMA без колонок один раз, т.е. освобождает одну страницу
+                conn.executescript("PRAGMA incremental_vacuum")
+                conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+            else:
+                tmp_path = db_name + ".compact"
+                remove_database_files(tmp_path)
+                conn.execute("VACUUM INTO ?", (tmp_path,))
+        finally:
+            conn.close()
+        
+        if mode != "incremental":
+            for suffix in SIDECAR_SUFFIXES:
+                if os.path.exists(db_name + suffix):
+                    os.remove(db_name + suffix)
+            os.replace(tmp_path, db_name)
+    except (sqlite3.Error, OSError) as e:
+        print(f"❌ Ошибка при сжатии базы данных: {e}")
+        return False
+    
+    print(f"✅ Размер файла: {size_before / 1024:.0f} КБ -> {os.path.getsize(db_name) / 1024:.0f} КБ")
+    return True
+
+
+def main(argv=None):
     """Основная функция"""
     import argparse
     
     parser = argparse.ArgumentParser(description='Очистка базы данных e-commerce')
     parser.add_argument('--db', default='ecommerce.db', help='Имя файла базы данных')
     parser.add_argument('--reset', action='store_true', default=False, help='Полная очистка (удаление файла)')
+    parser.add_argument('--truncate', action='store_true', default=False,
+                        help='Очистить таблицы одной транзакцией, сохранив схему и индексы')
+    parser.add_argument('--template', default=None,
+                        help='Заменить базу данных копией пустого шаблона')
+    parser.add_argument('--create-template', default=None,
+                        help='Создать пустой шаблон базы данных по этому пути')
+    parser.add_argument('--analytics-schema', action='store_true', default=False,
+                        help='Создавать шаблон со схемой analytics')
+    parser.add_argument('--integer-cents', action='store_true', default=False,
+                        help='Создавать шаблон с деньгами в целых центах и скидками в базисных пунктах')
+    parser.add_argument('--partitioned', action='store_true', default=False,
+                        help='Создавать шаблон с транзакциями в помесячных секциях')
+    parser.add_argument('--vacuum', choices=['into', 'incremental'], default=None,
+                        help='Сжать файл после очистки (VACUUM INTO или incremental_vacuum)')
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     
     print("=== E-commerce Database Cleaner ===\n")
     
-    success = clean_database(args.db)
+    if args.create_template:
+        create_template(args.create_template, args.analytics_schema, args.integer_cents, args.partitioned)
+        # Без явного действия над --db шаблон создаётся без очистки базы данных
+        if not (args.reset or args.template or args.truncate):
+            print(f"✅ Шаблон {args.create_template} создан")
+            return 0
+    
+    if args.reset:
+        success = reset_database_file(args.db)
+    elif args.template:
+        success = swap_in_template(args.db, args.template)
+    elif args.truncate:
+        success = truncate_database(args.db)
+    else:
+        success = clean_database(args.db)
+    
+    if success and args.vacuum and not args.reset:
+        success = compact_database(args.db, args.vacuum)
     
     if success:
         print("\n✅ Очистка завершена успешно!")
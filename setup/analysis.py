@@ -1,114 +1,581 @@
+import asyncio
 import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pandas as pd
 import os
 
+try:
+    from .approximate import (DEFAULT_SAMPLE_SIZE, SAMPLE_QUERY, SKETCHES_QUERY, STRATA_QUERY,
+                              approximate_report, refresh_sample)
+    from .connection_pool import ReadOnlyPool
+    from .database import (ROLLUP_TABLES_SQL, SCHEMA_PARTITIONED, max_transaction_id, schema_flags,
+                           transaction_partitions)
+    from .queries import (BEHAVIOUR_QUERIES, PRODUCT_COSTS_QUERY, PRODUCTS_QUERY,
+                          ROLLUP_REFRESH_SQL, behaviour_query, check_filters, cube_query,
+                          profit_cube_query, report_query, series_query, unit_sql)
+    from .query_cache import QueryCache, change_token
+except ImportError:
+    from approximate import (DEFAULT_SAMPLE_SIZE, SAMPLE_QUERY, SKETCHES_QUERY, STRATA_QUERY,
+                             approximate_report, refresh_sample)
+    from connection_pool import ReadOnlyPool
+    from database import (ROLLUP_TABLES_SQL, SCHEMA_PARTITIONED, max_transaction_id, schema_flags,
+                          transaction_partitions)
+    from queries import (BEHAVIOUR_QUERIES, PRODUCT_COSTS_QUERY, PRODUCTS_QUERY,
+                         ROLLUP_REFRESH_SQL, behaviour_query, check_filters, cube_query,
+                         profit_cube_query, report_query, series_query, unit_sql)
+    from query_cache import QueryCache, change_token
+
+
+REPORT_TITLES = {
+    "discount_effectiveness": "=== Discount Effectiveness Analysis ===",
+    "product_popularity": "\n=== Product Popularity Analysis ===",
+    "geo_performance": "\n=== Geographic Performance Analysis ===",
+    "discount_tier_profitability": "\n=== Discount Tier Profitability Analysis ==="
+}
+
+PROFIT_TITLES = {
+    "profit_by_discount_tier": "\n=== Profit by Discount Tier ===",
+    "profit_by_geo": "\n=== Profit by Geography ===",
+    "profit_by_product": "\n=== Profit by Product ===",
+    "profit_by_month": "\n=== Profit by Month ==="
+}
+
+BEHAVIOUR_TITLES = {
+    "cohorts": "\n=== Cohort Retention by First-Purchase Month ===",
+    "retention": "\n=== Retention Curve by First Purchase ===",
+    "repeat_intervals": "\n=== Repeat-Purchase Intervals ===",
+    "rfm_segments": "\n=== RFM Segments ==="
+}
+
+# Group-by key of each profit report
+PROFIT_KEYS = {
+    "profit_by_discount_tier": "discount_tier",
+    "profit_by_geo": "geo",
+    "profit_by_product": "product_id",
+    "profit_by_month": "month"
+}
+
+
+def reports_from_cube(cube, products):
+    """Derive the four report DataFrames from a pre-aggregated cube
+    
+    The cube has one row per (product_id, geo, discount_tier, applied_discount) with
+    transaction_count, total_revenue and total_discount_given, so every report is a
+    cheap group-by over a few hundred rows instead of a scan of transactions.
+    """
+    reports = {}
+    cube = cube.assign(discount_sum=cube["applied_discount"] * cube["transaction_count"])
+    
+    # Discount effectiveness
+    category = np.select(
+        [cube["applied_discount"] == 0, cube["applied_discount"] <= 10],
+        ["No Discount", "Low Discount (5-10%)"],
+        "High Discount (15-20%)"
+    )
+    df = (cube.groupby(category)[["transaction_count", "total_revenue"]].sum()
+          .rename_axis("discount_category").reset_index())
+    df["avg_transaction_value"] = df["total_revenue"] / df["transaction_count"]
+    df["revenue_per_transaction"] = df["total_revenue"] / df["transaction_count"]
+    reports["discount_effectiveness"] = df.sort_values("total_revenue", ascending=False, ignore_index=True)
+    
+    # Product popularity
+    df = cube.groupby("product_id")[["transaction_count", "total_revenue"]].sum().reset_index()
+    df = products.merge(df, on="product_id").rename(columns={"transaction_count": "sales_count"})
+    df["avg_price"] = df["total_revenue"] / df["sales_count"]
+    df = df[["name", "tier", "sales_count", "total_revenue", "avg_price"]]
+    reports["product_popularity"] = df.sort_values("sales_count", ascending=False, ignore_index=True)
+    
+    # Geographic performance
+    df = cube.groupby("geo")[["transaction_count", "total_revenue", "discount_sum"]].sum().reset_index()
+    df["avg_transaction_value"] = df["total_revenue"] / df["transaction_count"]
+    df["avg_discount_applied"] = df["discount_sum"] / df["transaction_count"]
+    df = df.drop(columns="discount_sum")
+    reports["geo_performance"] = df.sort_values("total_revenue", ascending=False, ignore_index=True)
+    
+    # Discount tier profitability
+    discounted = cube[cube["applied_discount"] > 0]
+    df = (discounted.groupby("discount_tier")[["transaction_count", "total_revenue", "total_discount_given"]]
+          .sum().reset_index())
+    df["avg_transaction_value"] = df["total_revenue"] / df["transaction_count"]
+    df = df[["discount_tier", "transaction_count", "total_revenue", "avg_transaction_value", "total_discount_given"]]
+    reports["discount_tier_profitability"] = df.sort_values("total_revenue", ascending=False, ignore_index=True)
+    
+    return reports
+
+
+def profit_reports(cube, costs, products):
+    """Derive the profit reports from the monthly profit cube
+    
+    Every transaction sells one unit, so the cost of a cube cell is its
+    transaction_count times the unit production cost, looked up in a
+    product_id-indexed array instead of joining products during the scan.
+    """
+    product_ids = costs["product_id"].to_numpy()
+    unit_cost = np.zeros(int(product_ids.max()) + 1 if len(product_ids) else 1)
+    unit_cost[product_ids] = costs["production_cost"].to_numpy(dtype=np.float64)
+    
+    cube = cube.assign(total_cost=cube["transaction_count"].to_numpy()
+                       * unit_cost[cube["product_id"].to_numpy(dtype=np.int64)])
+    cube["total_profit"] = cube["total_revenue"] - cube["total_cost"]
+    
+    reports = {}
+    for name, key in PROFIT_KEYS.items():
+        df = (cube.groupby(key)[["transaction_count", "total_revenue", "total_cost", "total_profit"]]
+              .sum().reset_index())
+        df["margin_pct"] = df["total_profit"] / df["total_revenue"] * 100
+        
+        if key == "product_id":
+            df = products.merge(df, on="product_id").drop(columns="product_id")
+        if key == "month":
+            reports[name] = df.sort_values("month", ignore_index=True)
+        else:
+            reports[name] = df.sort_values("total_profit", ascending=False, ignore_index=True)
+    
+    return reports
+
+
+def month_number(months):
+    """Months since year 0 of 'YYYY-MM' strings, so that differences count calendar months"""
+    parts = months.str.split("-", expand=True).astype(np.int64)
+    return parts[0] * 12 + parts[1]
+
+
+def cohort_report(activity):
+    """Retention of each first-purchase cohort by months since the first purchase
+    
+    activity has active_users per (cohort, first_purchase, month) as returned by
+    COHORT_QUERY; the cohort size is the number of customers active in month 0.
+    """
+    columns = ["cohort", "months_since_first", "cohort_size", "active_users", "retention_pct"]
+    if activity.empty:
+        return pd.DataFrame(columns=columns)
+    
+    activity = activity.assign(months_since_first=month_number(activity["month"])
+                               - month_number(activity["cohort"]))
+    df = activity.groupby(["cohort", "months_since_first"])["active_users"].sum().reset_index()
+    sizes = df[df["months_since_first"] == 0].set_index("cohort")["active_users"]
+    df["cohort_size"] = df["cohort"].map(sizes)
+    df["retention_pct"] = df["active_users"] / df["cohort_size"] * 100
+    return df[columns]
+
+
+def retention_curve(activity):
+    """Share of customers active N months after their first purchase, by first_purchase
+    
+    Only cohorts old enough to be observed N months later count towards month N,
+    so recent cohorts do not drag the tail of the curve down.
+    """
+    columns = ["first_purchase", "months_since_first", "customers", "active_users", "retention_pct"]
+    if activity.empty:
+        return pd.DataFrame(columns=columns)
+    
+    months = month_number(activity["month"])
+    activity = activity.assign(cohort_number=month_number(activity["cohort"]))
+    activity["months_since_first"] = months - activity["cohort_number"]
+    keys = ["first_purchase", "cohort_number", "months_since_first"]
+    
+    sizes = (activity[activity["months_since_first"] == 0]
+             .rename(columns={"active_users": "customers"})[["first_purchase", "cohort_number", "customers"]])
+    offsets = pd.DataFrame({"months_since_first": np.arange(activity["months_since_first"].max() + 1)})
+    observed = sizes.merge(offsets, how="cross")
+    observed = observed[observed["cohort_number"] + observed["months_since_first"] <= months.max()]
+    
+    df = observed.merge(activity[keys + ["active_users"]], on=keys, how="left").fillna({"active_users": 0})
+    df = (df.groupby(["first_purchase", "months_since_first"])[["customers", "active_users"]]
+          .sum().reset_index())
+    df["retention_pct"] = df["active_users"] / df["customers"] * 100
+    return df[columns]
+
+
 class EcommerceAnalyzer:
-    def __init__(self, db_name="ecommerce.db"):
+    """Discount, product, geo and discount-tier reports over the e-commerce database
+    
+    Every analyze_* method accepts optional filters: start_date, end_date (ISO dates,
+    inclusive), geos, product_tiers and discount_tiers (lists of values).
+    
+    With approximate=True the reports are estimated from a stratified sample and
+    carry 95% confidence half-widths in <column>_ci columns (see setup/approximate.py).
+    
+    On partitioned databases date-filtered reports only read the month partitions
+    inside the requested range.
+    
+    The customer-behaviour reports (cohorts, retention, repeat intervals, RFM) are
+    always exact: they read transactions in (user_id, transaction_date) order, in
+    one scan with SQLite window functions, whatever use_rollups and approximate say.
+    """
+    
+    def __init__(self, db_name="ecommerce.db", use_rollups=False, backend=None,
+                 cache_size=0, cache_dir=None, pool_size=0, approximate=False,
+                 sample_size=DEFAULT_SAMPLE_SIZE, profiler=None):
+        self.db_name = db_name
+        self.pool = None
+        self.executor = None
+        
+        # Connection borrowed from the pool by the current worker thread
+        self._local = threading.local()
+        
+        # Serializes rollup/sample refreshes on the main connection (run from executor threads)
+        self._refresh_lock = threading.Lock()
+        
+        # Answer reports from daily_rollup instead of scanning transactions
+        self.use_rollups = use_rollups
+        
+        # Optional report backend with fetch_cube()/fetch_products() (e.g. ParquetBackend)
+        self.backend = backend
+        
+        # Estimate reports from the maintained stratified sample of sample_size rows per stratum
+        self.approximate = approximate
+        self.sample_size = sample_size
+        
+        # Optional result cache for SQL reads, invalidated when the database changes
+        self.cache = QueryCache(cache_size, cache_dir) if cache_size or cache_dir else None
+        
+        # Optional QueryProfiler recording per-query phase timings and plans
+        self.profiler = profiler
+        
         # Check if database exists
         if not os.path.exists(db_name):
-            print(f"Database {db_name} not found!")
-            print("Please run 'python main.py' first to create the database.")
+            if backend is None:
+                print(f"Database {db_name} not found!")
+                print("Please run 'python main.py' first to create the database.")
             return
         
-        self.db_name = db_name
-        self.conn = sqlite3.connect(db_name)
+        # With a pool the async reports refresh rollups/sample on the main connection from a worker thread
+        self.conn = sqlite3.connect(db_name, check_same_thread=not pool_size)
+        self.flags = schema_flags(self.conn)
+        
+        # Optional read-only connections for running reports concurrently
+        if pool_size:
+            self.pool = ReadOnlyPool(db_name, pool_size)
+            self.executor = ThreadPoolExecutor(max_workers=pool_size)
     
-    def analyze_discount_effectiveness(self):
+    def analyze_discount_effectiveness(self, **filters):
         """Analyze how discounts affect revenue"""
-        query = """
-        SELECT 
-            CASE 
-                WHEN applied_discount = 0 THEN 'No Discount'
-                WHEN applied_discount <= 10 THEN 'Low Discount (5-10%)'
-                ELSE 'High Discount (15-20%)'
-            END as discount_category,
-            COUNT(*) as transaction_count,
-            SUM(final_cost) as total_revenue,
-            AVG(final_cost) as avg_transaction_value,
-            SUM(final_cost) / COUNT(*) as revenue_per_transaction
-        FROM transactions
-        GROUP BY discount_category
-        ORDER BY total_revenue DESC
-        """
-        
-        df = pd.read_sql_query(query, self.conn)
-        print("=== Discount Effectiveness Analysis ===")
-        print(df)
+        df = self._report("discount_effectiveness", filters)
+        self._print_report("discount_effectiveness", df)
         return df
     
-    def analyze_product_popularity(self):
+    def analyze_product_popularity(self, **filters):
         """Analyze most popular products"""
-        query = """
-        SELECT 
-            p.name,
-            p.tier,
-            COUNT(t.transaction_id) as sales_count,
-            SUM(t.final_cost) as total_revenue,
-            AVG(t.final_cost) as avg_price
-        FROM products p
-        JOIN transactions t ON p.product_id = t.product_id
-        GROUP BY p.product_id, p.name, p.tier
-        ORDER BY sales_count DESC
-        """
-        
-        df = pd.read_sql_query(query, self.conn)
-        print("\n=== Product Popularity Analysis ===")
-        print(df)
+        df = self._report("product_popularity", filters)
+        self._print_report("product_popularity", df)
         return df
     
-    def analyze_geo_performance(self):
+    def analyze_geo_performance(self, **filters):
         """Analyze performance by geography"""
-        query = """
-        SELECT 
-            u.geo,
-            COUNT(t.transaction_id) as transaction_count,
-            SUM(t.final_cost) as total_revenue,
-            AVG(t.final_cost) as avg_transaction_value,
-            AVG(t.applied_discount) as avg_discount_applied
-        FROM users u
-        JOIN transactions t ON u.user_id = t.user_id
-        GROUP BY u.geo
-        ORDER BY total_revenue DESC
-        """
-        
-        df = pd.read_sql_query(query, self.conn)
-        print("\n=== Geographic Performance Analysis ===")
-        print(df)
+        df = self._report("geo_performance", filters)
+        self._print_report("geo_performance", df)
         return df
     
-    def analyze_discount_tier_profitability(self):
+    def analyze_discount_tier_profitability(self, **filters):
         """Analyze which discount tiers are most profitable"""
-        query = """
-        SELECT 
-            u.discount_tier,
-            COUNT(t.transaction_id) as transaction_count,
-            SUM(t.final_cost) as total_revenue,
-            AVG(t.final_cost) as avg_transaction_value,
-            SUM(t.applied_discount * t.initial_cost / 100) as total_discount_given
-        FROM users u
-        JOIN transactions t ON u.user_id = t.user_id
-        WHERE t.applied_discount > 0
-        GROUP BY u.discount_tier
-        ORDER BY total_revenue DESC
+        df = self._report("discount_tier_profitability", filters)
+        self._print_report("discount_tier_profitability", df)
+        return df
+    
+    def analyze_all_fused(self, **filters):
+        """Compute all four reports from a single scan of transactions (or of the rollups)"""
+        if self.approximate:
+            reports = {name: self._report(name, filters) for name in REPORT_TITLES}
+        else:
+            reports = reports_from_cube(self._fetch_cube(filters), self._fetch_products())
+        for name, df in reports.items():
+            self._print_report(name, df)
+        return reports
+    
+    def analyze_profit(self, **filters):
+        """Profit and margin by discount tier, geo, product and month from one scan
+        
+        Reads transactions (or daily_rollup with use_rollups) once; costs come from
+        the product cost lookup. Always exact, also in approximate mode.
         """
+        if self.backend is not None:
+            raise ValueError("Profit reports are computed from the SQLite database, not from a backend")
+        
+        check_filters(filters)
+        if self.use_rollups and not self._is_pooled():
+            self.refresh_rollups()
+        
+        query, params = profit_cube_query(filters, self.flags, self.use_rollups, self._partitions())
+        cube = self._read_sql(query, params, name="profit_cube")
+        costs = self._read_sql(PRODUCT_COSTS_QUERY.format(**unit_sql(self.flags)), name="product_costs")
+        reports = profit_reports(cube, costs, self._fetch_products())
+        
+        for name, df in reports.items():
+            self._print_report(name, df)
+        return reports
+    
+    def analyze_revenue_series(self, bucket="daily", **filters):
+        """Revenue time series in daily, weekly (starting Monday) or monthly buckets"""
+        if self.use_rollups and not self._is_pooled():
+            self.refresh_rollups()
         
-        df = pd.read_sql_query(query, self.conn)
-        print("\n=== Discount Tier Profitability Analysis ===")
+        query, params = series_query(bucket, filters, self.flags, self.use_rollups, self._partitions())
+        df = self._read_sql(query, params, name=f"revenue_series_{bucket}")
+        print(f"\n=== Revenue Series ({bucket}) ===")
         print(df)
         return df
     
-    def run_all_analyses(self):
-        """Run all analyses"""
-        if not hasattr(self, 'conn'):
+    def analyze_cohorts(self, **filters):
+        """Monthly retention of every first-purchase cohort"""
+        df = cohort_report(self._behaviour("cohorts", filters))
+        self._print_report("cohorts", df)
+        return df
+    
+    def analyze_retention(self, **filters):
+        """Retention curve of customers whose first purchase was discounted vs full price"""
+        df = retention_curve(self._behaviour("cohorts", filters))
+        self._print_report("retention", df)
+        return df
+    
+    def analyze_repeat_intervals(self, **filters):
+        """Days between repeat purchases by discount tier and by whether the previous purchase was discounted"""
+        df = self._behaviour("repeat_intervals", filters)
+        self._print_report("repeat_intervals", df)
+        return df
+    
+    def analyze_rfm(self, **filters):
+        """Customers, value and discount use per RFM segment"""
+        df = self._behaviour("rfm_segments", filters)
+        self._print_report("rfm_segments", df)
+        return df
+    
+    def rfm_scores(self, **filters):
+        """Recency, frequency, monetary value, 1-5 scores and segment of every customer
+        
+        One row per customer, so the DataFrame grows with the number of users;
+        analyze_rfm aggregates the same scores inside SQLite instead.
+        """
+        return self._behaviour("rfm_scores", filters)
+    
+    def refresh_rollups(self):
+        """Fold transactions added since the last refresh into daily_rollup
+        
+        Transactions are treated as append-only: the watermark is the last
+        rolled-up transaction_id, so a refresh only reads the new rows.
+        """
+        self.conn.executescript(ROLLUP_TABLES_SQL)
+        
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT last_transaction_id FROM rollup_state WHERE name = 'daily_rollup'")
+        row = cursor.fetchone()
+        watermark = row[0] if row else 0
+        
+        new_watermark = max_transaction_id(self.conn)
+        
+        if new_watermark > watermark:
+            cursor.execute(ROLLUP_REFRESH_SQL.format(**unit_sql(self.flags)), (watermark, new_watermark))
+            cursor.execute('''
+                INSERT INTO rollup_state (name, last_transaction_id) VALUES ('daily_rollup', ?)
+                ON CONFLICT (name) DO UPDATE SET last_transaction_id = excluded.last_transaction_id
+            ''', (new_watermark,))
+            self.conn.commit()
+        
+        return new_watermark - watermark
+    
+    def refresh_approximate(self):
+        """Fold transactions added since the last refresh into the approximate-mode sample"""
+        return refresh_sample(self.conn, self.sample_size)
+    
+    def _fetch_cube(self, filters=None):
+        """Pre-aggregated (product, geo, discount tier, applied discount) cube"""
+        filters = filters or {}
+        check_filters(filters)
+        
+        if self.backend is not None:
+            return self.backend.fetch_cube(**filters)
+        # Pooled connections are read-only; run_concurrent refreshes up front
+        if self.use_rollups and not self._is_pooled():
+            self.refresh_rollups()
+        return self._read_sql(*cube_query(filters, self.flags, self.use_rollups, self._partitions()),
+                              name="cube")
+    
+    def _behaviour(self, name, filters):
+        """Run a customer-behaviour query; it needs every purchase in order, so always reads transactions"""
+        if self.backend is not None:
+            raise ValueError("Customer-behaviour reports are computed from the SQLite database, not from a backend")
+        return self._read_sql(*behaviour_query(name, filters, self.flags, self._partitions()), name=name)
+    
+    def _read_sql(self, query, params=(), name="query"):
+        """Run a query into a DataFrame, through the result cache if enabled"""
+        conn = self._connection()
+        if self.cache is None:
+            return self._run_query(conn, query, params, name)
+        
+        start = time.perf_counter()
+        key = QueryCache.make_key(query, params)
+        token = change_token(conn)
+        df = self.cache.get(key, token)
+        
+        if df is None:
+            df = self._run_query(conn, query, params, name)
+            self.cache.put(key, token, df)
+        elif self.profiler is not None:
+            self.profiler.record(name, {"cache": time.perf_counter() - start}, cache_hit=True)
+        
+        # Callers may modify the result; keep the cached copy intact
+        return df.copy()
+    
+    def _run_query(self, conn, query, params, name):
+        """Read a query into a DataFrame, through the profiler if one is attached"""
+        if self.profiler is None:
+            return pd.read_sql_query(query, conn, params=params)
+        return self.profiler.read_sql(conn, query, params, name)
+    
+    def _connection(self):
+        """Pooled connection of the current worker thread, else the main connection"""
+        return getattr(self._local, "conn", None) or self.conn
+    
+    def _partitions(self):
+        """Month partitions of transactions for pruning, None when the schema is not partitioned"""
+        if not self.flags & SCHEMA_PARTITIONED:
+            return None
+        return transaction_partitions(self._connection())
+    
+    def _is_pooled(self):
+        return getattr(self._local, "conn", None) is not None
+    
+    def _pooled_report(self, name, filters):
+        """Compute a report on a connection borrowed from the read-only pool"""
+        with self.pool.connection() as conn:
+            self._local.conn = conn
+            try:
+                return self._report(name, filters)
+            finally:
+                self._local.conn = None
+    
+    def run_concurrent(self, names=None, **filters):
+        """Run independent reports in parallel on the read-only connection pool"""
+        if self.pool is None:
+            raise ValueError("run_concurrent needs EcommerceAnalyzer(..., pool_size=N)")
+        
+        names = list(names or REPORT_TITLES)
+        self._refresh_maintained()
+        
+        futures = {name: self.executor.submit(self._pooled_report, name, filters) for name in names}
+        reports = {name: future.result() for name, future in futures.items()}
+        
+        for name, df in reports.items():
+            self._print_report(name, df)
+        return reports
+    
+    async def report_async(self, name, **filters):
+        """Compute one report without blocking the event loop (needs a pool)
+        
+        Rollups and the sample are refreshed first on the main connection, in the
+        executor as well; the pooled connection the report runs on is read-only.
+        """
+        if self.pool is None:
+            raise ValueError("report_async needs EcommerceAnalyzer(..., pool_size=N)")
+        
+        await self._refresh_maintained_async()
+        return await self._pooled_report_async(name, filters)
+    
+    async def run_all_async(self, names=None, **filters):
+        """Run reports concurrently from asyncio; returns them by name"""
+        if self.pool is None:
+            raise ValueError("run_all_async needs EcommerceAnalyzer(..., pool_size=N)")
+        
+        names = list(names or REPORT_TITLES)
+        await self._refresh_maintained_async()
+        
+        results = await asyncio.gather(*(self._pooled_report_async(name, filters) for name in names))
+        return dict(zip(names, results))
+    
+    async def _pooled_report_async(self, name, filters):
+        """Run _pooled_report in the executor"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._pooled_report, name, filters)
+    
+    async def _refresh_maintained_async(self):
+        """Run _refresh_maintained in the executor"""
+        if self.use_rollups or self.approximate:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self.executor, self._refresh_maintained)
+    
+    def _refresh_maintained(self):
+        """Bring rollups/sample up to date before pooled (read-only) reports run"""
+        with self._refresh_lock:
+            if self.use_rollups:
+                self.refresh_rollups()
+            if self.approximate:
+                self.refresh_approximate()
+    
+    def cache_stats(self):
+        """Result cache hit/miss counters (None when the cache is disabled)"""
+        return self.cache.stats() if self.cache else None
+    
+    def _fetch_products(self):
+        """Products with name and tier"""
+        if self.backend is not None:
+            return self.backend.fetch_products()
+        return self._read_sql(PRODUCTS_QUERY, name="products")
+    
+    def _report(self, name, filters=None):
+        """Compute one report as a DataFrame"""
+        if self.approximate:
+            return self._approximate_report(name, filters)
+        if self.backend is not None or self.use_rollups:
+            return reports_from_cube(self._fetch_cube(filters), self._fetch_products())[name]
+        return self._read_sql(*report_query(name, filters, self.flags, self._partitions()), name=name)
+    
+    def _approximate_report(self, name, filters=None):
+        """Estimate one report from the stratified sample"""
+        filters = filters or {}
+        check_filters(filters)
+        if not self._is_pooled():
+            self.refresh_approximate()
+        
+        sketches = self._read_sql(SKETCHES_QUERY, name="approx_sketches") if name == "geo_performance" else None
+        sample = self._read_sql(SAMPLE_QUERY, name="approx_sample")
+        strata = self._read_sql(STRATA_QUERY, name="approx_strata")
+        return approximate_report(name, sample, strata, self._fetch_products(), sketches, filters, self.flags)
+    
+    def _print_report(self, name, df):
+        """Print a report under its title"""
+        title = REPORT_TITLES.get(name) or PROFIT_TITLES.get(name) or BEHAVIOUR_TITLES[name]
+        if self.profiler is None:
+            print(title)
+            print(df)
             return
-            
-        self.analyze_discount_effectiveness()
-        self.analyze_product_popularity()
-        self.analyze_geo_performance()
-        self.analyze_discount_tier_profitability()
+        
+        with self.profiler.measure(name, "print"):
+            print(title)
+            print(df)
+    
+    def explain(self, query_name, **filters):
+        """Return the EXPLAIN QUERY PLAN details of a named report or behaviour query"""
+        if query_name in BEHAVIOUR_QUERIES:
+            query, params = behaviour_query(query_name, filters, self.flags, self._partitions())
+        else:
+            query, params = report_query(query_name, filters, self.flags, self._partitions())
+        cursor = self.conn.execute("EXPLAIN QUERY PLAN " + query, params)
+        return [row[3] for row in cursor.fetchall()]
+    
+    def run_all_analyses(self, fused=False, **filters):
+        """Run all analyses (fused=True scans transactions only once)"""
+        if not hasattr(self, 'conn') and self.backend is None:
+            return
+        
+        if fused or self.backend is not None:
+            return self.analyze_all_fused(**filters)
+        
+        return {
+            "discount_effectiveness": self.analyze_discount_effectiveness(**filters),
+            "product_popularity": self.analyze_product_popularity(**filters),
+            "geo_performance": self.analyze_geo_performance(**filters),
+            "discount_tier_profitability": self.analyze_discount_tier_profitability(**filters)
+        }
     
     def close(self):
         """Close database connection"""
+        if self.executor is not None:
+            self.executor.shutdown()
+        if self.pool is not None:
+            self.pool.close()
         if hasattr(self, 'conn'):
             self.conn.close()
 
@@ -0,0 +1,378 @@
+"""Approximate reports from a stratified sample and HyperLogLog sketches
+
+The sample keeps, for every (product tier, geo) stratum, the sample_size
+transactions with the smallest hash priority. Priorities are a hash of
+transaction_id, so this is a simple random sample without replacement inside
+each stratum that can be maintained incrementally: new transactions only
+compete with the current sample, never with the rows already evicted.
+
+Totals are estimated with the stratified expansion estimator and averages as
+ratios of two totals. Every estimate comes with the half-width of its 95%
+normal confidence interval in a matching `<column>_ci` column. With n sampled
+rows out of N in a stratum the relative standard error of a count is about
+sqrt((1 - n/N) * (1 - p) / (n * p)) for a group holding share p of the
+stratum, i.e. roughly 3% for p = 0.5 and n = 1000. Groups without any
+sampled row are missing from the approximate reports.
+
+Distinct users per region come from HyperLogLog sketches kept per (geo,
+discount tier, product tier, month); sketches merge by register-wise max, so
+any filter combination is answered exactly as far as the sketch keys go (date
+filters are applied at whole-month granularity). The relative standard error
+is 1.04 / sqrt(2 ** HLL_PRECISION), about 1.6%.
+"""
+import numpy as np
+import pandas as pd
+
+try:
+    from .database import APPROXIMATE_TABLES_SQL, SCHEMA_ANALYTICS, max_transaction_id, schema_flags
+    from .queries import check_filters, date_param, unit_sql
+except ImportError:
+    from database import APPROXIMATE_TABLES_SQL, SCHEMA_ANALYTICS, max_transaction_id, schema_flags
+    from queries import check_filters, date_param, unit_sql
+
+
+DEFAULT_SAMPLE_SIZE = 1000
+
+HLL_PRECISION = 12
+
+# Two-sided 95% normal quantile
+Z_95 = 1.959964
+
+STRATA_KEYS = ["product_tier", "geo"]
+
+SKETCH_KEYS = ["geo", "discount_tier", "product_tier", "month"]
+
+SAMPLE_COLUMNS = [
+    "transaction_id", "priority", "product_tier", "geo", "discount_tier", "product_id",
+    "transaction_date", "initial_cost", "applied_discount", "final_cost"
+]
+
+# Sampled money and discounts are stored in currency units and percent
+NEW_TRANSACTIONS_QUERY = """
+SELECT
+    t.transaction_id,
+    p.tier as product_tier,
+    u.geo,
+    u.discount_tier,
+    t.product_id,
+    t.user_id,
+    t.transaction_date,
+    t.initial_cost{money} as initial_cost,
+    t.applied_discount{discount} as applied_discount,
+    t.final_cost{money} as final_cost
+FROM transactions t
+JOIN users u ON u.user_id = t.user_id
+JOIN products p ON p.product_id = t.product_id
+WHERE t.transaction_id > ? AND t.transaction_id <= ?
+ORDER BY t.transaction_id
+LIMIT ?
+"""
+
+SAMPLE_QUERY = "SELECT * FROM approx_sample"
+
+STRATA_QUERY = "SELECT product_tier, geo, population FROM approx_strata"
+
+SKETCHES_QUERY = "SELECT * FROM approx_sketches"
+
+# Estimated columns of each report: (column, numerator, kind); ratios divide by the count
+REPORT_ESTIMATES = {
+    "discount_effectiveness": [
+        ("transaction_count", "count", "total"),
+        ("total_revenue", "final_cost", "total"),
+        ("avg_transaction_value", "final_cost", "ratio"),
+        ("revenue_per_transaction", "final_cost", "ratio")
+    ],
+    "product_popularity": [
+        ("sales_count", "count", "total"),
+        ("total_revenue", "final_cost", "total"),
+        ("avg_price", "final_cost", "ratio")
+    ],
+    "geo_performance": [
+        ("transaction_count", "count", "total"),
+        ("total_revenue", "final_cost", "total"),
+        ("avg_transaction_value", "final_cost", "ratio"),
+        ("avg_discount_applied", "applied_discount", "ratio")
+    ],
+    "discount_tier_profitability": [
+        ("transaction_count", "count", "total"),
+        ("total_revenue", "final_cost", "total"),
+        ("avg_transaction_value", "final_cost", "ratio"),
+        ("total_discount_given", "discount_given", "total")
+    ]
+}
+
+
+def hash64(values):
+    """SplitMix64 hash of integer values as uint64"""
+    z = np.asarray(values).astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+def sample_priority(transaction_ids):
+    """Uniform [0, 1) priority of each transaction; the smallest ones form the sample"""
+    return (hash64(transaction_ids) >> np.uint64(11)).astype(np.float64) * 2.0 ** -53
+
+
+def hll_registers(precision=HLL_PRECISION):
+    """Empty HyperLogLog sketch"""
+    return np.zeros(1 << precision, dtype=np.uint8)
+
+
+def hll_add(registers, values):
+    """Add integer values to a HyperLogLog sketch in place"""
+    precision = int(registers.size).bit_length() - 1
+    hashed = hash64(values)
+    index = (hashed >> np.uint64(64 - precision)).astype(np.int64)
+    
+    # Rank = position of the first set bit in the remaining bits; with 52 of them the
+    # float conversion is exact and frexp gives the bit length
+    remaining = hashed & np.uint64((1 << (64 - precision)) - 1)
+    _, bit_length = np.frexp(remaining.astype(np.float64))
+    rank = (64 - precision) - bit_length + 1
+    
+    np.maximum.at(registers, index, rank.astype(np.uint8))
+    return registers
+
+
+def hll_estimate(registers):
+    """Distinct count estimate of a HyperLogLog sketch (with the small-range correction)"""
+    m = registers.size
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = alpha * m * m / np.sum(np.ldexp(1.0, -registers.astype(np.int64)))
+    
+    zeros = np.count_nonzero(registers == 0)
+    if estimate <= 2.5 * m and zeros:
+        estimate = m * np.log(m / zeros)
+    return float(estimate)
+
+
+def _months(dates, flags):
+    """'YYYY-MM' of each stored transaction_date"""
+    if flags & SCHEMA_ANALYTICS:
+        days = np.asarray(dates, dtype=np.int64).astype("datetime64[D]")
+        return np.datetime_as_string(days.astype("datetime64[M]"), unit="M")
+    return np.array([str(value)[:7] for value in dates])
+
+
+def refresh_sample(conn, sample_size=DEFAULT_SAMPLE_SIZE, chunk_size=1_000_000):
+    """Fold transactions added since the last refresh into the sample and sketches
+    
+    Transactions are treated as append-only, like the daily rollups. Changing
+    sample_size rebuilds the sample from scratch. Returns the number of new rows.
+    """
+    conn.executescript(APPROXIMATE_TABLES_SQL)
+    flags = schema_flags(conn)
+    cursor = conn.cursor()
+    
+    cursor.execute("SELECT sample_size, last_transaction_id FROM approx_state")
+    state = cursor.fetchone()
+    watermark = state[1] if state else 0
+    
+    if state and state[0] != sample_size:
+        for table in ("approx_sample", "approx_strata", "approx_sketches", "approx_state"):
+            cursor.execute(f"DELETE FROM {table}")
+        watermark = 0
+    
+    new_watermark = max_transaction_id(conn)
+    if new_watermark <= watermark:
+        conn.commit()
+        return 0
+    
+    new_transactions_query = NEW_TRANSACTIONS_QUERY.format(**unit_sql(flags))
+    sample = pd.read_sql_query(SAMPLE_QUERY, conn)
+    previous_ids = set(sample["transaction_id"].tolist())
+    populations = []
+    sketches = {}
+    last_id = watermark
+    
+    while last_id < new_watermark:
+        chunk = pd.read_sql_query(new_transactions_query, conn,
+                                  params=(last_id, new_watermark, chunk_size))
+        if chunk.empty:
+            break
+        last_id = int(chunk["transaction_id"].iloc[-1])
+        
+        populations.append(chunk.groupby(STRATA_KEYS).size())
+        
+        # Keep the sample_size smallest priorities per stratum
+        chunk["priority"] = sample_priority(chunk["transaction_id"].to_numpy())
+        sample = pd.concat([sample, chunk[SAMPLE_COLUMNS]], ignore_index=True)
+        sample = sample.sort_values("priority", kind="stable").groupby(STRATA_KEYS).head(sample_size)
+        
+        # Users repeat a lot, so deduplicate before hashing
+        chunk["month"] = _months(chunk["transaction_date"].to_numpy(), flags)
+        users = chunk[SKETCH_KEYS + ["user_id"]].drop_duplicates()
+        for key, group in users.groupby(SKETCH_KEYS):
+            hll_add(sketches.setdefault(key, hll_registers()), group["user_id"].to_numpy())
+    
+    # Write only the difference with the stored sample
+    current_ids = set(sample["transaction_id"].tolist())
+    cursor.executemany("DELETE FROM approx_sample WHERE transaction_id = ?",
+                       [(transaction_id,) for transaction_id in previous_ids - current_ids])
+    entrants = sample[~sample["transaction_id"].isin(previous_ids)]
+    cursor.executemany(f'''
+        INSERT INTO approx_sample ({", ".join(SAMPLE_COLUMNS)})
+        VALUES ({", ".join("?" * len(SAMPLE_COLUMNS))})
+    ''', entrants[SAMPLE_COLUMNS].astype(object).itertuples(index=False, name=None))
+    
+    cursor.executemany('''
+        INSERT INTO approx_strata (product_tier, geo, population) VALUES (?, ?, ?)
+        ON CONFLICT (product_tier, geo) DO UPDATE SET population = population + excluded.population
+    ''', [(int(tier), geo, int(count))
+          for (tier, geo), count in pd.concat(populations).groupby(level=STRATA_KEYS).sum().items()])
+    
+    for (geo, discount_tier, product_tier, month), registers in sketches.items():
+        key = (geo, int(discount_tier), int(product_tier), month)
+        cursor.execute('''
+            SELECT registers FROM approx_sketches
+            WHERE geo = ? AND discount_tier = ? AND product_tier = ? AND month = ?
+        ''', key)
+        row = cursor.fetchone()
+        if row:
+            registers = np.maximum(registers, np.frombuffer(row[0], dtype=np.uint8))
+        cursor.execute("INSERT OR REPLACE INTO approx_sketches VALUES (?, ?, ?, ?, ?)",
+                       key + (registers.tobytes(),))
+    
+    cursor.execute("DELETE FROM approx_state")
+    cursor.execute("INSERT INTO approx_state (sample_size, last_transaction_id) VALUES (?, ?)",
+                   (sample_size, new_watermark))
+    conn.commit()
+    
+    return new_watermark - watermark
+
+
+def _domain(sample, filters, flags):
+    """Mask of sampled rows matching the report filters"""
+    mask = np.ones(len(sample), dtype=bool)
+    
+    if filters.get("start_date") is not None:
+        mask &= (sample["transaction_date"] >= date_param(filters["start_date"], flags)).to_numpy()
+    if filters.get("end_date") is not None:
+        mask &= (sample["transaction_date"] <= date_param(filters["end_date"], flags)).to_numpy()
+    
+    for name, column in (("geos", "geo"), ("product_tiers", "product_tier"),
+                         ("discount_tiers", "discount_tier")):
+        if filters.get(name) is not None:
+            mask &= sample[column].isin(list(filters[name])).to_numpy()
+    return mask
+
+
+def stratified_estimates(sample, strata, by, estimates, mask=None):
+    """Estimate totals and ratios per group with their 95% confidence half-widths
+    
+    Rows outside mask count as zeros of their stratum (domain estimation), so the
+    stratum sizes always refer to the whole sample.
+    """
+    values = pd.DataFrame({
+        "count": 1.0,
+        "final_cost": sample["final_cost"],
+        "applied_discount": sample["applied_discount"],
+        "discount_given": sample["applied_discount"] * sample["initial_cost"] / 100
+    })
+    variables = list(values.columns)
+    values = pd.concat([values, values.pow(2).add_suffix("_sq")], axis=1)
+    values[by] = sample[by]
+    values[STRATA_KEYS] = sample[STRATA_KEYS]
+    if mask is not None:
+        values = values[mask]
+    
+    sampled = sample.groupby(STRATA_KEYS).size().rename("sampled").reset_index()
+    strata = strata.merge(sampled, on=STRATA_KEYS)
+    keys = [by] + [key for key in STRATA_KEYS if key != by]
+    sums = values.groupby(keys).sum().reset_index().merge(strata, on=STRATA_KEYS)
+    n = sums["sampled"].to_numpy(dtype=np.float64)
+    N = sums["population"].to_numpy(dtype=np.float64)
+    weight = N / n
+    # Variance factor N^2 (1 - n/N) / n applied to the within-stratum variance
+    factor = N * N * (1 - n / N) / n
+    
+    def stratum_variance(s, ss):
+        return np.where(n > 1, (ss - s * s / n) / np.maximum(n - 1, 1), 0.0)
+    
+    groups = sums[by].to_numpy()
+    result = pd.DataFrame(index=pd.Index(pd.unique(groups), name=by))
+    
+    totals = {}
+    for variable in variables:
+        s = sums[variable].to_numpy()
+        totals[variable] = pd.Series(weight * s).groupby(groups).sum()
+        variance = pd.Series(factor * stratum_variance(s, sums[f"{variable}_sq"].to_numpy()))
+        totals[f"{variable}_var"] = variance.groupby(groups).sum()
+    
+    for column, variable, kind in estimates:
+        if kind == "total":
+            result[column] = totals[variable]
+            result[f"{column}_ci"] = Z_95 * np.sqrt(totals[f"{variable}_var"])
+            continue
+        
+        # Ratio to the count, linearized: residuals z = y - R for every domain row
+        ratio = totals[variable] / totals["count"]
+        r = ratio.reindex(groups).to_numpy()
+        count = sums["count"].to_numpy()
+        s = sums[variable].to_numpy()
+        s_z = s - r * count
+        ss_z = sums[f"{variable}_sq"].to_numpy() - 2 * r * s + r * r * count
+        variance = pd.Series(factor * stratum_variance(s_z, ss_z)).groupby(groups).sum()
+        result[column] = ratio
+        result[f"{column}_ci"] = Z_95 * np.sqrt(variance) / totals["count"]
+    
+    return result.reset_index()
+
+
+def unique_users(sketches, filters, flags):
+    """Estimated distinct users per geo, with 95% confidence half-widths"""
+    mask = np.ones(len(sketches), dtype=bool)
+    
+    for name, column in (("geos", "geo"), ("product_tiers", "product_tier"),
+                         ("discount_tiers", "discount_tier")):
+        if filters.get(name) is not None:
+            mask &= sketches[column].isin(list(filters[name])).to_numpy()
+    for name, bound in (("start_date", np.greater_equal), ("end_date", np.less_equal)):
+        if filters.get(name) is not None:
+            month = _months([date_param(filters[name], flags)], flags)[0]
+            mask &= bound(sketches["month"].to_numpy(), month)
+    
+    rows = []
+    for geo, group in sketches[mask].groupby("geo"):
+        registers = hll_registers()
+        for blob in group["registers"]:
+            np.maximum(registers, np.frombuffer(blob, dtype=np.uint8), out=registers)
+        estimate = hll_estimate(registers)
+        error = 1.04 / np.sqrt(registers.size)
+        rows.append((geo, estimate, Z_95 * error * estimate))
+    
+    return pd.DataFrame(rows, columns=["geo", "unique_users", "unique_users_ci"])
+
+
+def approximate_report(name, sample, strata, products, sketches=None, filters=None, flags=0):
+    """One of the four reports estimated from the sample (and sketches for geo_performance)"""
+    filters = filters or {}
+    check_filters(filters)
+    mask = _domain(sample, filters, flags)
+    estimates = REPORT_ESTIMATES[name]
+    
+    if name == "discount_effectiveness":
+        sample = sample.assign(discount_category=np.select(
+            [sample["applied_discount"] == 0, sample["applied_discount"] <= 10],
+            ["No Discount", "Low Discount (5-10%)"],
+            "High Discount (15-20%)"
+        ))
+        df = stratified_estimates(sample, strata, "discount_category", estimates, mask)
+        return df.sort_values("total_revenue", ascending=False, ignore_index=True)
+    
+    if name == "product_popularity":
+        df = stratified_estimates(sample, strata, "product_id", estimates, mask)
+        df = products.merge(df, on="product_id").drop(columns="product_id")
+        return df.sort_values("sales_count", ascending=False, ignore_index=True)
+    
+    if name == "geo_performance":
+        df = stratified_estimates(sample, strata, "geo", estimates, mask)
+        if sketches is not None:
+            df = df.merge(unique_users(sketches, filters, flags), on="geo", how="left")
+        return df.sort_values("total_revenue", ascending=False, ignore_index=True)
+    
+    mask &= (sample["applied_discount"] > 0).to_numpy()
+    df = stratified_estimates(sample, strata, "discount_tier", estimates, mask)
+    return df.sort_values("total_revenue", ascending=False, ignore_index=True)
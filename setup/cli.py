@@ -0,0 +1,351 @@
+"""Command-line interface: generate, clean, analyze and validate the e-commerce database
+
+    python -m setup generate --transactions 100000 --analytics-schema
+    python -m setup analyze geo_performance --start-date 2026-01-01 --format csv
+    python -m setup validate
+
+Only the standard library is imported at startup. numpy and pandas are loaded by
+the subcommands that need them: generation, data validation and the reports that
+are post-processed as DataFrames (PANDAS_REPORTS). The reports in QUERY_REGISTRY
+are run with plain sqlite3 and printed as a table, CSV or JSON.
+"""
+import argparse
+import os
+import sys
+from datetime import date
+
+# Repository root, where clean_db.py and tests/ live
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Reports computed by EcommerceAnalyzer from DataFrames, by its method name
+PANDAS_REPORTS = {
+    "profit": "analyze_profit",
+    "cohorts": "analyze_cohorts",
+    "retention": "analyze_retention"
+}
+
+# Reports run when analyze gets no names (as EcommerceAnalyzer.run_all_analyses)
+DEFAULT_REPORTS = ("discount_effectiveness", "product_popularity", "geo_performance",
+                   "discount_tier_profitability")
+
+# Comma-separated list filters and how to parse their items
+LIST_FILTERS = {"geos": str, "product_tiers": int, "discount_tiers": int}
+
+
+def import_repo_module(name):
+    """Import a module from the repository root or tests/ (clean_db, test_database)"""
+    for path in (REPO_ROOT, os.path.join(REPO_ROOT, "tests")):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+    return __import__(name)
+
+
+def iso_date(value):
+    """argparse type of the date options: YYYY-MM-DD, rejected by the parser otherwise"""
+    return date.fromisoformat(value)
+
+
+def database_exists(db_name):
+    """Report a missing database file the way EcommerceAnalyzer does"""
+    if os.path.exists(db_name):
+        return True
+    print(f"Database {db_name} not found!", file=sys.stderr)
+    print("Please run 'python -m setup generate' first to create the database.", file=sys.stderr)
+    return False
+
+
+def parse_filters(args):
+    """analyze_* filters from the command-line options"""
+    filters = {}
+    if args.start_date:
+        filters["start_date"] = args.start_date
+    if args.end_date:
+        filters["end_date"] = args.end_date
+    for name, parse in LIST_FILTERS.items():
+        value = getattr(args, name)
+        if value is not None:
+            filters[name] = [parse(item) for item in value.split(",") if item]
+    return filters
+
+
+def format_value(value):
+    """Table cell text: money-style floats, everything else as is"""
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    return "" if value is None else str(value)
+
+
+def write_table(out, name, columns, rows):
+    """Print rows as aligned columns under the report name"""
+    rows = list(rows)
+    cells = [[format_value(value) for value in row] for row in rows]
+    widths = [max([len(column)] + [len(row[i]) for row in cells]) for i, column in enumerate(columns)]
+    
+    out.write(f"=== {name} ===\n")
+    out.write("  ".join(column.ljust(width) for column, width in zip(columns, widths)).rstrip() + "\n")
+    for row, row_cells in zip(rows, cells):
+        # Numbers align right, text left
+        out.write("  ".join(
+            cell.rjust(width) if isinstance(value, (int, float)) else cell.ljust(width)
+            for value, cell, width in zip(row, row_cells, widths)
+        ).rstrip() + "\n")
+    out.write("\n")
+
+
+def write_csv(out, name, columns, rows, section):
+    """Write rows as CSV; several reports are separated by a '# name' line"""
+    import csv
+    
+    if section:
+        out.write(f"# {name}\n")
+    writer = csv.writer(out, lineterminator="\n")
+    writer.writerow(columns)
+    writer.writerows(rows)
+
+
+def query_rows(conn, name, filters, bucket):
+    """Run a registered query with plain sqlite3; returns (columns, row cursor)"""
+    try:
+        from .database import SCHEMA_PARTITIONED, schema_flags, transaction_partitions
+        from .queries import named_query
+    except ImportError:
+        from database import SCHEMA_PARTITIONED, schema_flags, transaction_partitions
+        from queries import named_query
+    
+    flags = schema_flags(conn)
+    partitions = transaction_partitions(conn) if flags & SCHEMA_PARTITIONED else None
+    cursor = conn.execute(*named_query(name, filters, flags, partitions, bucket))
+    return [description[0] for description in cursor.description], cursor
+
+
+def dataframe_reports(db_name, name, filters):
+    """Run a PANDAS_REPORTS report through EcommerceAnalyzer; returns {name: DataFrame}
+    
+    The analyzer's own printout is discarded; run_analyze writes the frames to
+    --output in the requested format like the registered queries.
+    """
+    import contextlib
+    import io
+    
+    try:
+        from .analysis import EcommerceAnalyzer
+    except ImportError:
+        from analysis import EcommerceAnalyzer
+    
+    analyzer = EcommerceAnalyzer(db_name)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = getattr(analyzer, PANDAS_REPORTS[name])(**filters)
+    finally:
+        analyzer.close()
+    return result if isinstance(result, dict) else {name: result}
+
+
+def run_generate(args):
+    """Create the tables and generate products, users and transactions"""
+    import random
+    
+    try:
+        from .data_generators import DataGenerator
+        from .database import EcommerceDatabase
+    except ImportError:
+        from data_generators import DataGenerator
+        from database import EcommerceDatabase
+    
+    if args.seed is not None:
+        random.seed(args.seed)
+    
+    db = EcommerceDatabase(args.db)
+    db.connect()
+    try:
+        db.create_tables(analytics_schema=args.analytics_schema, integer_cents=args.integer_cents,
+                         partitioned=args.partitioned)
+        
+        generator = DataGenerator(db.conn, user_skew=args.user_skew, product_skew=args.product_skew,
+                                  seasonality=args.seasonality)
+        if args.products_per_tier:
+            generator.generate_products_vectorized(args.products_per_tier, seed=args.seed)
+        else:
+            generator.generate_products()
+        if args.users:
+            generator.generate_users_vectorized(args.users, seed=args.seed)
+        else:
+            generator.generate_users()
+        
+        batch = {"batch_size": args.batch_size} if args.batch_size else {}
+        db.begin_bulk_load()
+        if args.parallel:
+            generator.generate_transactions_parallel(args.transactions, seed=args.seed, workers=args.workers,
+                                                     **batch)
+        else:
+            generator.generate_transactions_vectorized(args.transactions, seed=args.seed, **batch)
+        db.end_bulk_load()
+    finally:
+        db.close()
+    return 0
+
+
+def run_clean(args):
+    """Clean the database with clean_db.py (drop tables, reset, truncate or swap in a template)"""
+    clean_db = import_repo_module("clean_db")
+    
+    if args.reset:
+        success = clean_db.reset_database_file(args.db)
+    elif args.template:
+        success = clean_db.swap_in_template(args.db, args.template)
+    elif args.truncate:
+        success = clean_db.truncate_database(args.db)
+    else:
+        success = clean_db.clean_database(args.db)
+    
+    if success and args.vacuum and not args.reset:
+        success = clean_db.compact_database(args.db, args.vacuum)
+    return 0 if success else 1
+
+
+def run_analyze(args):
+    """Print or export reports: registered queries via sqlite3, PANDAS_REPORTS via EcommerceAnalyzer"""
+    import sqlite3
+    
+    try:
+        from .queries import QUERY_REGISTRY
+    except ImportError:
+        from queries import QUERY_REGISTRY
+    
+    if args.list:
+        for name in QUERY_REGISTRY:
+            print(name)
+        for name in PANDAS_REPORTS:
+            print(f"{name} (pandas)")
+        return 0
+    
+    names = args.reports or list(DEFAULT_REPORTS)
+    unknown = [name for name in names if name not in QUERY_REGISTRY and name not in PANDAS_REPORTS]
+    if unknown:
+        print(f"Unknown reports: {', '.join(unknown)} (see --list)", file=sys.stderr)
+        return 2
+    if not database_exists(args.db):
+        return 1
+    
+    filters = parse_filters(args)
+    out = open(args.output, "w", newline="") if args.output else sys.stdout
+    conn = sqlite3.connect(args.db)
+    results = {}
+    try:
+        for name in names:
+            if name in PANDAS_REPORTS:
+                for report, df in dataframe_reports(args.db, name, filters).items():
+                    results[report] = (list(df.columns), df.to_dict("split")["data"])
+                    if args.format == "table":
+                        write_table(out, report, *results.pop(report))
+                continue
+            results[name] = query_rows(conn, name, filters, args.bucket)
+            if args.format == "table":
+                write_table(out, name, *results.pop(name))
+        
+        if args.format == "csv":
+            for name, (columns, rows) in results.items():
+                write_csv(out, name, columns, rows, section=len(results) > 1)
+        elif args.format == "json":
+            import json
+            
+            json.dump({name: [dict(zip(columns, row)) for row in rows] for name, (columns, rows) in results.items()},
+                      out, indent=2)
+            out.write("\n")
+    finally:
+        conn.close()
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+def run_validate(args):
+    """Check the schema (DatabaseTester) and the transaction data (TransactionValidator)"""
+    if not database_exists(args.db):
+        return 1
+    
+    status = 0
+    if args.checks in ("schema", "all"):
+        status |= import_repo_module("test_database").run_tests(args.db)
+    
+    if args.checks in ("data", "all"):
+        try:
+            from .validation import DEFAULT_CHUNK_SIZE, TransactionValidator
+        except ImportError:
+            from validation import DEFAULT_CHUNK_SIZE, TransactionValidator
+        
+        validator = TransactionValidator(args.db, args.chunk_size or DEFAULT_CHUNK_SIZE,
+                                         start_date=args.start_date, end_date=args.end_date)
+        if any(validator.validate()["violations"].values()):
+            status = 1
+    return status
+
+
+def build_parser():
+    """Argument parser with the generate / clean / analyze / validate subcommands"""
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--db", default="ecommerce.db", help="Database file")
+    
+    parser = argparse.ArgumentParser(prog="python -m setup", description="E-commerce database tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    generate = subparsers.add_parser("generate", parents=[common], help="Create tables and generate data")
+    generate.add_argument("--transactions", type=int, default=1000, help="Transactions to generate")
+    generate.add_argument("--seed", type=int, default=None,
+                          help="Generator seed; the rows depend on it and on --batch-size")
+    generate.add_argument("--batch-size", type=int, default=None,
+                          help="Transactions drawn per NumPy batch (default: DEFAULT_BATCH_SIZE)")
+    generate.add_argument("--analytics-schema", action="store_true", help="Integer day numbers and covering indexes")
+    generate.add_argument("--integer-cents", action="store_true", help="Money in integer cents")
+    generate.add_argument("--partitioned", action="store_true", help="Transactions in month partitions")
+    generate.add_argument("--users", type=int, default=0, help="Vectorized users (0 = the fixed set)")
+    generate.add_argument("--products-per-tier", type=int, default=0,
+                          help="Vectorized products per tier (0 = the fixed set)")
+    generate.add_argument("--user-skew", type=float, default=0.0, help="Zipf exponent of user activity")
+    generate.add_argument("--product-skew", type=float, default=0.0, help="Zipf exponent of product popularity")
+    generate.add_argument("--seasonality", type=float, default=0.0,
+                          help="Amplitude of the yearly date seasonality, 0-1")
+    generate.add_argument("--parallel", action="store_true", help="Generate transactions in a process pool")
+    generate.add_argument("--workers", type=int, default=None, help="Worker processes for --parallel")
+    generate.set_defaults(handler=run_generate)
+    
+    clean = subparsers.add_parser("clean", parents=[common], help="Clean the database (see clean_db.py)")
+    clean.add_argument("--reset", action="store_true", help="Delete the database files")
+    clean.add_argument("--truncate", action="store_true", help="Empty the tables, keeping schema and indexes")
+    clean.add_argument("--template", default=None, help="Replace the database with a copy of this template")
+    clean.add_argument("--vacuum", choices=["into", "incremental"], default=None, help="Compact the file afterwards")
+    clean.set_defaults(handler=run_clean)
+    
+    analyze = subparsers.add_parser("analyze", parents=[common], help="Print or export reports")
+    analyze.add_argument("reports", nargs="*", help="Report names (default: the four main reports)")
+    analyze.add_argument("--list", action="store_true", help="List the report names")
+    analyze.add_argument("--format", choices=["table", "csv", "json"], default="table", help="Output format")
+    analyze.add_argument("--output", default=None, help="Output file (default: stdout)")
+    analyze.add_argument("--bucket", choices=["daily", "weekly", "monthly"], default="daily",
+                         help="Bucket of revenue_series")
+    analyze.add_argument("--start-date", type=iso_date, default=None, help="Earliest transaction_date (inclusive)")
+    analyze.add_argument("--end-date", type=iso_date, default=None, help="Latest transaction_date (inclusive)")
+    analyze.add_argument("--geos", default=None, help="Comma-separated geos")
+    analyze.add_argument("--product-tiers", default=None, help="Comma-separated product tiers")
+    analyze.add_argument("--discount-tiers", default=None, help="Comma-separated discount tiers")
+    analyze.set_defaults(handler=run_analyze)
+    
+    validate = subparsers.add_parser("validate", parents=[common], help="Check schema and transaction data")
+    validate.add_argument("--checks", choices=["schema", "data", "all"], default="all", help="Which checks to run")
+    validate.add_argument("--chunk-size", type=int, default=None, help="Transactions per validation chunk")
+    validate.add_argument("--start-date", type=iso_date, default=None, help="Earliest allowed transaction_date")
+    validate.add_argument("--end-date", type=iso_date, default=None,
+                          help="Latest allowed transaction_date (default: today)")
+    validate.set_defaults(handler=run_validate)
+    
+    return parser
+
+
+def main(argv=None):
+    """Run one subcommand; returns the exit status"""
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,278 @@
+import json
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .database import (BASIS_POINTS_PER_PERCENT, CENTS_PER_UNIT, SCHEMA_ANALYTICS, SCHEMA_CENTS,
+                           schema_flags)
+    from .queries import date_param
+except ImportError:
+    from database import (BASIS_POINTS_PER_PERCENT, CENTS_PER_UNIT, SCHEMA_ANALYTICS, SCHEMA_CENTS,
+                          schema_flags)
+    from queries import date_param
+
+
+# Stored columns and their NumPy types; costs are integer cents
+COLUMN_TYPES = {
+    "transaction_id": np.int32,
+    "product_id": np.int32,
+    "user_id": np.int32,
+    "day": np.int32,
+    "applied_discount": np.uint8,
+    "initial_cost_cents": np.int32,
+    "final_cost_cents": np.int32
+}
+
+# Dense id-indexed dimension lookups
+DIMENSION_TYPES = {
+    "user_geo": np.uint8,
+    "user_discount_tier": np.uint8,
+    "product_tier": np.uint8
+}
+
+DEFAULT_CHUNK_SIZE = 1_000_000
+
+# Largest (product, geo, discount tier, discount) key space aggregated into dense
+# accumulators (24 bytes per cell); larger ones are grouped on the keys present
+DENSE_CUBE_CELLS = 1 << 22
+
+
+def group_cells(cells, count, revenue, given):
+    """Sum count, revenue and given per distinct cell key; returns (cells, count, revenue, given)"""
+    cells, inverse = np.unique(cells, return_inverse=True)
+    return (
+        cells,
+        np.bincount(inverse, count, minlength=len(cells)).astype(np.int64),
+        np.bincount(inverse, revenue, minlength=len(cells)),
+        np.bincount(inverse, given, minlength=len(cells))
+    )
+
+
+class ColumnarStore:
+    """Transactions as typed NumPy columns with dictionary-encoded dimensions
+    
+    25 bytes per transaction instead of a pandas frame with object
+    columns; geo is stored once per user as a code into geo_names. Reports are
+    computed with np.bincount over packed (product, geo, discount tier, applied
+    discount) cell keys, and the store is pluggable into EcommerceAnalyzer as
+    a backend. save()/open() persist it as .npy files opened memory-mapped.
+    """
+    
+    def __init__(self, columns, dimensions, geo_names, products):
+        self.columns = columns
+        self.dimensions = dimensions
+        self.geo_names = np.asarray(geo_names, dtype=object)
+        self.products = products
+    
+    @classmethod
+    def from_database(cls, db_name, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Load transactions and dimension tables from a SQLite database"""
+        conn = sqlite3.connect(db_name)
+        try:
+            day_numbers = bool(schema_flags(conn) & SCHEMA_ANALYTICS)
+            cents = bool(schema_flags(conn) & SCHEMA_CENTS)
+            money_scale = 1 if cents else CENTS_PER_UNIT
+            discount_scale = BASIS_POINTS_PER_PERCENT if cents else 1
+            cursor = conn.cursor()
+            
+            products = pd.read_sql_query("SELECT product_id, name, tier FROM products", conn)
+            users = pd.read_sql_query("SELECT user_id, geo, discount_tier FROM users", conn)
+            
+            geo_names, geo_codes = np.unique(users["geo"].to_numpy(), return_inverse=True)
+            user_ids = users["user_id"].to_numpy()
+            dimensions = {
+                "user_geo": np.zeros(user_ids.max() + 1, dtype=DIMENSION_TYPES["user_geo"]),
+                "user_discount_tier": np.zeros(user_ids.max() + 1, dtype=DIMENSION_TYPES["user_discount_tier"]),
+                "product_tier": np.zeros(products["product_id"].max() + 1, dtype=DIMENSION_TYPES["product_tier"])
+            }
+            dimensions["user_geo"][user_ids] = geo_codes
+            dimensions["user_discount_tier"][user_ids] = users["discount_tier"].to_numpy()
+            dimensions["product_tier"][products["product_id"].to_numpy()] = products["tier"].to_numpy()
+            
+            cursor.execute("SELECT COUNT(*), COALESCE(MAX(transaction_id), 0) FROM transactions")
+            total, max_id = cursor.fetchone()
+            columns = {name: np.empty(total, dtype=dtype) for name, dtype in COLUMN_TYPES.items()}
+            if max_id > np.iinfo(np.int32).max:
+                columns["transaction_id"] = np.empty(total, dtype=np.int64)
+            
+            # Keyset pagination keeps the Python row tuples bounded by chunk_size
+            offset = 0
+            last_id = 0
+            while offset < total:
+                cursor.execute('''
+                    SELECT transaction_id, product_id, user_id, transaction_date,
+                           applied_discount, initial_cost, final_cost
+                    FROM transactions
+                    WHERE transaction_id > ?
+                    ORDER BY transaction_id
+                    LIMIT ?
+                ''', (last_id, chunk_size))
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                
+                ids, product_id, user_id, dates, discount, initial_cost, final_cost = zip(*rows)
+                end = offset + len(rows)
+                
+                if day_numbers:
+                    days = np.array(dates, dtype=np.int64)
+                else:
+                    days = np.array(dates, dtype="datetime64[D]").astype(np.int64)
+                
+                discount = np.array(discount, dtype=np.float64) / discount_scale
+                if np.any(discount != np.round(discount)) or discount.min() < 0 or discount.max() > 255:
+                    raise ValueError("applied_discount must be whole percents to fit the columnar store")
+                
+                columns["transaction_id"][offset:end] = ids
+                columns["product_id"][offset:end] = product_id
+                columns["user_id"][offset:end] = user_id
+                columns["day"][offset:end] = days
+                columns["applied_discount"][offset:end] = discount
+                columns["initial_cost_cents"][offset:end] = np.round(np.array(initial_cost) * money_scale)
+                columns["final_cost_cents"][offset:end] = np.round(np.array(final_cost) * money_scale)
+                
+                offset = end
+                last_id = rows[-1][0]
+        finally:
+            conn.close()
+        
+        columns = {name: values[:offset] for name, values in columns.items()}
+        return cls(columns, dimensions, geo_names, products)
+    
+    def save(self, path):
+        """Write every column and lookup as a .npy file, plus the dictionaries as JSON"""
+        os.makedirs(path, exist_ok=True)
+        for name, values in {**self.columns, **self.dimensions}.items():
+            np.save(os.path.join(path, f"{name}.npy"), values)
+        
+        with open(os.path.join(path, "dictionaries.json"), "w") as f:
+            json.dump({"geo_names": self.geo_names.tolist(),
+                       "products": self.products.to_dict(orient="list")}, f)
+    
+    @classmethod
+    def open(cls, path, mmap_mode="r"):
+        """Open a saved store; columns are memory-mapped, so nothing is read up front"""
+        def load(name):
+            return np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode)
+        
+        with open(os.path.join(path, "dictionaries.json")) as f:
+            dictionaries = json.load(f)
+        
+        return cls(
+            {name: load(name) for name in COLUMN_TYPES},
+            {name: load(name) for name in DIMENSION_TYPES},
+            dictionaries["geo_names"],
+            pd.DataFrame(dictionaries["products"])
+        )
+    
+    def __len__(self):
+        return len(self.columns["transaction_id"])
+    
+    @property
+    def nbytes(self):
+        """Bytes used by the columns and lookups"""
+        return sum(values.nbytes for values in {**self.columns, **self.dimensions}.values())
+    
+    def fetch_products(self):
+        """Products with name and tier"""
+        return self.products.copy()
+    
+    def _mask(self, start, end, start_date, end_date, geos, product_tiers, discount_tiers):
+        """Rows of [start, end) matching the filters (None when all of them match)"""
+        masks = []
+        day = self.columns["day"][start:end]
+        if start_date is not None:
+            masks.append(day >= date_param(start_date, SCHEMA_ANALYTICS))
+        if end_date is not None:
+            masks.append(day <= date_param(end_date, SCHEMA_ANALYTICS))
+        
+        user_id = self.columns["user_id"][start:end]
+        if geos is not None:
+            codes = np.flatnonzero(np.isin(self.geo_names, list(geos)))
+            masks.append(np.isin(self.dimensions["user_geo"][user_id], codes))
+        if discount_tiers is not None:
+            masks.append(np.isin(self.dimensions["user_discount_tier"][user_id], list(discount_tiers)))
+        if product_tiers is not None:
+            product_id = self.columns["product_id"][start:end]
+            masks.append(np.isin(self.dimensions["product_tier"][product_id], list(product_tiers)))
+        
+        return np.logical_and.reduce(masks) if masks else None
+    
+    def fetch_cube(self, start_date=None, end_date=None, geos=None, product_tiers=None,
+                   discount_tiers=None, chunk_size=10 * DEFAULT_CHUNK_SIZE):
+        """Aggregate into the report cube chunk by chunk
+        
+        Cells are packed (product, geo, discount tier, applied discount) keys.
+        Small key spaces are summed with np.bincount into dense accumulators;
+        larger ones (many products) are grouped on the keys that actually occur,
+        so memory follows the number of non-empty cells, not the key space.
+        """
+        shape = (
+            len(self.dimensions["product_tier"]),
+            len(self.geo_names),
+            int(self.dimensions["user_discount_tier"].max()) + 1,
+            int(self.columns["applied_discount"].max()) + 1 if len(self) else 1
+        )
+        size = int(np.prod(shape, dtype=np.int64))
+        dense = size <= DENSE_CUBE_CELLS
+        if dense:
+            count = np.zeros(size, dtype=np.int64)
+            revenue_cents = np.zeros(size, dtype=np.float64)
+            discount_given_cents = np.zeros(size, dtype=np.float64)
+        grouped = None
+        
+        for start in range(0, len(self), chunk_size):
+            end = min(start + chunk_size, len(self))
+            mask = self._mask(start, end, start_date, end_date, geos, product_tiers, discount_tiers)
+            
+            def column(name):
+                values = self.columns[name][start:end]
+                return values if mask is None else values[mask]
+            
+            user_id = column("user_id")
+            discount = column("applied_discount")
+            cell = np.ravel_multi_index((
+                column("product_id"),
+                self.dimensions["user_geo"][user_id],
+                self.dimensions["user_discount_tier"][user_id],
+                discount
+            ), shape)
+            revenue = column("final_cost_cents")
+            given = discount * column("initial_cost_cents").astype(np.float64) / 100
+            
+            if dense:
+                count += np.bincount(cell, minlength=size)
+                revenue_cents += np.bincount(cell, revenue, minlength=size)
+                discount_given_cents += np.bincount(cell, given, minlength=size)
+            else:
+                chunk = group_cells(cell, np.ones(len(cell), dtype=np.int64), revenue, given)
+                # Chunks share cells; fold each into the running sums on the same keys
+                grouped = chunk if grouped is None else group_cells(
+                    *(np.concatenate(pair) for pair in zip(grouped, chunk))
+                )
+        
+        if dense:
+            cells = np.flatnonzero(count)
+            count, revenue_cents, discount_given_cents = (
+                count[cells], revenue_cents[cells], discount_given_cents[cells]
+            )
+        elif grouped is not None:
+            cells, count, revenue_cents, discount_given_cents = grouped
+        else:
+            cells = np.zeros(0, dtype=np.int64)
+            count = np.zeros(0, dtype=np.int64)
+            revenue_cents = discount_given_cents = np.zeros(0, dtype=np.float64)
+        
+        product_id, geo, discount_tier, applied_discount = np.unravel_index(cells, shape)
+        return pd.DataFrame({
+            "product_id": product_id,
+            "geo": self.geo_names[geo],
+            "discount_tier": discount_tier,
+            "applied_discount": applied_discount.astype(np.float64),
+            "transaction_count": count.astype(np.int64),
+            "total_revenue": revenue_cents / 100,
+            "total_discount_given": discount_given_cents / 100
+        })
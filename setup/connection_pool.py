@@ -0,0 +1,42 @@
+import os
+import queue
+import sqlite3
+from contextlib import contextmanager
+from urllib.request import pathname2url
+
+
+class ReadOnlyPool:
+    """Pool of read-only SQLite connections for concurrent report queries
+    
+    Connections are opened with mode=ro and PRAGMA query_only, so they can never
+    write. Put the database in WAL mode (EcommerceDatabase.enable_wal) to let
+    them read consistent snapshots while a writer keeps appending transactions.
+    """
+    
+    def __init__(self, db_name, size=4):
+        self.db_name = db_name
+        self.size = size
+        self._connections = queue.Queue()
+        
+        uri = f"file:{pathname2url(os.path.abspath(db_name))}?mode=ro"
+        for _ in range(size):
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            conn.execute("PRAGMA query_only=ON")
+            self._connections.put(conn)
+    
+    @contextmanager
+    def connection(self):
+        """Borrow a connection, blocking until one is free"""
+        conn = self._connections.get()
+        try:
+            yield conn
+        finally:
+            # Never hand out a connection with a read transaction still open
+            if conn.in_transaction:
+                conn.rollback()
+            self._connections.put(conn)
+    
+    def close(self):
+        """Close all pooled connections"""
+        for _ in range(self.size):
+            self._connections.get().close()
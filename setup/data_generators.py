@@ -1,12 +1,206 @@
+import os
 import random
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 import sqlite3
 
+import numpy as np
+
+try:
+    from .database import (BASIS_POINTS_PER_PERCENT, CENTS_PER_UNIT, SCHEMA_ANALYTICS, SCHEMA_CENTS,
+                           TRANSACTION_INSERT_SQL, copy_transactions, insert_transactions,
+                           max_transaction_id, schema_flags, transactions_table_sql)
+except ImportError:
+    from database import (BASIS_POINTS_PER_PERCENT, CENTS_PER_UNIT, SCHEMA_ANALYTICS, SCHEMA_CENTS,
+                          TRANSACTION_INSERT_SQL, copy_transactions, insert_transactions,
+                          max_transaction_id, schema_flags, transactions_table_sql)
+
+# Default number of rows drawn per NumPy batch
+DEFAULT_BATCH_SIZE = 100_000
+
+# Default number of rows committed per explicit transaction while streaming
+DEFAULT_ROWS_PER_COMMIT = 1_000_000
+
+# Day of the year around which seasonal demand peaks (early December)
+SEASONAL_PEAK_DAY = 340
+
+# SeedSequence spawn keys of the non-transaction random streams; transaction
+# batches use (start_id,), so these never collide with them
+USERS_STREAM = (0, 1)
+PRODUCTS_STREAM = (0, 2)
+POPULARITY_STREAM = (0, 3)
+
+# Retail price range of generated products relative to their tier's base price
+PRICE_SPREAD = (0.5, 2.0)
+
+
+def discounted_cents(initial_cents, discount_bp):
+    """Final cost in cents of a discount in basis points, rounded half up with integer math"""
+    return (initial_cents * (10000 - discount_bp) + 5000) // 10000
+
+
+def batch_rng(seed, start_id):
+    """RNG for the batch starting at start_id, so every batch can be regenerated on its own
+    
+    Batches are keyed by their first transaction_id, so the rows depend on the seed
+    and on batch_size: the same seed with another batch_size draws other rows.
+    """
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(start_id,)))
+
+
+def stream_rng(seed, stream):
+    """RNG of one of the *_STREAM random streams"""
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=stream))
+
+
+def popularity_cdf(size, skew, seed=None):
+    """Cumulative Zipf selection probabilities of `size` keys ranked in a seeded random order
+    
+    The key of rank r is drawn with probability proportional to 1 / r ** skew, so
+    a few hot keys take most of the draws (skew=0 is uniform). Ranks are shuffled
+    so hot keys are spread over the id range like in real data.
+    """
+    ranks = stream_rng(seed, POPULARITY_STREAM + (size,)).permutation(size) + 1
+    cdf = np.cumsum(1.0 / ranks.astype(np.float64) ** skew)
+    return cdf / cdf[-1]
+
+
+def seasonal_cdf(start_day, num_days, seasonality):
+    """Cumulative probabilities of num_days days from start_day with a yearly peak
+    
+    Day weights are 1 + seasonality * cos(...) around SEASONAL_PEAK_DAY, so with
+    seasonality=0.5 the peak season sells three times as much as the off season.
+    """
+    if not 0 <= seasonality <= 1:
+        raise ValueError("seasonality must be between 0 and 1")
+    
+    days = start_day + np.arange(num_days)
+    day_of_year = (days - days.astype("datetime64[Y]")).astype(np.int64) + 1
+    weights = 1 + seasonality * np.cos(2 * np.pi * (day_of_year - SEASONAL_PEAK_DAY) / 365.25)
+    cdf = np.cumsum(weights)
+    return cdf / cdf[-1]
+
+
+def draw_indexes(rng, cdf, size):
+    """Indexes drawn from a cumulative distribution"""
+    return np.minimum(np.searchsorted(cdf, rng.random(size), side="right"), len(cdf) - 1)
+
+
+def build_transaction_batch(dimensions, start_id, size, seed=None):
+    """Draw `size` transactions starting at `start_id` as a list of row tuples
+    
+    The rows depend on the seed and on the batch boundaries (see batch_rng), not
+    on which process draws the batch.
+    """
+    rng = batch_rng(seed, start_id)
+    
+    # Zipf-skewed picks when popularity CDFs are set, uniform otherwise
+    if dimensions.get("product_cdf") is not None:
+        product_idx = draw_indexes(rng, dimensions["product_cdf"], size)
+    else:
+        product_idx = rng.integers(0, len(dimensions["product_id"]), size)
+    if dimensions.get("user_cdf") is not None:
+        user_idx = draw_indexes(rng, dimensions["user_cdf"], size)
+    else:
+        user_idx = rng.integers(0, len(dimensions["user_id"]), size)
+    
+    retail_cost = dimensions["retail_cost"][product_idx]
+    tier = dimensions["tier"][product_idx]
+    user_discount_tier = dimensions["discount_tier"][user_idx]
+    
+    # Same rules as generate_transactions: the user's discount is applied only if it
+    # fits into the product margin, with probability 0.2 + tier * 0.25
+    eligible = (user_discount_tier > 0) & (user_discount_tier <= dimensions["margin_pct"][product_idx])
+    applied = eligible & (rng.random(size) < 0.2 + tier * 0.25)
+    applied_discount = np.where(applied, user_discount_tier, 0)
+    
+    if dimensions["cents"]:
+        initial_cost = retail_cost
+        applied_discount = applied_discount * BASIS_POINTS_PER_PERCENT
+        final_cost = discounted_cents(retail_cost, applied_discount)
+    else:
+        initial_cost = np.round(retail_cost, 2)
+        final_cost = np.round(retail_cost * (1 - applied_discount / 100), 2)
+    
+    if dimensions.get("day_cdf") is not None:
+        random_days = draw_indexes(rng, dimensions["day_cdf"], size)
+    else:
+        random_days = rng.integers(0, dimensions["days_between"] + 1, size)
+    dates = dimensions["start_day"] + random_days
+    
+    if dimensions["day_numbers"]:
+        dates = dates.astype(np.int64)
+    else:
+        dates = np.datetime_as_string(dates, unit="D")
+    
+    transaction_ids = np.arange(start_id, start_id + size)
+    
+    return list(zip(
+        transaction_ids.tolist(),
+        dimensions["product_id"][product_idx].tolist(),
+        dimensions["user_id"][user_idx].tolist(),
+        dates.tolist(),
+        initial_cost.tolist(),
+        applied_discount.tolist(),
+        final_cost.tolist()
+    ))
+
+
+def generate_shard(shard_path, table_sql, dimensions, start_id, count, seed=None,
+                   batch_size=DEFAULT_BATCH_SIZE):
+    """Worker: generate one transaction_id range into its own shard database"""
+    conn = sqlite3.connect(shard_path)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute(table_sql)
+    cursor = conn.cursor()
+    
+    last_id = start_id + count
+    for batch_start in range(start_id, last_id, batch_size):
+        size = min(batch_size, last_id - batch_start)
+        cursor.executemany(TRANSACTION_INSERT_SQL, build_transaction_batch(dimensions, batch_start, size, seed))
+    
+    conn.commit()
+    conn.close()
+    return shard_path
+
+
+def shard_ranges(start_id, num_transactions, shards, batch_size=DEFAULT_BATCH_SIZE):
+    """Split num_transactions ids into up to `shards` disjoint (start_id, count) ranges
+    
+    Ranges are aligned to batch_size, so every shard draws exactly the batches a
+    single-process run would draw for the same seed. No transactions give no ranges.
+    """
+    if num_transactions <= 0:
+        return []
+    
+    num_batches = -(-num_transactions // batch_size)
+    batches_per_shard = -(-num_batches // shards)
+    shard_size = batches_per_shard * batch_size
+    last_id = start_id + num_transactions
+    
+    return [
+        (shard_start, min(shard_size, last_id - shard_start))
+        for shard_start in range(start_id, last_id, shard_size)
+    ]
+
+
 class DataGenerator:
-    def __init__(self, db_connection):
+    def __init__(self, db_connection, user_skew=0.0, product_skew=0.0, seasonality=0.0,
+                 history_days=180):
         self.conn = db_connection
         self.cursor = db_connection.cursor()
         
+        # Zipf exponents of user/product selection and the seasonal amplitude of
+        # transaction dates in the vectorized generators (0 = uniform)
+        self.user_skew = user_skew
+        self.product_skew = product_skew
+        self.seasonality = seasonality
+        
+        # Transactions are dated within the last history_days days
+        self.history_days = history_days
+        
         # Product tiers configuration with clean prices
         self.product_tiers = {
             1: {"production_cost": 20.00, "retail_cost": 25.00, "margin": 0.20},  # $20 cost, $25 retail
@@ -30,11 +224,15 @@ class DataGenerator:
     def generate_products(self):
         """Generate 3 products (1 per tier)"""
         products = []
+        cents = bool(schema_flags(self.conn) & SCHEMA_CENTS)
         
         for tier in [1, 2, 3]:
             tier_config = self.product_tiers[tier]
             production_cost = tier_config["production_cost"]
             retail_cost = tier_config["retail_cost"]
+            if cents:
+                production_cost = round(production_cost * CENTS_PER_UNIT)
+                retail_cost = round(retail_cost * CENTS_PER_UNIT)
             name = f"{self.product_names[tier]} (Tier {tier})"
             
             products.append((tier, name, production_cost, retail_cost, tier))
@@ -74,6 +272,71 @@ class DataGenerator:
         self.conn.commit()
         print(f"Generated {len(users)} users")
     
+    def generate_products_vectorized(self, products_per_tier=10000, seed=None):
+        """Generate products_per_tier products in every tier with NumPy
+        
+        Retail prices spread over PRICE_SPREAD times the tier's base price and
+        production costs keep the tier margin, so the discount rules still hold.
+        """
+        cents = bool(schema_flags(self.conn) & SCHEMA_CENTS)
+        rng = stream_rng(seed, PRODUCTS_STREAM)
+        self.cursor.execute("SELECT COALESCE(MAX(product_id), 0) FROM products")
+        next_id = self.cursor.fetchone()[0] + 1
+        
+        if not self.conn.in_transaction:
+            self.cursor.execute("BEGIN")
+        for tier, tier_config in self.product_tiers.items():
+            retail_cost = tier_config["retail_cost"] * rng.uniform(*PRICE_SPREAD, products_per_tier)
+            production_cost = retail_cost * (1 - tier_config["margin"])
+            if cents:
+                retail_cost = np.round(retail_cost * CENTS_PER_UNIT).astype(np.int64)
+                production_cost = np.round(production_cost * CENTS_PER_UNIT).astype(np.int64)
+            else:
+                retail_cost = np.round(retail_cost, 2)
+                production_cost = np.round(production_cost, 2)
+            
+            product_ids = range(next_id, next_id + products_per_tier)
+            names = [f"{self.product_names[tier]} #{i} (Tier {tier})" for i in range(1, products_per_tier + 1)]
+            self.cursor.executemany('''
+                INSERT INTO products (product_id, name, production_cost, retail_cost, tier)
+                VALUES (?, ?, ?, ?, ?)
+            ''', zip(product_ids, names, production_cost.tolist(), retail_cost.tolist(),
+                     [tier] * products_per_tier))
+            next_id += products_per_tier
+        
+        self.conn.commit()
+        print(f"Generated {products_per_tier * len(self.product_tiers)} products")
+    
+    def generate_users_vectorized(self, num_users=1_000_000, seed=None, batch_size=DEFAULT_BATCH_SIZE):
+        """Generate num_users users with NumPy, in the regional mix of generate_users"""
+        rng = stream_rng(seed, USERS_STREAM)
+        regions = np.array(self.regions)
+        region_weights = np.array([8 if region in ["USA", "UK"] else 6 for region in self.regions], dtype=float)
+        region_weights /= region_weights.sum()
+        
+        self.cursor.execute("SELECT COALESCE(MAX(user_id), 0) FROM users")
+        first_id = self.cursor.fetchone()[0] + 1
+        last_id = first_id + num_users
+        width = max(3, len(str(last_id - 1)))
+        
+        if not self.conn.in_transaction:
+            self.cursor.execute("BEGIN")
+        for batch_start in range(first_id, last_id, batch_size):
+            size = min(batch_size, last_id - batch_start)
+            user_ids = range(batch_start, batch_start + size)
+            geo = regions[rng.choice(len(regions), size, p=region_weights)].tolist()
+            age = rng.integers(18, 66, size).tolist()
+            discount_tier = rng.choice(self.discount_tiers, size).tolist()
+            names = [f"User_{user_id:0{width}d}_{region}" for user_id, region in zip(user_ids, geo)]
+            
+            self.cursor.executemany('''
+                INSERT INTO users (user_id, name, age, geo, discount_tier)
+                VALUES (?, ?, ?, ?, ?)
+            ''', zip(user_ids, names, age, geo, discount_tier))
+        
+        self.conn.commit()
+        print(f"Generated {num_users} users")
+    
     def generate_transactions(self, num_transactions=1000):
         """Generate smart transactions that demonstrate discount effectiveness"""
         transactions = []
@@ -85,9 +348,14 @@ class DataGenerator:
         self.cursor.execute("SELECT user_id, discount_tier FROM users")
         users = self.cursor.fetchall()
         
-        # Date range: last 6 months
+        # Date range: last history_days days (6 months by default)
         end_date = datetime.now()
-        start_date = end_date - timedelta(days=180)
+        start_date = end_date - timedelta(days=self.history_days)
+        
+        # Analytics schema stores dates as integer day numbers
+        day_numbers = bool(schema_flags(self.conn) & SCHEMA_ANALYTICS)
+        cents = bool(schema_flags(self.conn) & SCHEMA_CENTS)
+        epoch = datetime(1970, 1, 1).date()
         
         for transaction_id in range(1, num_transactions + 1):
             # Select random product and user
@@ -121,30 +389,166 @@ class DataGenerator:
             
             # Calculate costs
             initial_cost = retail_cost
-            final_cost = initial_cost * (1 - applied_discount / 100)
+            if cents:
+                applied_discount *= BASIS_POINTS_PER_PERCENT
+                final_cost = discounted_cents(initial_cost, applied_discount)
+            else:
+                final_cost = round(initial_cost * (1 - applied_discount / 100), 2)
+                initial_cost = round(initial_cost, 2)
             
             # Random date within range
             days_between = (end_date - start_date).days
             random_days = random.randint(0, days_between)
-            transaction_date = start_date + timedelta(days=random_days)
+            transaction_date = (start_date + timedelta(days=random_days)).date()
+            if day_numbers:
+                transaction_date = (transaction_date - epoch).days
             
             transactions.append((
                 transaction_id,
                 product_id,
                 user_id,
-                transaction_date.date(),
-                round(initial_cost, 2),
+                transaction_date,
+                initial_cost,
                 applied_discount,
-                round(final_cost, 2)
+                final_cost
             ))
         
         # Insert transactions
-        self.cursor.executemany('''
-            INSERT INTO transactions 
-            (transaction_id, product_id, user_id, transaction_date, 
-             initial_cost, applied_discount, final_cost)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', transactions)
+        insert_transactions(self.cursor, transactions)
         
         self.conn.commit()
         print(f"Generated {len(transactions)} transactions")
+    
+    def transaction_dimensions(self, end_date=None, seed=None):
+        """Load products, users and the date range as NumPy arrays for vectorized generation
+        
+        With user_skew, product_skew or seasonality set, the selection CDFs are
+        added as user_cdf, product_cdf and day_cdf.
+        """
+        self.cursor.execute("SELECT product_id, retail_cost, tier FROM products ORDER BY product_id")
+        products = self.cursor.fetchall()
+        
+        self.cursor.execute("SELECT user_id, discount_tier FROM users ORDER BY user_id")
+        users = self.cursor.fetchall()
+        
+        if not products or not users:
+            raise ValueError("Products and users must be generated before transactions")
+        
+        product_id, retail_cost, tier = (np.array(column) for column in zip(*products))
+        user_id, discount_tier = (np.array(column) for column in zip(*users))
+        margin_pct = np.array([self.product_tiers[t]["margin"] * 100 for t in tier.tolist()])
+        cents = bool(schema_flags(self.conn) & SCHEMA_CENTS)
+        
+        # Date range: last history_days days (6 months by default)
+        end_date = end_date or datetime.now()
+        start_date = end_date - timedelta(days=self.history_days)
+        start_day = np.datetime64(start_date.date(), "D")
+        days_between = (end_date - start_date).days
+        
+        return {
+            "product_id": product_id,
+            "retail_cost": retail_cost.astype(np.int64 if cents else np.float64),
+            "tier": tier,
+            "margin_pct": margin_pct,
+            "user_id": user_id,
+            "discount_tier": discount_tier,
+            "start_day": start_day,
+            "days_between": days_between,
+            "day_numbers": bool(schema_flags(self.conn) & SCHEMA_ANALYTICS),
+            "cents": cents,
+            "user_cdf": popularity_cdf(len(user_id), self.user_skew, seed) if self.user_skew else None,
+            "product_cdf": popularity_cdf(len(product_id), self.product_skew, seed) if self.product_skew else None,
+            "day_cdf": seasonal_cdf(start_day, days_between + 1, self.seasonality) if self.seasonality else None
+        }
+    
+    def iter_transaction_batches(self, num_transactions=1000, seed=None,
+                                 batch_size=DEFAULT_BATCH_SIZE, start_id=1, end_date=None):
+        """Yield transactions in fixed-size batches of row tuples"""
+        dimensions = self.transaction_dimensions(end_date, seed)
+        last_id = start_id + num_transactions
+        
+        for batch_start in range(start_id, last_id, batch_size):
+            size = min(batch_size, last_id - batch_start)
+            yield build_transaction_batch(dimensions, batch_start, size, seed)
+    
+    def last_transaction_id(self):
+        """Last committed transaction_id (0 for an empty table), used as the load checkpoint"""
+        return max_transaction_id(self.conn)
+    
+    def generate_transactions_vectorized(self, num_transactions=1000, seed=None,
+                                         batch_size=DEFAULT_BATCH_SIZE, end_date=None,
+                                         rows_per_commit=DEFAULT_ROWS_PER_COMMIT, resume=False):
+        """Stream NumPy-generated batches into the database in explicit transactions
+        
+        Memory stays bounded by batch_size regardless of num_transactions. Every
+        rows_per_commit rows are committed, so with resume=True an interrupted load
+        continues after the last committed transaction_id (use the same seed and
+        batch_size to get the same rows as an uninterrupted run).
+        """
+        start_id = self.last_transaction_id() + 1 if resume else 1
+        remaining = num_transactions - (start_id - 1)
+        
+        if remaining <= 0:
+            print(f"All {num_transactions} transactions already generated")
+            return
+        
+        if start_id > 1:
+            print(f"Resuming after transaction_id {start_id - 1}")
+        
+        generated = 0
+        pending = 0
+        
+        for batch in self.iter_transaction_batches(remaining, seed, batch_size, start_id, end_date):
+            if not self.conn.in_transaction:
+                self.cursor.execute("BEGIN")
+            
+            insert_transactions(self.cursor, batch)
+            generated += len(batch)
+            pending += len(batch)
+            
+            if pending >= rows_per_commit:
+                self.conn.commit()
+                pending = 0
+        
+        self.conn.commit()
+        print(f"Generated {generated} transactions")
+    
+    def generate_transactions_parallel(self, num_transactions=1000, seed=None, shards=None,
+                                       batch_size=DEFAULT_BATCH_SIZE, end_date=None,
+                                       workers=None, shard_dir=None):
+        """Generate transactions in a process pool, one shard database per worker
+        
+        The transaction_id space is split into disjoint ranges, every worker writes its
+        range into its own SQLite file and the shards are then merged with ATTACH +
+        INSERT ... SELECT. Output depends on seed and batch_size, not on shards or workers.
+        """
+        shards = shards or os.cpu_count() or 1
+        dimensions = self.transaction_dimensions(end_date, seed)
+        start_id = self.last_transaction_id() + 1
+        
+        # Shards reuse the exact transactions schema of the target database
+        table_sql = transactions_table_sql(self.conn)
+        
+        ranges = shard_ranges(start_id, num_transactions, shards, batch_size)
+        if not ranges:
+            print("No transactions to generate")
+            return
+        
+        with tempfile.TemporaryDirectory(dir=shard_dir) as tmp_dir:
+            with ProcessPoolExecutor(max_workers=workers or len(ranges)) as pool:
+                futures = [
+                    pool.submit(generate_shard, os.path.join(tmp_dir, f"shard_{i:04d}.db"),
+                                table_sql, dimensions, shard_start, count, seed, batch_size)
+                    for i, (shard_start, count) in enumerate(ranges)
+                ]
+                shard_paths = [future.result() for future in futures]
+            
+            # Merge in id order; ATTACH is not allowed inside a transaction
+            self.conn.commit()
+            for shard_path in shard_paths:
+                self.cursor.execute("ATTACH DATABASE ? AS shard", (shard_path,))
+                copy_transactions(self.conn, "shard.transactions")
+                self.conn.commit()
+                self.cursor.execute("DETACH DATABASE shard")
+        
+        print(f"Generated {num_transactions} transactions in {len(ranges)} shards")
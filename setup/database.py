@@ -1,5 +1,346 @@
+import functools
+import re
 import sqlite3
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+
+
+# Schema mode flags stored in PRAGMA user_version
+SCHEMA_ANALYTICS = 1  # transaction_date stored as integer day number (days since 1970-01-01)
+SCHEMA_CENTS = 2  # money stored as INTEGER cents, applied_discount as INTEGER basis points
+SCHEMA_PARTITIONED = 4  # transactions is a UNION ALL view over per-month tables
+
+EPOCH = date(1970, 1, 1)
+
+# Stored units per presentation unit with SCHEMA_CENTS
+CENTS_PER_UNIT = 100
+BASIS_POINTS_PER_PERCENT = 100
+
+# Covering indexes for the EcommerceAnalyzer joins and date-range filters
+ANALYTICS_INDEXES = [
+    '''CREATE INDEX IF NOT EXISTS idx_transactions_user_cost
+       ON transactions (user_id, final_cost, applied_discount, initial_cost)''',
+    '''CREATE INDEX IF NOT EXISTS idx_transactions_product_cost
+       ON transactions (product_id, final_cost)''',
+    '''CREATE INDEX IF NOT EXISTS idx_transactions_date
+       ON transactions (transaction_date)''',
+    '''CREATE INDEX IF NOT EXISTS idx_transactions_user_date
+       ON transactions (user_id, transaction_date, transaction_id, final_cost, applied_discount)'''
+]
+
+# Column order of transaction row tuples (as inserted by DataGenerator)
+TRANSACTION_COLUMNS = [
+    "transaction_id", "product_id", "user_id", "transaction_date",
+    "initial_cost", "applied_discount", "final_cost"
+]
+
+TRANSACTION_INSERT_SQL = '''
+    INSERT INTO transactions 
+    (transaction_id, product_id, user_id, transaction_date, 
+     initial_cost, applied_discount, final_cost)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+
+# Month partitions of transactions with SCHEMA_PARTITIONED. first_date (inclusive)
+# and end_date (exclusive) are in the stored transaction_date format; new
+# partitions are created from the CREATE TABLE template in partition_template.
+PARTITION_TABLES_SQL = '''
+    CREATE TABLE IF NOT EXISTS transaction_partitions (
+        month TEXT PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE,
+        first_date NOT NULL,
+        end_date NOT NULL
+    );
+    
+    CREATE TABLE IF NOT EXISTS partition_template (
+        table_sql TEXT NOT NULL
+    );
+'''
+
+# Table names of the month partitions (transactions_YYYY_MM)
+PARTITION_GLOB = "transactions_[0-9][0-9][0-9][0-9]_[0-9][0-9]"
+
+# Daily rollups of transactions for the analysis reports, refreshed incrementally
+# from the last rolled-up transaction_id (see EcommerceAnalyzer.refresh_rollups).
+# Sums are kept in the storage units of the schema (cents and basis points with
+# SCHEMA_CENTS) and converted when the rollups are read.
+ROLLUP_TABLES_SQL = '''
+    CREATE TABLE IF NOT EXISTS daily_rollup (
+        transaction_date DATE NOT NULL,
+        product_id INTEGER NOT NULL,
+        geo TEXT NOT NULL,
+        discount_tier INTEGER NOT NULL,
+        applied_discount REAL NOT NULL,
+        transaction_count INTEGER NOT NULL,
+        total_revenue REAL NOT NULL,
+        total_discount_given REAL NOT NULL,
+        PRIMARY KEY (transaction_date, product_id, geo, discount_tier, applied_discount)
+    );
+    
+    CREATE TABLE IF NOT EXISTS rollup_state (
+        name TEXT PRIMARY KEY,
+        last_transaction_id INTEGER NOT NULL
+    );
+'''
+
+# Stratified sample and distinct-user sketches for approximate reports, maintained
+# incrementally from the last sampled transaction_id (see setup/approximate.py)
+APPROXIMATE_TABLES_SQL = '''
+    CREATE TABLE IF NOT EXISTS approx_sample (
+        transaction_id INTEGER PRIMARY KEY,
+        priority REAL NOT NULL,
+        product_tier INTEGER NOT NULL,
+        geo TEXT NOT NULL,
+        discount_tier INTEGER NOT NULL,
+        product_id INTEGER NOT NULL,
+        transaction_date DATE NOT NULL,
+        initial_cost REAL NOT NULL,
+        applied_discount REAL NOT NULL,
+        final_cost REAL NOT NULL
+    );
+    
+    CREATE TABLE IF NOT EXISTS approx_strata (
+        product_tier INTEGER NOT NULL,
+        geo TEXT NOT NULL,
+        population INTEGER NOT NULL,
+        PRIMARY KEY (product_tier, geo)
+    );
+    
+    CREATE TABLE IF NOT EXISTS approx_sketches (
+        geo TEXT NOT NULL,
+        discount_tier INTEGER NOT NULL,
+        product_tier INTEGER NOT NULL,
+        month TEXT NOT NULL,
+        registers BLOB NOT NULL,
+        PRIMARY KEY (geo, discount_tier, product_tier, month)
+    );
+    
+    CREATE TABLE IF NOT EXISTS approx_state (
+        sample_size INTEGER NOT NULL,
+        last_transaction_id INTEGER NOT NULL
+    );
+'''
+
+# Snapshots of the streaming aggregator cube (see setup/streaming.py)
+STREAM_TABLES_SQL = '''
+    CREATE TABLE IF NOT EXISTS stream_cube (
+        product_id INTEGER NOT NULL,
+        geo TEXT NOT NULL,
+        discount_tier INTEGER NOT NULL,
+        applied_discount REAL NOT NULL,
+        transaction_count INTEGER NOT NULL,
+        total_revenue REAL NOT NULL,
+        total_discount_given REAL NOT NULL,
+        PRIMARY KEY (product_id, geo, discount_tier, applied_discount)
+    );
+    
+    CREATE TABLE IF NOT EXISTS stream_state (
+        events INTEGER NOT NULL,
+        last_transaction_id INTEGER,
+        updated_at TEXT NOT NULL
+    );
+'''
+
+
+def schema_flags(conn):
+    """Return the schema mode flags of an open database"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def stored_date(value, flags=0):
+    """A date in the stored transaction_date format of the schema (day number or ISO text)"""
+    if flags & SCHEMA_ANALYTICS:
+        return (value - EPOCH).days
+    return value.isoformat()
+
+
+@functools.lru_cache(maxsize=None)
+def _day_month(day):
+    return (EPOCH + timedelta(days=day)).strftime("%Y-%m")
+
+
+def partition_month(value, flags=0):
+    """Month ('YYYY-MM') of a stored transaction_date, i.e. the partition it belongs to"""
+    if flags & SCHEMA_ANALYTICS:
+        return _day_month(value)
+    return str(value)[:7]
+
+
+def partition_name(month):
+    """Table name of a month partition"""
+    return "transactions_" + month.replace("-", "_")
+
+
+def _sql_literal(value):
+    """Stored date bound as an SQL literal (trigger and CHECK bodies cannot bind parameters)"""
+    return f"'{value}'" if isinstance(value, str) else str(value)
+
+
+def transaction_partitions(conn):
+    """(name, first_date, end_date) of every month partition in date order, [] when unpartitioned"""
+    if not schema_flags(conn) & SCHEMA_PARTITIONED:
+        return []
+    return conn.execute(
+        "SELECT name, first_date, end_date FROM transaction_partitions ORDER BY first_date"
+    ).fetchall()
+
+
+def rebuild_partition_view(conn):
+    """Recreate the transactions view over the current partitions and its insert trigger
+    
+    The INSTEAD OF trigger routes ad-hoc INSERTs into transactions to their month
+    partition; bulk loads go through insert_transactions, which is much faster.
+    The aggregate reports do not read through the view: joined to users/products
+    it is materialized first, so they group each partition on its own
+    (queries.partitioned_query).
+    """
+    partitions = transaction_partitions(conn)
+    
+    # Dropping the view drops its trigger as well
+    conn.execute("DROP VIEW IF EXISTS transactions")
+    if partitions:
+        select = "\n    UNION ALL\n    ".join(f"SELECT * FROM {name}" for name, _, _ in partitions)
+    else:
+        select = "SELECT " + ", ".join(f"NULL AS {column}" for column in TRANSACTION_COLUMNS) + " WHERE 0"
+    conn.execute(f"CREATE VIEW transactions AS\n    {select}")
+    
+    values = ", ".join(f"NEW.{column}" for column in TRANSACTION_COLUMNS)
+    routes = "".join(f'''
+        INSERT INTO {name} SELECT {values}
+        WHERE NEW.transaction_date >= {_sql_literal(first_date)} AND NEW.transaction_date < {_sql_literal(end_date)};'''
+        for name, first_date, end_date in partitions
+    )
+    conn.execute(f'''
+        CREATE TRIGGER transactions_insert INSTEAD OF INSERT ON transactions
+        BEGIN
+            SELECT RAISE(ABORT, 'No partition for transaction_date, see create_partition()')
+            WHERE NOT EXISTS (
+                SELECT 1 FROM transaction_partitions
+                WHERE first_date <= NEW.transaction_date AND end_date > NEW.transaction_date
+            );{routes}
+        END
+    ''')
+
+
+def create_partition(conn, month):
+    """Create the partition of a month ('YYYY-MM') if it is missing; returns its table name
+    
+    New partitions get the analytics indexes (deferred while a bulk load is
+    running) and are added to the transactions view.
+    """
+    name = partition_name(month)
+    if conn.execute("SELECT 1 FROM transaction_partitions WHERE month = ?", (month,)).fetchone():
+        return name
+    
+    flags = schema_flags(conn)
+    first = date.fromisoformat(f"{month}-01")
+    end = (first + timedelta(days=31)).replace(day=1)
+    first_date, end_date = stored_date(first, flags), stored_date(end, flags)
+    
+    table_sql = conn.execute("SELECT table_sql FROM partition_template").fetchone()[0]
+    check = (f",\n                CHECK (transaction_date >= {_sql_literal(first_date)}"
+             f" AND transaction_date < {_sql_literal(end_date)})")
+    conn.execute(table_sql.format(name=name, check=check))
+    
+    if flags & SCHEMA_ANALYTICS:
+        deferred = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'deferred_indexes'"
+        ).fetchone()
+        for index_sql in ANALYTICS_INDEXES:
+            index_sql = index_sql.replace("transactions", name)
+            if deferred:
+                index_name = re.search(r"EXISTS (\w+)", index_sql).group(1)
+                conn.execute("INSERT OR REPLACE INTO deferred_indexes (name, sql) VALUES (?, ?)",
+                             (index_name, index_sql))
+            else:
+                conn.execute(index_sql)
+    
+    conn.execute("INSERT INTO transaction_partitions (month, name, first_date, end_date) VALUES (?, ?, ?, ?)",
+                 (month, name, first_date, end_date))
+    rebuild_partition_view(conn)
+    return name
+
+
+def drop_partitions(conn, before):
+    """Drop every month partition that ends on or before `before` (ISO date); returns their names
+    
+    Retention without DELETE: a month goes with one DROP TABLE, whatever its size.
+    daily_rollup, the approximate sample and stream snapshots keep their aggregates.
+    """
+    cutoff = stored_date(date.fromisoformat(str(before)), schema_flags(conn))
+    names = [row[0] for row in conn.execute(
+        "SELECT name FROM transaction_partitions WHERE end_date <= ? ORDER BY first_date", (cutoff,)
+    ).fetchall()]
+    
+    if names:
+        if not conn.in_transaction:
+            conn.execute("BEGIN")
+        for name in names:
+            conn.execute(f"DROP TABLE {name}")
+            conn.execute("DELETE FROM transaction_partitions WHERE name = ?", (name,))
+        rebuild_partition_view(conn)
+        conn.commit()
+    return names
+
+
+def insert_transactions(cursor, rows):
+    """Insert transaction row tuples; partitioned schemas get them straight into their months
+    
+    Routing rows in Python keeps bulk loads at plain executemany speed (the view's
+    trigger evaluates every partition condition for every row).
+    """
+    flags = schema_flags(cursor.connection)
+    if not flags & SCHEMA_PARTITIONED:
+        cursor.executemany(TRANSACTION_INSERT_SQL, rows)
+        return
+    
+    by_month = {}
+    for row in rows:
+        by_month.setdefault(partition_month(row[3], flags), []).append(row)
+    
+    for month, month_rows in sorted(by_month.items()):
+        name = create_partition(cursor.connection, month)
+        cursor.executemany(TRANSACTION_INSERT_SQL.replace("transactions", name, 1), month_rows)
+
+
+def copy_transactions(conn, source):
+    """INSERT ... SELECT every row of another transactions table (e.g. an attached shard)"""
+    flags = schema_flags(conn)
+    if not flags & SCHEMA_PARTITIONED:
+        conn.execute(f"INSERT INTO transactions SELECT * FROM {source}")
+        return
+    
+    first_date, last_date = conn.execute(f"SELECT MIN(transaction_date), MAX(transaction_date) FROM {source}").fetchone()
+    if first_date is None:
+        return
+    
+    month = partition_month(first_date, flags)
+    while month <= partition_month(last_date, flags):
+        name = create_partition(conn, month)
+        bounds = conn.execute("SELECT first_date, end_date FROM transaction_partitions WHERE month = ?",
+                              (month,)).fetchone()
+        conn.execute(f'''
+            INSERT INTO {name} SELECT * FROM {source}
+            WHERE transaction_date >= ? AND transaction_date < ?
+        ''', bounds)
+        next_month = (date.fromisoformat(f"{month}-01") + timedelta(days=31)).replace(day=1)
+        month = next_month.strftime("%Y-%m")
+
+
+def transactions_table_sql(conn):
+    """CREATE TABLE statement of a standalone transactions table with this database's schema"""
+    if schema_flags(conn) & SCHEMA_PARTITIONED:
+        table_sql = conn.execute("SELECT table_sql FROM partition_template").fetchone()[0]
+        return table_sql.format(name="transactions", check="")
+    return conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'transactions'").fetchone()[0]
+
+
+def max_transaction_id(conn):
+    """Largest transaction_id (0 when empty), per partition so a partitioned view is never scanned"""
+    partitions = transaction_partitions(conn)
+    if not partitions:
+        return conn.execute("SELECT COALESCE(MAX(transaction_id), 0) FROM transactions").fetchone()[0]
+    return max(conn.execute(f"SELECT COALESCE(MAX(transaction_id), 0) FROM {name}").fetchone()[0]
+               for name, _, _ in partitions)
 
 
 class EcommerceDatabase:
@@ -14,48 +355,180 @@ class EcommerceDatabase:
         self.cursor = self.conn.cursor()
         print(f"Connected to database: {self.db_name}")
     
-    def create_tables(self):
-        """Create the three main tables"""
+    def create_tables(self, analytics_schema=False, strict=False, without_rowid=False,
+                      integer_cents=False, partitioned=False):
+        """Create the three main tables
+        
+        analytics_schema stores transaction_date as an integer day number and adds
+        covering indexes for the analysis queries; integer_cents stores money as
+        INTEGER cents and applied_discount as INTEGER basis points (exact sums,
+        varint-sized values); strict and without_rowid add the matching SQLite
+        table options. partitioned stores transactions in one table per month
+        behind a transactions view (see create_partition and drop_partitions).
+        """
+        table_options = []
+        if without_rowid:
+            table_options.append("WITHOUT ROWID")
+        if strict:
+            table_options.append("STRICT")
+        options = ", ".join(table_options)
+        
+        # STRICT tables only accept the basic storage types
+        if strict:
+            date_type = "INTEGER" if analytics_schema else "TEXT"
+        else:
+            date_type = "DATE"
+        
+        money_type = "INTEGER" if integer_cents else "REAL"
         
         # Products table
-        self.cursor.execute('''
+        self.cursor.execute(f'''
             CREATE TABLE IF NOT EXISTS products (
                 product_id INTEGER PRIMARY KEY,
                 name TEXT NOT NULL,
-                production_cost REAL NOT NULL,
-                retail_cost REAL NOT NULL,
+                production_cost {money_type} NOT NULL,
+                retail_cost {money_type} NOT NULL,
                 tier INTEGER NOT NULL
-            )
+            ) {options}
         ''')
         
         # Users table
-        self.cursor.execute('''
+        self.cursor.execute(f'''
             CREATE TABLE IF NOT EXISTS users (
                 user_id INTEGER PRIMARY KEY,
                 name TEXT NOT NULL,
                 age INTEGER NOT NULL,
                 geo TEXT NOT NULL,
                 discount_tier INTEGER NOT NULL
-            )
+            ) {options}
         ''')
         
-        # Transactions table
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS transactions (
+        # Transactions table (or the template of its month partitions)
+        transactions_sql = f'''
+            CREATE TABLE IF NOT EXISTS {{name}} (
                 transaction_id INTEGER PRIMARY KEY,
                 product_id INTEGER NOT NULL,
                 user_id INTEGER NOT NULL,
-                transaction_date DATE NOT NULL,
-                initial_cost REAL NOT NULL,
-                applied_discount REAL NOT NULL,
-                final_cost REAL NOT NULL,
+                transaction_date {date_type} NOT NULL,
+                initial_cost {money_type} NOT NULL,
+                applied_discount {money_type} NOT NULL,
+                final_cost {money_type} NOT NULL,
                 FOREIGN KEY (product_id) REFERENCES products (product_id),
-                FOREIGN KEY (user_id) REFERENCES users (user_id)
+                FOREIGN KEY (user_id) REFERENCES users (user_id){{check}}
+            ) {options}
+        '''
+        if not partitioned:
+            self.cursor.execute(transactions_sql.format(name="transactions", check=""))
+        
+        flags = 0
+        if analytics_schema:
+            if not partitioned:
+                for index_sql in ANALYTICS_INDEXES:
+                    self.cursor.execute(index_sql)
+            flags |= SCHEMA_ANALYTICS
+        if integer_cents:
+            flags |= SCHEMA_CENTS
+        if partitioned:
+            flags |= SCHEMA_PARTITIONED
+        
+        # Written even when 0, so a recreated plain schema drops flags left by an earlier one
+        self.cursor.execute(f"PRAGMA user_version = {flags}")
+        
+        if partitioned:
+            self.cursor.executescript(PARTITION_TABLES_SQL)
+            self.cursor.execute("DELETE FROM partition_template")
+            self.cursor.execute("INSERT INTO partition_template (table_sql) VALUES (?)", (transactions_sql,))
+            rebuild_partition_view(self.conn)
+        
+        self.conn.commit()
+        print("Tables created successfully!")
+    
+    def create_rollup_tables(self):
+        """Create the daily rollup table and its watermark table"""
+        self.cursor.executescript(ROLLUP_TABLES_SQL)
+        self.conn.commit()
+    
+    def create_approximate_tables(self):
+        """Create the approximate-mode sample, strata, sketch and state tables"""
+        self.cursor.executescript(APPROXIMATE_TABLES_SQL)
+        self.conn.commit()
+    
+    def create_partition(self, month):
+        """Create the transactions partition of a month ('YYYY-MM') ahead of loading it"""
+        name = create_partition(self.conn, month)
+        self.conn.commit()
+        return name
+    
+    def drop_partitions(self, before):
+        """Retention: drop the month partitions that end on or before `before`"""
+        names = drop_partitions(self.conn, before)
+        print(f"Dropped {len(names)} partitions")
+        return names
+    
+    def insert_transactions(self, rows):
+        """Insert transaction row tuples (routed to their month partitions when partitioned)"""
+        insert_transactions(self.cursor, rows)
+        self.conn.commit()
+    
+    def analyze_statistics(self):
+        """Refresh planner statistics (run after loading data)"""
+        self.cursor.execute("ANALYZE")
+        self.conn.commit()
+    
+    def enable_wal(self):
+        """Switch to WAL so readers keep working while a writer appends (persists in the file)"""
+        # journal_mode cannot be changed inside a transaction
+        self.conn.commit()
+        self.cursor.execute("PRAGMA journal_mode=WAL").fetchone()
+    
+    def begin_bulk_load(self, cache_size_mb=256):
+        """Apply bulk-load pragmas and defer index maintenance until end_bulk_load()"""
+        self.enable_wal()
+        self.cursor.execute("PRAGMA synchronous=OFF")
+        self.cursor.execute(f"PRAGMA cache_size=-{cache_size_mb * 1024}")
+        self.cursor.execute("PRAGMA temp_store=MEMORY")
+        
+        # Drop secondary indexes on transactions and keep their definitions in the same
+        # transaction, so an interrupted load can still restore them later
+        self.cursor.execute("BEGIN")
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS deferred_indexes (
+                name TEXT PRIMARY KEY,
+                sql TEXT NOT NULL
             )
         ''')
+        self.cursor.execute('''
+            SELECT name, sql FROM sqlite_master
+            WHERE type = 'index' AND (tbl_name = 'transactions' OR tbl_name GLOB ?) AND sql IS NOT NULL
+        ''', (PARTITION_GLOB,))
+        indexes = self.cursor.fetchall()
+        
+        for name, sql in indexes:
+            self.cursor.execute("INSERT OR REPLACE INTO deferred_indexes (name, sql) VALUES (?, ?)", (name, sql))
+            self.cursor.execute(f"DROP INDEX {name}")
         
         self.conn.commit()
-        print("Tables created successfully!")
+        print(f"Bulk load started ({len(indexes)} indexes deferred)")
+    
+    def end_bulk_load(self):
+        """Recreate deferred indexes and restore durable pragmas"""
+        self.conn.commit()
+        self.cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'deferred_indexes'")
+        
+        if self.cursor.fetchone():
+            self.cursor.execute("BEGIN")
+            self.cursor.execute("SELECT sql FROM deferred_indexes")
+            for (sql,) in self.cursor.fetchall():
+                self.cursor.execute(sql)
+            self.cursor.execute("DROP TABLE deferred_indexes")
+            self.conn.commit()
+        
+        # NORMAL is durable enough in WAL mode and much faster than FULL
+        self.cursor.execute("PRAGMA synchronous=NORMAL")
+        
+        if schema_flags(self.conn) & SCHEMA_ANALYTICS:
+            self.analyze_statistics()
+        print("Bulk load finished")
     
     def close(self):
         """Close database connection"""
@@ -0,0 +1,157 @@
+import contextlib
+import hashlib
+import io
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    from .data_generators import DataGenerator
+    from .database import EcommerceDatabase
+except ImportError:
+    from data_generators import DataGenerator
+    from database import EcommerceDatabase
+
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "ECOMMERCE_FIXTURE_CACHE",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".fixture_cache")
+)
+
+# Linux ioctl that shares the source extents (copy-on-write) on btrfs/XFS
+FICLONE = 0x40049409
+
+
+def schema_version(**schema_options):
+    """Fingerprint of the DDL create_tables() produces for the given options"""
+    conn = sqlite3.connect(":memory:")
+    try:
+        db = EcommerceDatabase(":memory:")
+        db.conn = conn
+        db.cursor = conn.cursor()
+        with contextlib.redirect_stdout(io.StringIO()):
+            db.create_tables(**schema_options)
+            # Month partitions (and their indexes) are created from templates while loading
+            if schema_options.get("partitioned"):
+                db.create_partition("2000-01")
+        
+        ddl = conn.execute("SELECT sql FROM sqlite_master WHERE sql IS NOT NULL ORDER BY name").fetchall()
+        user_version = conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
+    
+    return hashlib.sha1(repr((ddl, user_version)).encode()).hexdigest()[:12]
+
+
+def generator_version():
+    """Fingerprint of the generator code, so changed generation rules rebuild fixtures"""
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "data_generators.py"), "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()[:12]
+
+
+def build_database(db_name, seed, num_transactions, **schema_options):
+    """Build a database the same way for every fixture: seeded users, vectorized transactions"""
+    random.seed(seed)
+    
+    db = EcommerceDatabase(db_name)
+    db.connect()
+    db.create_tables(**schema_options)
+    
+    generator = DataGenerator(db.conn)
+    generator.generate_products()
+    generator.generate_users()
+    
+    db.begin_bulk_load()
+    generator.generate_transactions_vectorized(num_transactions, seed=seed)
+    db.end_bulk_load()
+    
+    # Fold the WAL into the main file so the file alone is a complete copy
+    db.cursor.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+    db.close()
+
+
+def copy_database(source, destination, method="copy"):
+    """Copy a database file by reflink (when supported) or plain copy, or via the backup API"""
+    if method == "backup":
+        src = sqlite3.connect(source)
+        dst = sqlite3.connect(destination)
+        try:
+            src.backup(dst)
+        finally:
+            dst.close()
+            src.close()
+        return
+    
+    with open(source, "rb") as src, open(destination, "wb") as dst:
+        if fcntl is not None:
+            try:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                return
+            except OSError:
+                pass
+        shutil.copyfileobj(src, dst, 16 * 1024 * 1024)
+
+
+class FixtureCache:
+    """Built databases cached on (schema version, generator seed, row counts)
+    
+    Every fixture is built once and then restored into a fresh path per test or
+    benchmark, so parallel runs work on isolated copies of the same data.
+    """
+    
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+    
+    def key(self, seed, num_transactions, **schema_options):
+        """Cache key of a fixture"""
+        options = ",".join(f"{name}={value}" for name, value in sorted(schema_options.items()) if value)
+        parts = (schema_version(**schema_options), generator_version(), seed, num_transactions, options)
+        return hashlib.sha1(repr(parts).encode()).hexdigest()[:16]
+    
+    def path(self, seed, num_transactions, **schema_options):
+        """Cached database file of a fixture, built on first use"""
+        path = os.path.join(self.cache_dir, f"{self.key(seed, num_transactions, **schema_options)}.db")
+        
+        if not os.path.exists(path):
+            # Build next to the cache entry and rename, so concurrent runs never see half a file
+            fd, tmp_path = tempfile.mkstemp(suffix=".db", dir=self.cache_dir)
+            os.close(fd)
+            os.remove(tmp_path)
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    build_database(tmp_path, seed, num_transactions, **schema_options)
+                os.replace(tmp_path, path)
+            finally:
+                for leftover in (tmp_path, tmp_path + "-wal", tmp_path + "-shm"):
+                    if os.path.exists(leftover):
+                        os.remove(leftover)
+        return path
+    
+    def restore(self, destination, seed, num_transactions, method="copy", **schema_options):
+        """Restore a fixture into destination (replacing it) and return destination"""
+        for stale in (destination, destination + "-wal", destination + "-shm"):
+            if os.path.exists(stale):
+                os.remove(stale)
+        copy_database(self.path(seed, num_transactions, **schema_options), destination, method)
+        return destination
+    
+    @contextlib.contextmanager
+    def temp_copy(self, seed, num_transactions, method="copy", **schema_options):
+        """Context manager yielding the path of a private copy in a temporary directory"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            yield self.restore(os.path.join(tmp_dir, "ecommerce.db"), seed, num_transactions,
+                               method, **schema_options)
+    
+    def clear(self):
+        """Remove every cached fixture"""
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".db"):
+                os.remove(os.path.join(self.cache_dir, name))
@@ -0,0 +1,214 @@
+import os
+import sqlite3
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+try:
+    from .database import (BASIS_POINTS_PER_PERCENT, CENTS_PER_UNIT, SCHEMA_ANALYTICS, SCHEMA_CENTS,
+                           schema_flags)
+except ImportError:
+    from database import (BASIS_POINTS_PER_PERCENT, CENTS_PER_UNIT, SCHEMA_ANALYTICS, SCHEMA_CENTS,
+                          schema_flags)
+
+
+TRANSACTIONS_SCHEMA = pa.schema([
+    ("transaction_id", pa.int64()),
+    ("product_id", pa.int32()),
+    ("user_id", pa.int32()),
+    ("transaction_date", pa.date32()),
+    ("initial_cost", pa.float64()),
+    ("applied_discount", pa.float64()),
+    ("final_cost", pa.float64()),
+    ("month", pa.string())
+])
+
+# Columns the report cube needs; everything else is pruned from the scan
+CUBE_COLUMNS = ["product_id", "user_id", "applied_discount", "initial_cost", "final_cost"]
+
+CUBE_KEYS = ["product_id", "geo", "discount_tier", "applied_discount"]
+
+# Money columns of products, exported in currency units like the transactions
+PRODUCT_MONEY_COLUMNS = ["production_cost", "retail_cost"]
+
+
+def _transaction_batches(conn, chunk_size):
+    """Read transactions in transaction_id order as Arrow record batches
+    
+    The export always holds currency units and percent, so integer-cents
+    databases are converted here.
+    """
+    day_numbers = bool(schema_flags(conn) & SCHEMA_ANALYTICS)
+    cents = bool(schema_flags(conn) & SCHEMA_CENTS)
+    money_scale = CENTS_PER_UNIT if cents else 1
+    discount_scale = BASIS_POINTS_PER_PERCENT if cents else 1
+    cursor = conn.cursor()
+    last_id = 0
+    
+    while True:
+        cursor.execute('''
+            SELECT transaction_id, product_id, user_id, transaction_date,
+                   initial_cost, applied_discount, final_cost
+            FROM transactions
+            WHERE transaction_id > ?
+            ORDER BY transaction_id
+            LIMIT ?
+        ''', (last_id, chunk_size))
+        rows = cursor.fetchall()
+        
+        if not rows:
+            return
+        
+        columns = list(zip(*rows))
+        dates = np.array(columns[3], dtype=np.int64 if day_numbers else "datetime64[D]")
+        dates = dates.astype("datetime64[D]")
+        months = np.datetime_as_string(dates.astype("datetime64[M]"), unit="M")
+        
+        yield pa.RecordBatch.from_arrays([
+            pa.array(columns[0], pa.int64()),
+            pa.array(columns[1], pa.int32()),
+            pa.array(columns[2], pa.int32()),
+            pa.array(dates, pa.date32()),
+            pa.array(np.array(columns[4], dtype=np.float64) / money_scale, pa.float64()),
+            pa.array(np.array(columns[5], dtype=np.float64) / discount_scale, pa.float64()),
+            pa.array(np.array(columns[6], dtype=np.float64) / money_scale, pa.float64()),
+            pa.array(months, pa.string())
+        ], schema=TRANSACTIONS_SCHEMA)
+        
+        last_id = rows[-1][0]
+
+
+def export_to_parquet(db_name, out_dir, chunk_size=1_000_000):
+    """Export products, users and month-partitioned transactions to Parquet
+    
+    Money is always exported in currency units, so the export of an
+    integer-cents database matches that of a REAL one.
+    """
+    # write_dataset pulls the batch generator from its own thread
+    conn = sqlite3.connect(db_name, check_same_thread=False)
+    os.makedirs(out_dir, exist_ok=True)
+    
+    try:
+        cents = bool(schema_flags(conn) & SCHEMA_CENTS)
+        for table in ("products", "users"):
+            df = pd.read_sql_query(f"SELECT * FROM {table}", conn)
+            if cents and table == "products":
+                df[PRODUCT_MONEY_COLUMNS] = df[PRODUCT_MONEY_COLUMNS] / CENTS_PER_UNIT
+            pq.write_table(pa.Table.from_pandas(df, preserve_index=False),
+                           os.path.join(out_dir, f"{table}.parquet"))
+        
+        # Streams chunk by chunk, so memory stays bounded by chunk_size
+        ds.write_dataset(
+            _transaction_batches(conn, chunk_size),
+            os.path.join(out_dir, "transactions"),
+            schema=TRANSACTIONS_SCHEMA,
+            format="parquet",
+            partitioning=["month"],
+            partitioning_flavor="hive",
+            existing_data_behavior="delete_matching"
+        )
+    finally:
+        conn.close()
+    
+    print(f"Exported database {db_name} to {out_dir}")
+
+
+class ParquetBackend:
+    """Report backend over the Parquet export, pluggable into EcommerceAnalyzer"""
+    
+    def __init__(self, path):
+        self.path = path
+        self.transactions = ds.dataset(
+            os.path.join(path, "transactions"),
+            format="parquet",
+            partitioning="hive"
+        )
+        
+        users = pq.read_table(os.path.join(path, "users.parquet"),
+                              columns=["user_id", "geo", "discount_tier"]).to_pandas()
+        
+        # Dense user_id-indexed lookups replace the users join during the scan
+        self.geo_names, geo_codes = np.unique(users["geo"].to_numpy(), return_inverse=True)
+        size = int(users["user_id"].max()) + 1
+        self.user_geo = np.zeros(size, dtype=np.int32)
+        self.user_geo[users["user_id"].to_numpy()] = geo_codes
+        self.user_discount_tier = np.zeros(size, dtype=np.int32)
+        self.user_discount_tier[users["user_id"].to_numpy()] = users["discount_tier"].to_numpy()
+        
+        products = self.fetch_products()
+        self.product_tier = np.zeros(int(products["product_id"].max()) + 1, dtype=np.int32)
+        self.product_tier[products["product_id"].to_numpy()] = products["tier"].to_numpy()
+    
+    def _filter(self, start_date=None, end_date=None):
+        """Dataset filter; the month bounds prune whole partitions before any file is read"""
+        conditions = []
+        
+        if start_date is not None:
+            start_date = date.fromisoformat(str(start_date))
+            conditions.append(ds.field("month") >= start_date.strftime("%Y-%m"))
+            conditions.append(ds.field("transaction_date") >= start_date)
+        if end_date is not None:
+            end_date = date.fromisoformat(str(end_date))
+            conditions.append(ds.field("month") <= end_date.strftime("%Y-%m"))
+            conditions.append(ds.field("transaction_date") <= end_date)
+        
+        expression = None
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+        return expression
+    
+    def fetch_products(self):
+        """Products with name and tier"""
+        return pq.read_table(os.path.join(self.path, "products.parquet"),
+                             columns=["product_id", "name", "tier"]).to_pandas()
+    
+    def fetch_cube(self, start_date=None, end_date=None, geos=None, product_tiers=None,
+                   discount_tiers=None):
+        """Aggregate transactions into the report cube, one record batch at a time"""
+        partials = []
+        
+        # Dimension filters become masks over the user/product lookups
+        geo_codes = None if geos is None else np.flatnonzero(np.isin(self.geo_names, list(geos)))
+        
+        for batch in self.transactions.to_batches(columns=CUBE_COLUMNS,
+                                                  filter=self._filter(start_date, end_date)):
+            if batch.num_rows == 0:
+                continue
+            
+            columns = {name: batch.column(name).to_numpy() for name in CUBE_COLUMNS}
+            user_id = columns["user_id"]
+            
+            mask = np.ones(batch.num_rows, dtype=bool)
+            if geo_codes is not None:
+                mask &= np.isin(self.user_geo[user_id], geo_codes)
+            if product_tiers is not None:
+                mask &= np.isin(self.product_tier[columns["product_id"]], list(product_tiers))
+            if discount_tiers is not None:
+                mask &= np.isin(self.user_discount_tier[user_id], list(discount_tiers))
+            
+            if not mask.all():
+                columns = {name: values[mask] for name, values in columns.items()}
+                user_id = columns["user_id"]
+            
+            df = pd.DataFrame({
+                "product_id": columns["product_id"],
+                "geo": self.user_geo[user_id],
+                "discount_tier": self.user_discount_tier[user_id],
+                "applied_discount": columns["applied_discount"],
+                "transaction_count": 1,
+                "total_revenue": columns["final_cost"],
+                "total_discount_given": columns["applied_discount"] * columns["initial_cost"] / 100
+            })
+            partials.append(df.groupby(CUBE_KEYS, as_index=False).sum())
+        
+        if not partials:
+            columns = CUBE_KEYS + ["transaction_count", "total_revenue", "total_discount_given"]
+            return pd.DataFrame(columns=columns)
+        
+        cube = pd.concat(partials).groupby(CUBE_KEYS, as_index=False).sum()
+        cube["geo"] = self.geo_names[cube["geo"].to_numpy()]
+        return cube
@@ -0,0 +1,197 @@
+import contextlib
+import hashlib
+import json
+import os
+import threading
+import time
+
+import pandas as pd
+
+
+# Progress handler granularity in SQLite VM instructions
+PROGRESS_INTERVAL = 1000
+
+PHASES = ("prepare", "step", "fetch", "dataframe", "cache", "print")
+
+
+class QueryProfiler:
+    """Per-query timings and plans for EcommerceAnalyzer (pass profiler=QueryProfiler())
+    
+    Every SQL read is split into phases:
+        prepare    compiling the statement (until SQLite's trace callback fires)
+        step       running it up to the first row; for GROUP BY queries this is
+                   the whole scan and aggregation
+        fetch      stepping the remaining rows and converting them to tuples
+        dataframe  building the DataFrame
+    Result cache hits are recorded as a "cache" phase and printing a report as a
+    separate "print" phase. The progress handler counts VM instructions (in
+    PROGRESS_INTERVAL units) as a measure of rows scanned, and EXPLAIN QUERY
+    PLAN is captured once per distinct query.
+    """
+    
+    def __init__(self, slow_query_seconds=None, log_path=None):
+        self.slow_query_seconds = slow_query_seconds
+        self.log_path = log_path
+        self.records = []
+        self.plans = {}
+        self._lock = threading.Lock()
+    
+    def read_sql(self, conn, query, params=(), name="query"):
+        """pd.read_sql_query equivalent that records the phase timings"""
+        plan = self._plan(conn, query, params)
+        marks = {}
+        progress_calls = [0]
+        
+        def on_trace(statement):
+            marks.setdefault("traced", time.perf_counter())
+        
+        def on_progress():
+            progress_calls[0] += 1
+            return 0
+        
+        conn.set_trace_callback(on_trace)
+        conn.set_progress_handler(on_progress, PROGRESS_INTERVAL)
+        try:
+            start = time.perf_counter()
+            cursor = conn.execute(query, params)
+            executed = time.perf_counter()
+            rows = cursor.fetchall()
+            fetched = time.perf_counter()
+        finally:
+            conn.set_trace_callback(None)
+            conn.set_progress_handler(None, PROGRESS_INTERVAL)
+        
+        columns = [column[0] for column in cursor.description or ()]
+        df = pd.DataFrame.from_records(rows, columns=columns, coerce_float=True)
+        built = time.perf_counter()
+        
+        traced = marks.get("traced", start)
+        self.record(name, {
+            "prepare": traced - start,
+            "step": executed - traced,
+            "fetch": fetched - executed,
+            "dataframe": built - fetched
+        }, query=query, rows=len(rows), vm_steps=progress_calls[0] * PROGRESS_INTERVAL, plan=plan)
+        return df
+    
+    def _plan(self, conn, query, params):
+        """EXPLAIN QUERY PLAN details, captured once per query text"""
+        key = hashlib.sha1(query.encode()).hexdigest()[:12]
+        with self._lock:
+            if key in self.plans:
+                return self.plans[key]
+        
+        plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + query, params).fetchall()]
+        with self._lock:
+            self.plans[key] = plan
+        return plan
+    
+    @contextlib.contextmanager
+    def measure(self, name, phase):
+        """Time a block of code (e.g. printing a report) as one phase of `name`"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, {phase: time.perf_counter() - start})
+    
+    def record(self, name, phases, query=None, rows=None, vm_steps=None, plan=None, **extra):
+        """Store one measurement; dumps the plan when it exceeds the slow-query threshold"""
+        total = sum(phases.values())
+        entry = {
+            "timestamp": time.time(),
+            "name": name,
+            "total_seconds": total,
+            "phases": phases,
+            **extra
+        }
+        if query is not None:
+            entry.update({
+                "query_hash": hashlib.sha1(query.encode()).hexdigest()[:12],
+                "rows": rows,
+                "vm_steps": vm_steps
+            })
+        
+        slow = query is not None and self.slow_query_seconds is not None and total >= self.slow_query_seconds
+        entry["slow"] = slow
+        if slow:
+            entry["plan"] = plan
+            print(f"Slow query {name}: {total * 1000:.1f} ms, {rows} rows, ~{vm_steps} VM steps")
+            for detail in plan or ():
+                print(f"   {detail}")
+        
+        with self._lock:
+            self.records.append(entry)
+            if self.log_path:
+                with open(self.log_path, "a") as f:
+                    f.write(json.dumps(entry) + "\n")
+        return entry
+    
+    def summary(self):
+        """Total seconds per query name and phase as a DataFrame"""
+        with self._lock:
+            rows = [
+                {"name": entry["name"], "phase": phase, "seconds": seconds}
+                for entry in self.records for phase, seconds in entry["phases"].items()
+            ]
+        if not rows:
+            return pd.DataFrame(columns=["name", *PHASES, "total"])
+        
+        df = pd.DataFrame(rows).pivot_table(index="name", columns="phase", values="seconds",
+                                            aggfunc="sum", fill_value=0.0)
+        df = df.reindex(columns=[phase for phase in PHASES if phase in df.columns])
+        df["total"] = df.sum(axis=1)
+        return df.sort_values("total", ascending=False).reset_index()
+    
+    def write_jsonl(self, path):
+        """Write every record as one JSON object per line"""
+        with self._lock:
+            records = list(self.records)
+        with open(path, "w") as f:
+            for entry in records:
+                f.write(json.dumps(entry) + "\n")
+    
+    def prometheus_text(self):
+        """Counters in the Prometheus text exposition format"""
+        phase_seconds = {}
+        counters = {"calls": {}, "rows": {}, "vm_steps": {}, "slow": {}}
+        
+        with self._lock:
+            for entry in self.records:
+                name = entry["name"]
+                for phase, seconds in entry["phases"].items():
+                    phase_seconds[(name, phase)] = phase_seconds.get((name, phase), 0.0) + seconds
+                if "query_hash" in entry:
+                    counters["calls"][name] = counters["calls"].get(name, 0) + 1
+                    counters["rows"][name] = counters["rows"].get(name, 0) + entry["rows"]
+                    counters["vm_steps"][name] = counters["vm_steps"].get(name, 0) + entry["vm_steps"]
+                    counters["slow"][name] = counters["slow"].get(name, 0) + int(entry["slow"])
+        
+        lines = [
+            "# HELP ecommerce_query_phase_seconds_total Time spent per analysis query and phase.",
+            "# TYPE ecommerce_query_phase_seconds_total counter"
+        ]
+        for (name, phase), seconds in sorted(phase_seconds.items()):
+            lines.append(f'ecommerce_query_phase_seconds_total{{query="{name}",phase="{phase}"}} {seconds:.9f}')
+        
+        descriptions = {
+            "calls": "SQL reads per analysis query.",
+            "rows": "Rows returned per analysis query.",
+            "vm_steps": "Approximate SQLite VM instructions per analysis query.",
+            "slow": "Reads over the slow-query threshold per analysis query."
+        }
+        for counter, values in counters.items():
+            metric = f"ecommerce_query_{counter}_total"
+            lines.append(f"# HELP {metric} {descriptions[counter]}")
+            lines.append(f"# TYPE {metric} counter")
+            for name, value in sorted(values.items()):
+                lines.append(f'{metric}{{query="{name}"}} {value}')
+        
+        return "\n".join(lines) + "\n"
+    
+    def write_prometheus(self, path):
+        """Write the counters for a node_exporter textfile collector (atomically)"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
@@ -0,0 +1,719 @@
+from datetime import date
+
+try:
+    from .database import SCHEMA_ANALYTICS, SCHEMA_CENTS, stored_date
+except ImportError:
+    from database import SCHEMA_ANALYTICS, SCHEMA_CENTS, stored_date
+
+
+# Report filters accepted by the EcommerceAnalyzer analyze_* methods
+FILTER_NAMES = ("start_date", "end_date", "geos", "product_tiers", "discount_tiers")
+
+# Column behind each filter, per query source
+FILTER_COLUMNS = {
+    "transactions": {
+        "date": "t.transaction_date",
+        "geos": "u.geo",
+        "product_tiers": "p.tier",
+        "discount_tiers": "u.discount_tier"
+    },
+    "rollup": {
+        "date": "r.transaction_date",
+        "geos": "r.geo",
+        "product_tiers": "p.tier",
+        "discount_tiers": "r.discount_tier"
+    }
+}
+
+# Joins added on demand when a filter needs a dimension table
+FILTER_JOINS = {
+    "transactions": {
+        "u": "JOIN users u ON u.user_id = t.user_id",
+        "p": "JOIN products p ON p.product_id = t.product_id"
+    },
+    "rollup": {
+        "p": "JOIN products p ON p.product_id = r.product_id"
+    }
+}
+
+# Unit placeholders of the query templates, by whether the schema has SCHEMA_CENTS:
+#   {money}             converts a money expression (or sum) to currency units
+#   {discount}          converts an applied_discount expression to percent
+#   {discount_given}    SUM of applied_discount * initial_cost in currency units
+#   {discount_given_raw} the same SUM in storage units (for the rollups)
+#   {discount_money}    converts a stored discount-given sum to currency units
+# In cents mode every SUM runs over integers and is exact; the division happens
+# once on the aggregate. The legacy fragments keep the original REAL arithmetic.
+UNIT_SQL = {
+    False: {
+        "money": "",
+        "discount": "",
+        "discount_given": "SUM(t.applied_discount * t.initial_cost / 100)",
+        "discount_given_raw": "SUM(t.applied_discount * t.initial_cost / 100)",
+        "discount_money": ""
+    },
+    True: {
+        "money": " / 100.0",
+        "discount": " / 100.0",
+        "discount_given": "SUM(t.applied_discount * t.initial_cost) / 1000000.0",
+        "discount_given_raw": "SUM(t.applied_discount * t.initial_cost)",
+        "discount_money": " / 1000000.0"
+    }
+}
+
+# Analysis queries by report name; {transactions}, {joins}, {where} and the unit
+# placeholders are filled by render_query
+QUERIES = {
+    "discount_effectiveness": """
+    SELECT
+        CASE
+            WHEN t.applied_discount = 0 THEN 'No Discount'
+            WHEN t.applied_discount{discount} <= 10 THEN 'Low Discount (5-10%)'
+            ELSE 'High Discount (15-20%)'
+        END as discount_category,
+        COUNT(*) as transaction_count,
+        SUM(t.final_cost){money} as total_revenue,
+        AVG(t.final_cost){money} as avg_transaction_value,
+        SUM(t.final_cost){money} / COUNT(*) as revenue_per_transaction
+    FROM {transactions} t{joins}{where}
+    GROUP BY discount_category
+    ORDER BY total_revenue DESC
+    """,
+    "product_popularity": """
+    SELECT
+        p.name,
+        p.tier,
+        COUNT(t.transaction_id) as sales_count,
+        SUM(t.final_cost){money} as total_revenue,
+        AVG(t.final_cost){money} as avg_price
+    FROM products p
+    JOIN {transactions} t ON p.product_id = t.product_id{joins}{where}
+    GROUP BY p.product_id, p.name, p.tier
+    ORDER BY sales_count DESC
+    """,
+    "geo_performance": """
+    SELECT
+        u.geo,
+        COUNT(t.transaction_id) as transaction_count,
+        SUM(t.final_cost){money} as total_revenue,
+        AVG(t.final_cost){money} as avg_transaction_value,
+        AVG(t.applied_discount){discount} as avg_discount_applied
+    FROM users u
+    JOIN {transactions} t ON u.user_id = t.user_id{joins}{where}
+    GROUP BY u.geo
+    ORDER BY total_revenue DESC
+    """,
+    "discount_tier_profitability": """
+    SELECT
+        u.discount_tier,
+        COUNT(t.transaction_id) as transaction_count,
+        SUM(t.final_cost){money} as total_revenue,
+        AVG(t.final_cost){money} as avg_transaction_value,
+        {discount_given} as total_discount_given
+    FROM users u
+    JOIN {transactions} t ON u.user_id = t.user_id{joins}{where}
+    GROUP BY u.discount_tier
+    ORDER BY total_revenue DESC
+    """
+}
+
+# Tables every report query already joins, and its fixed conditions
+QUERY_JOINED = {
+    "discount_effectiveness": ("t",),
+    "product_popularity": ("t", "p"),
+    "geo_performance": ("t", "u"),
+    "discount_tier_profitability": ("t", "u")
+}
+
+QUERY_CONDITIONS = {
+    "discount_tier_profitability": ("t.applied_discount > 0",)
+}
+
+# One scan of transactions grouped by every dimension the four reports need. The
+# cube is grouped by a sort of every transaction either way, so transactions are read
+# in table order: given the choice, the planner drives the join from users through
+# the non-covering (user_id, ...) indexes, a table lookup per transaction.
+# {scan} is filled by cube_query
+CUBE_QUERY = """
+SELECT
+    t.product_id,
+    u.geo,
+    u.discount_tier,
+    t.applied_discount{discount} as applied_discount,
+    COUNT(*) as transaction_count,
+    SUM(t.final_cost){money} as total_revenue,
+    {discount_given} as total_discount_given
+FROM {transactions} t{scan}
+CROSS JOIN users u ON u.user_id = t.user_id{joins}{where}
+GROUP BY t.product_id, u.geo, u.discount_tier, t.applied_discount
+"""
+
+PRODUCTS_QUERY = "SELECT product_id, name, tier FROM products"
+
+# Unit production cost per product, for the product_id-indexed cost lookup of the profit reports
+PRODUCT_COSTS_QUERY = "SELECT product_id, production_cost{money} as production_cost FROM products"
+
+# Profit cube: one scan grouped by every dimension of the profit reports; costs are
+# added from the product cost lookup afterwards, so products is never joined.
+# {month} is filled by profit_cube_query
+PROFIT_CUBE_QUERY = """
+SELECT
+    t.product_id,
+    u.geo,
+    u.discount_tier,
+    {month} as month,
+    COUNT(*) as transaction_count,
+    SUM(t.final_cost){money} as total_revenue
+FROM {transactions} t
+JOIN users u ON u.user_id = t.user_id{joins}{where}
+GROUP BY t.product_id, u.geo, u.discount_tier, month
+"""
+
+ROLLUP_PROFIT_CUBE_QUERY = """
+SELECT
+    r.product_id,
+    r.geo,
+    r.discount_tier,
+    {month} as month,
+    SUM(r.transaction_count) as transaction_count,
+    SUM(r.total_revenue){money} as total_revenue
+FROM daily_rollup r{joins}{where}
+GROUP BY r.product_id, r.geo, r.discount_tier, month
+"""
+
+# Fold transactions in (watermark, new_watermark] into the daily rollup (format with unit_sql)
+ROLLUP_REFRESH_SQL = """
+INSERT INTO daily_rollup (
+    transaction_date, product_id, geo, discount_tier, applied_discount,
+    transaction_count, total_revenue, total_discount_given
+)
+SELECT
+    t.transaction_date,
+    t.product_id,
+    u.geo,
+    u.discount_tier,
+    t.applied_discount,
+    COUNT(*),
+    SUM(t.final_cost),
+    {discount_given_raw}
+FROM transactions t
+JOIN users u ON u.user_id = t.user_id
+WHERE t.transaction_id > ? AND t.transaction_id <= ?
+GROUP BY t.transaction_date, t.product_id, u.geo, u.discount_tier, t.applied_discount
+ON CONFLICT (transaction_date, product_id, geo, discount_tier, applied_discount) DO UPDATE SET
+    transaction_count = transaction_count + excluded.transaction_count,
+    total_revenue = total_revenue + excluded.total_revenue,
+    total_discount_given = total_discount_given + excluded.total_discount_given
+"""
+
+ROLLUP_CUBE_QUERY = """
+SELECT
+    r.product_id,
+    r.geo,
+    r.discount_tier,
+    r.applied_discount{discount} as applied_discount,
+    SUM(r.transaction_count) as transaction_count,
+    SUM(r.total_revenue){money} as total_revenue,
+    SUM(r.total_discount_given){discount_money} as total_discount_given
+FROM daily_rollup r{joins}{where}
+GROUP BY r.product_id, r.geo, r.discount_tier, r.applied_discount
+"""
+
+# Period start for each time bucket; {date} is the date as SQLite date() arguments
+SERIES_BUCKETS = {
+    "daily": "date({date})",
+    "weekly": "date({date}, 'weekday 0', '-6 days')",
+    "monthly": "strftime('%Y-%m', {date})"
+}
+
+SERIES_QUERY = """
+SELECT
+    {period} as period,
+    COUNT(*) as transaction_count,
+    SUM(t.final_cost){money} as total_revenue,
+    {discount_given} as total_discount_given
+FROM {transactions} t{joins}{where}
+GROUP BY period
+ORDER BY period
+"""
+
+ROLLUP_SERIES_QUERY = """
+SELECT
+    {period} as period,
+    SUM(r.transaction_count) as transaction_count,
+    SUM(r.total_revenue){money} as total_revenue,
+    SUM(r.total_discount_given){discount_money} as total_discount_given
+FROM daily_rollup r{joins}{where}
+GROUP BY period
+ORDER BY period
+"""
+
+# Aggregate queries over month partitions. A UNION ALL of the partitions joined to
+# users/products is materialized into a temp table (every selected row copied)
+# before the join, so instead each partition is grouped on its own: an arm selects
+# the PARTITION_KEYS of the query and the PARTIAL_AGGREGATES it needs from one
+# partition, and the outer query of PARTITIONED_QUERIES adds the arms up.
+# {arms} is filled by partitioned_query
+PARTIAL_AGGREGATES = {
+    "transaction_count": "COUNT(*)",
+    "revenue": "SUM(t.final_cost)",
+    "discount_sum": "SUM(t.applied_discount)",
+    "discount_given": "{discount_given_raw}"
+}
+
+PARTITION_ARM = """
+    SELECT
+        {keys}
+    FROM {transactions} t{joins}{where}
+    GROUP BY {group}"""
+
+# (arm keys as (expression, name), partial aggregates, outer query) by query name;
+# {month}/{period} in the keys are filled by profit_cube_query/series_query
+PARTITIONED_QUERIES = {
+    "discount_effectiveness": (
+        (("t.applied_discount", "discount"),),
+        ("transaction_count", "revenue"),
+        """
+    SELECT
+        CASE
+            WHEN discount = 0 THEN 'No Discount'
+            WHEN discount{discount} <= 10 THEN 'Low Discount (5-10%)'
+            ELSE 'High Discount (15-20%)'
+        END as discount_category,
+        SUM(transaction_count) as transaction_count,
+        SUM(revenue){money} as total_revenue,
+        SUM(revenue){money} / SUM(transaction_count) as avg_transaction_value,
+        SUM(revenue){money} / SUM(transaction_count) as revenue_per_transaction
+    FROM ({arms})
+    GROUP BY discount_category
+    ORDER BY total_revenue DESC
+    """),
+    "product_popularity": (
+        (("p.product_id", "product_id"), ("p.name", "name"), ("p.tier", "tier")),
+        ("transaction_count", "revenue"),
+        """
+    SELECT
+        name,
+        tier,
+        SUM(transaction_count) as sales_count,
+        SUM(revenue){money} as total_revenue,
+        SUM(revenue){money} / SUM(transaction_count) as avg_price
+    FROM ({arms})
+    GROUP BY product_id, name, tier
+    ORDER BY sales_count DESC
+    """),
+    "geo_performance": (
+        (("u.geo", "geo"),),
+        ("transaction_count", "revenue", "discount_sum"),
+        """
+    SELECT
+        geo,
+        SUM(transaction_count) as transaction_count,
+        SUM(revenue){money} as total_revenue,
+        SUM(revenue){money} / SUM(transaction_count) as avg_transaction_value,
+        SUM(discount_sum){discount} / SUM(transaction_count) as avg_discount_applied
+    FROM ({arms})
+    GROUP BY geo
+    ORDER BY total_revenue DESC
+    """),
+    "discount_tier_profitability": (
+        (("u.discount_tier", "discount_tier"),),
+        ("transaction_count", "revenue", "discount_given"),
+        """
+    SELECT
+        discount_tier,
+        SUM(transaction_count) as transaction_count,
+        SUM(revenue){money} as total_revenue,
+        SUM(revenue){money} / SUM(transaction_count) as avg_transaction_value,
+        SUM(discount_given){discount_money} as total_discount_given
+    FROM ({arms})
+    GROUP BY discount_tier
+    ORDER BY total_revenue DESC
+    """),
+    "profit_cube": (
+        (("t.product_id", "product_id"), ("u.geo", "geo"), ("u.discount_tier", "discount_tier"),
+         ("{month}", "month")),
+        ("transaction_count", "revenue"),
+        """
+SELECT
+    product_id,
+    geo,
+    discount_tier,
+    month,
+    SUM(transaction_count) as transaction_count,
+    SUM(revenue){money} as total_revenue
+FROM ({arms})
+GROUP BY product_id, geo, discount_tier, month
+"""),
+    "revenue_series": (
+        (("{period}", "period"),),
+        ("transaction_count", "revenue", "discount_given"),
+        """
+SELECT
+    period,
+    SUM(transaction_count) as transaction_count,
+    SUM(revenue){money} as total_revenue,
+    SUM(discount_given){discount_money} as total_discount_given
+FROM ({arms})
+GROUP BY period
+ORDER BY period
+""")
+}
+
+# Customer-behaviour queries. Each runs over transactions in (user_id, transaction_date)
+# order through the analytics index idx_transactions_user_date, so the window functions
+# see every customer's purchases in one ordered scan instead of one query per user.
+# {day}, {month} and {window} are filled by behaviour_query
+
+# The whole-customer frame does not change LAG or FIRST_VALUE, but saves SQLite from
+# growing the frame row by row
+PURCHASE_WINDOW = ("WINDOW w AS (PARTITION BY t.user_id ORDER BY t.transaction_date, t.transaction_id "
+                   "ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING)")
+
+# Distinct active months of every customer with the cohort (month of the first
+# purchase) and whether that first purchase was discounted; months since the first
+# purchase are derived from the month strings by cohort_report
+COHORT_QUERY = """
+WITH activity AS (
+    SELECT DISTINCT
+        t.user_id,
+        {month} as month,
+        FIRST_VALUE({month}) OVER w as cohort,
+        FIRST_VALUE(t.applied_discount > 0) OVER w as first_discounted
+    FROM {transactions} t{joins}{where}
+    {window}
+)
+SELECT
+    cohort,
+    CASE WHEN first_discounted THEN 'Discounted' ELSE 'Full Price' END as first_purchase,
+    month,
+    COUNT(*) as active_users
+FROM activity
+GROUP BY cohort, first_purchase, month
+ORDER BY cohort, first_purchase, month
+"""
+
+# Days between consecutive purchases of a customer, by discount tier and by whether
+# the previous purchase was discounted
+REPEAT_INTERVALS_QUERY = """
+WITH gaps AS (
+    SELECT
+        t.user_id,
+        {day} - LAG({day}) OVER w as days_since_previous,
+        LAG(t.applied_discount) OVER w as previous_discount
+    FROM {transactions} t{joins}{where}
+    {window}
+)
+SELECT
+    u.discount_tier,
+    CASE WHEN g.previous_discount > 0 THEN 'After Discount' ELSE 'After Full Price' END as previous_purchase,
+    COUNT(*) as repeat_purchases,
+    COUNT(DISTINCT g.user_id) as repeat_customers,
+    AVG(g.days_since_previous) as avg_days_between,
+    MAX(g.days_since_previous) as max_days_between,
+    AVG(g.days_since_previous <= 30) * 100 as within_30_days_pct
+FROM gaps g
+JOIN users u ON u.user_id = g.user_id
+WHERE g.days_since_previous IS NOT NULL
+GROUP BY u.discount_tier, previous_purchase
+ORDER BY u.discount_tier, previous_purchase
+"""
+
+# Recency, frequency and monetary value per customer, scored 1-5 by percentile
+# (PERCENT_RANK, so ties share a score); recency counts from the last purchase
+# in the data. Completed by RFM_SCORES_QUERY / RFM_SEGMENTS_QUERY
+RFM_CTE = """
+WITH customers AS (
+    SELECT
+        t.user_id,
+        MAX({day}) as last_day,
+        COUNT(*) as frequency,
+        SUM(t.final_cost){money} as monetary,
+        AVG(t.applied_discount > 0) * 100 as discounted_pct
+    FROM {transactions} t{joins}{where}
+    GROUP BY t.user_id
+),
+scores AS (
+    SELECT
+        user_id,
+        MAX(last_day) OVER () - last_day as recency_days,
+        frequency,
+        monetary,
+        discounted_pct,
+        MIN(5, 1 + CAST(5 * PERCENT_RANK() OVER (ORDER BY last_day) AS INTEGER)) as r_score,
+        MIN(5, 1 + CAST(5 * PERCENT_RANK() OVER (ORDER BY frequency) AS INTEGER)) as f_score,
+        MIN(5, 1 + CAST(5 * PERCENT_RANK() OVER (ORDER BY monetary) AS INTEGER)) as m_score
+    FROM customers
+)
+"""
+
+RFM_SEGMENT_SQL = """CASE
+            WHEN r_score >= 4 AND f_score >= 4 THEN 'Champions'
+            WHEN r_score >= 3 AND f_score >= 3 THEN 'Loyal'
+            WHEN r_score >= 4 THEN 'New'
+            WHEN f_score >= 3 THEN 'At Risk'
+            WHEN r_score <= 2 THEN 'Lost'
+            ELSE 'Needs Attention'
+        END"""
+
+RFM_SCORES_QUERY = RFM_CTE + f"""
+SELECT
+    user_id,
+    recency_days,
+    frequency,
+    monetary,
+    discounted_pct,
+    r_score,
+    f_score,
+    m_score,
+    {RFM_SEGMENT_SQL} as segment
+FROM scores
+ORDER BY user_id
+"""
+
+RFM_SEGMENTS_QUERY = RFM_CTE + f"""
+SELECT
+    {RFM_SEGMENT_SQL} as segment,
+    COUNT(*) as customers,
+    AVG(recency_days) as avg_recency_days,
+    AVG(frequency) as avg_frequency,
+    AVG(monetary) as avg_monetary,
+    SUM(monetary) as total_revenue,
+    AVG(discounted_pct) as avg_discounted_pct
+FROM scores
+GROUP BY segment
+ORDER BY total_revenue DESC
+"""
+
+BEHAVIOUR_QUERIES = {
+    "cohorts": COHORT_QUERY,
+    "repeat_intervals": REPEAT_INTERVALS_QUERY,
+    "rfm_scores": RFM_SCORES_QUERY,
+    "rfm_segments": RFM_SEGMENTS_QUERY
+}
+
+
+def date_param(value, flags=0):
+    """Bind value for comparisons with transaction_date in the given schema"""
+    return stored_date(date.fromisoformat(str(value)), flags)
+
+
+def date_sql(column, flags=0):
+    """SQLite date() arguments that turn a stored transaction_date into a date"""
+    if flags & SCHEMA_ANALYTICS:
+        return f"{column} * 86400, 'unixepoch'"
+    return column
+
+
+def day_sql(column, flags=0):
+    """SQL day number of a stored transaction_date, for differences in days"""
+    if flags & SCHEMA_ANALYTICS:
+        return column
+    return f"julianday({column})"
+
+
+def unit_sql(flags=0):
+    """Unit placeholder values of the query templates for the given schema"""
+    return UNIT_SQL[bool(flags & SCHEMA_CENTS)]
+
+
+def check_filters(filters):
+    """Reject unknown filter names early instead of ignoring them"""
+    unknown = set(filters) - set(FILTER_NAMES)
+    if unknown:
+        raise TypeError(f"Unknown report filters: {', '.join(sorted(unknown))}")
+
+
+def selected_partitions(partitions, filters=None, flags=0):
+    """Names of the month partitions the date filters overlap, in date order
+    
+    partitions are the (name, first_date, end_date) rows of transaction_partitions;
+    pruning them here keeps recent-window reports independent of the history size.
+    """
+    filters = filters or {}
+    start = filters.get("start_date")
+    end = filters.get("end_date")
+    start = None if start is None else date_param(start, flags)
+    end = None if end is None else date_param(end, flags)
+    
+    return [
+        name for name, first_date, end_date in partitions
+        if (start is None or end_date > start) and (end is None or first_date <= end)
+    ]
+
+
+def transactions_source(partitions=None, filters=None, flags=0):
+    """FROM source of transactions, pruned to the month partitions the date filters overlap"""
+    filters = filters or {}
+    if not partitions or (filters.get("start_date") is None and filters.get("end_date") is None):
+        return "transactions"
+    
+    names = selected_partitions(partitions, filters, flags)
+    if not names:
+        return f"(SELECT * FROM {partitions[0][0]} WHERE 0)"
+    if len(names) == 1:
+        return names[0]
+    return "(" + " UNION ALL ".join(f"SELECT * FROM {name}" for name in names) + ")"
+
+
+def filter_sql(filters=None, flags=0, joined=("t",), conditions=(), source="transactions", needed=()):
+    """(joins, where, params) for the filters, the fixed conditions and the needed aliases
+    
+    Values are always bound, so the SQL text only depends on which filters are set
+    and how many values they have.
+    """
+    filters = filters or {}
+    check_filters(filters)
+    columns = FILTER_COLUMNS[source]
+    
+    conditions = list(conditions)
+    params = []
+    
+    if filters.get("start_date") is not None:
+        conditions.append(f"{columns['date']} >= ?")
+        params.append(date_param(filters["start_date"], flags))
+    if filters.get("end_date") is not None:
+        conditions.append(f"{columns['date']} <= ?")
+        params.append(date_param(filters["end_date"], flags))
+    
+    for name in ("geos", "product_tiers", "discount_tiers"):
+        values = filters.get(name)
+        if values is not None:
+            values = list(values)
+            conditions.append(f"{columns[name]} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+    
+    # Join only the dimension tables the conditions (or the caller) reference
+    aliases = {condition.split(".")[0] for condition in conditions} | set(needed)
+    joins = "".join(
+        f"\n{sql}" for alias, sql in FILTER_JOINS[source].items()
+        if alias in aliases and alias not in joined
+    )
+    where = "\nWHERE " + " AND ".join(conditions) if conditions else ""
+    return joins, where, params
+
+
+def render_query(template, filters=None, flags=0, joined=("t",), conditions=(),
+                 source="transactions", partitions=None, transactions=None):
+    """Fill a query template with the joins and bound conditions for filters
+    
+    Returns (sql, params). The SQL text only depends on which filters are set and
+    how many values they have (and on the partitions they select), so sqlite3
+    reuses the prepared statement for repeated calls. transactions overrides the
+    FROM source of transactions_source.
+    """
+    joins, where, params = filter_sql(filters, flags, joined, conditions, source)
+    if transactions is None:
+        transactions = transactions_source(partitions, filters, flags)
+    return template.format(transactions=transactions, joins=joins, where=where, **unit_sql(flags)), params
+
+
+def partitioned_query(name, filters=None, flags=0, partitions=(), conditions=(), **placeholders):
+    """SQL and parameters of a PARTITIONED_QUERIES query: one grouped arm per selected partition
+    
+    placeholders fill the arm keys ({month} of the profit cube, {period} of the series).
+    """
+    keys, partials, outer = PARTITIONED_QUERIES[name]
+    keys = [(expression.format(**placeholders), alias) for expression, alias in keys]
+    units = unit_sql(flags)
+    
+    # Dimension tables the keys read are joined in every arm
+    needed = [alias for alias in FILTER_JOINS["transactions"]
+              if any(expression.startswith(f"{alias}.") for expression, _ in keys)]
+    joins, where, params = filter_sql(filters, flags, ("t",), conditions, needed=needed)
+    
+    names = selected_partitions(partitions, filters, flags)
+    sources = names or [f"(SELECT * FROM {partitions[0][0]} WHERE 0)"]
+    columns = [f"{expression} as {alias}" for expression, alias in keys]
+    columns += [f"{PARTIAL_AGGREGATES[partial].format(**units)} as {partial}" for partial in partials]
+    
+    arms = "\n    UNION ALL".join(
+        PARTITION_ARM.format(keys=",\n        ".join(columns), transactions=source, joins=joins, where=where,
+                             group=", ".join(expression for expression, _ in keys))
+        for source in sources
+    )
+    return outer.format(arms=arms, **units), params * len(sources)
+
+
+def report_query(name, filters=None, flags=0, partitions=None):
+    """SQL and parameters for a named report"""
+    if partitions:
+        return partitioned_query(name, filters, flags, partitions, QUERY_CONDITIONS.get(name, ()))
+    return render_query(QUERIES[name], filters, flags, QUERY_JOINED[name], QUERY_CONDITIONS.get(name, ()),
+                        partitions=partitions)
+
+
+def cube_query(filters=None, flags=0, use_rollups=False, partitions=None):
+    """SQL and parameters for the report cube, from transactions or from daily_rollup"""
+    if use_rollups:
+        return render_query(ROLLUP_CUBE_QUERY, filters, flags, ("r",), source="rollup")
+    if not partitions:
+        return render_query(CUBE_QUERY.replace("{scan}", " NOT INDEXED"), filters, flags, ("t", "u"))
+    
+    # Grouping each partition would sort the transactions twice; as the left side of
+    # the CROSS JOIN the UNION ALL is read as a co-routine, not materialized
+    names = selected_partitions(partitions, filters, flags)
+    if not names:
+        transactions = f"(SELECT * FROM {partitions[0][0]} WHERE 0)"
+    else:
+        transactions = "(" + " UNION ALL ".join(f"SELECT * FROM {name} NOT INDEXED" for name in names) + ")"
+    return render_query(CUBE_QUERY.replace("{scan}", ""), filters, flags, ("t", "u"), transactions=transactions)
+
+
+def profit_cube_query(filters=None, flags=0, use_rollups=False, partitions=None):
+    """SQL and parameters for the monthly profit cube, from transactions or from daily_rollup"""
+    if use_rollups:
+        month = SERIES_BUCKETS["monthly"].format(date=date_sql("r.transaction_date", flags))
+        return render_query(ROLLUP_PROFIT_CUBE_QUERY.replace("{month}", month), filters, flags,
+                            ("r",), source="rollup")
+    
+    month = SERIES_BUCKETS["monthly"].format(date=date_sql("t.transaction_date", flags))
+    if partitions:
+        return partitioned_query("profit_cube", filters, flags, partitions, month=month)
+    return render_query(PROFIT_CUBE_QUERY.replace("{month}", month), filters, flags, ("t", "u"),
+                        partitions=partitions)
+
+
+def series_query(bucket="daily", filters=None, flags=0, use_rollups=False, partitions=None):
+    """SQL and parameters for a revenue time series in daily/weekly/monthly buckets"""
+    if bucket not in SERIES_BUCKETS:
+        raise ValueError(f"Unknown bucket {bucket!r}, expected one of {', '.join(SERIES_BUCKETS)}")
+    
+    if use_rollups:
+        period = SERIES_BUCKETS[bucket].format(date=date_sql("r.transaction_date", flags))
+        return render_query(ROLLUP_SERIES_QUERY.replace("{period}", period), filters, flags,
+                            ("r",), source="rollup")
+    
+    period = SERIES_BUCKETS[bucket].format(date=date_sql("t.transaction_date", flags))
+    if partitions:
+        return partitioned_query("revenue_series", filters, flags, partitions, period=period)
+    return render_query(SERIES_QUERY.replace("{period}", period), filters, flags, partitions=partitions)
+
+
+def behaviour_query(name, filters=None, flags=0, partitions=None):
+    """SQL and parameters for a customer-behaviour query (cohorts, repeat intervals, RFM)"""
+    if name not in BEHAVIOUR_QUERIES:
+        raise ValueError(f"Unknown behaviour query {name!r}, expected one of {', '.join(BEHAVIOUR_QUERIES)}")
+    
+    date = date_sql("t.transaction_date", flags)
+    template = (BEHAVIOUR_QUERIES[name]
+                .replace("{day}", day_sql("t.transaction_date", flags))
+                .replace("{month}", SERIES_BUCKETS["monthly"].format(date=date))
+                .replace("{window}", PURCHASE_WINDOW))
+    return render_query(template, filters, flags, partitions=partitions)
+
+
+# Named queries whose rows are the finished report, so callers that do not need a
+# DataFrame (the CLI's table/csv/json output) can run them with plain sqlite3
+QUERY_REGISTRY = tuple(QUERIES) + ("revenue_series", "repeat_intervals", "rfm_segments", "rfm_scores")
+
+
+def named_query(name, filters=None, flags=0, partitions=None, bucket="daily"):
+    """SQL and parameters of a query in QUERY_REGISTRY"""
+    if name in QUERIES:
+        return report_query(name, filters, flags, partitions)
+    if name == "revenue_series":
+        return series_query(bucket, filters, flags, partitions=partitions)
+    if name in QUERY_REGISTRY:
+        return behaviour_query(name, filters, flags, partitions)
+    raise ValueError(f"Unknown query {name!r}, expected one of {', '.join(QUERY_REGISTRY)}")
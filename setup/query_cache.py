@@ -0,0 +1,137 @@
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+try:
+    from .database import max_transaction_id
+except ImportError:
+    from database import max_transaction_id
+
+
+def change_token(conn):
+    """Cheap token that changes whenever the database content may have changed
+    
+    Returns (session, persistent). PRAGMA data_version changes on commits from other
+    connections and total_changes on writes through this connection; both only mean
+    something within this connection, so the session part carries the connection
+    identity. The persistent part (max-id watermarks and the database/WAL file
+    stamps) stays comparable across connections and processes.
+    """
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA data_version")
+    session = (id(conn), cursor.fetchone()[0], conn.total_changes)
+    
+    cursor.execute('''
+        SELECT
+            (SELECT MAX(user_id) FROM users),
+            (SELECT MAX(product_id) FROM products)
+    ''')
+    persistent = (max_transaction_id(conn),) + cursor.fetchone()
+    
+    cursor.execute("PRAGMA database_list")
+    db_file = cursor.fetchone()[2]
+    for path in (db_file, db_file + "-wal"):
+        if path and os.path.exists(path):
+            stat = os.stat(path)
+            # An empty WAL is recreated by every new connection; only its frames matter
+            if stat.st_size or path == db_file:
+                persistent += (stat.st_mtime_ns, stat.st_size)
+    
+    return session, persistent
+
+
+def token_matches(stored, current):
+    """Whether a result stored under `stored` is still valid under `current`"""
+    if stored[1] != current[1]:
+        return False
+    # data_version/total_changes are only comparable on the same connection
+    return stored[0][0] != current[0][0] or stored[0] == current[0]
+
+
+class QueryCache:
+    """LRU cache of query results validated against a database change token
+    
+    Keys depend only on the query text and parameters. In memory an entry keeps
+    the whole change token, so repeated reads on one connection also notice
+    uncommitted writes through it; entries written to cache_dir keep only the
+    persistent part and are reused by any connection or process.
+    """
+    
+    def __init__(self, max_entries=128, cache_dir=None):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._lock = threading.Lock()
+        
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+    
+    @staticmethod
+    def make_key(query, params=()):
+        """Key for a query text and its bound parameters"""
+        return hashlib.sha1(repr((query, tuple(params))).encode()).hexdigest()
+    
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+    
+    def get(self, key, token):
+        """Cached value for key if it was stored under the same token, else None"""
+        with self._lock:
+            entry = self.entries.get(key)
+            
+            if entry is None and self.cache_dir and os.path.exists(self._disk_path(key)):
+                with open(self._disk_path(key), "rb") as f:
+                    persistent, value = pickle.load(f)
+                # Disk entries only carry the persistent part of the token
+                if persistent == token[1]:
+                    entry = (token, value)
+                    self.disk_hits += 1
+                    self._store(key, entry)
+            
+            if entry is None or not token_matches(entry[0], token):
+                self.entries.pop(key, None)
+                self.misses += 1
+                return None
+            
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+    
+    def put(self, key, token, value):
+        """Store value under key for the given token"""
+        with self._lock:
+            self._store(key, (token, value))
+            
+            # The session part names a live connection; it means nothing to another process
+            if self.cache_dir:
+                with open(self._disk_path(key), "wb") as f:
+                    pickle.dump((token[1], value), f, protocol=pickle.HIGHEST_PROTOCOL)
+    
+    def _store(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+    
+    def clear(self):
+        """Drop all in-memory entries and reset the counters"""
+        with self._lock:
+            self.entries.clear()
+            self.hits = self.misses = self.disk_hits = 0
+    
+    def stats(self):
+        """Hit/miss counters and hit rate"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "entries": len(self.entries),
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
@@ -0,0 +1,233 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from urllib.parse import parse_qs, urlsplit
+
+try:
+    from .analysis import REPORT_TITLES, EcommerceAnalyzer
+    from .database import EcommerceDatabase
+except ImportError:
+    from analysis import REPORT_TITLES, EcommerceAnalyzer
+    from database import EcommerceDatabase
+
+
+# Query parameters that carry lists, and how to parse their items
+LIST_FILTERS = {"geos": str, "product_tiers": int, "discount_tiers": int}
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+
+
+def parse_filters(query):
+    """Turn URL query parameters into analyze_* filters (lists are comma-separated)"""
+    params = {name: values[-1] for name, values in parse_qs(query).items()}
+    options = {
+        "stream": params.pop("stream", "0") in ("1", "true"),
+        "chunk_size": int(params.pop("chunk_size", 10_000))
+    }
+    # Rejected here, before any header is sent, rather than halfway through a stream
+    if options["chunk_size"] < 1:
+        raise ValueError(f"chunk_size must be at least 1, got {options['chunk_size']}")
+    
+    filters = {}
+    for name, value in params.items():
+        if name in LIST_FILTERS:
+            filters[name] = [LIST_FILTERS[name](item) for item in value.split(",") if item]
+        else:
+            filters[name] = value
+    return filters, options
+
+
+class ReportService:
+    """Asyncio HTTP service exposing the EcommerceAnalyzer reports as JSON
+    
+    GET /reports lists the reports and GET /reports/<name>?<filters> returns one.
+    Identical requests in flight share a single query, ?stream=1 sends the rows as
+    chunked NDJSON, and every response carries its latency. Rollups and the sample
+    are refreshed before each query is dispatched (see report_async), so reports
+    include transactions loaded while the service runs.
+    """
+    
+    def __init__(self, analyzer):
+        self.analyzer = analyzer
+        self._inflight = {}
+        self.requests = 0
+        self.coalesced = 0
+    
+    async def get_report(self, name, filters):
+        """Report DataFrame, sharing the query with identical in-flight requests
+        
+        Returns (df, coalesced).
+        """
+        key = (name, tuple(sorted((k, repr(v)) for k, v in filters.items())))
+        task = self._inflight.get(key)
+        
+        if task is not None:
+            self.coalesced += 1
+            return await asyncio.shield(task), True
+        
+        task = asyncio.ensure_future(self.analyzer.report_async(name, **filters))
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task), False
+    
+    async def handle(self, reader, writer):
+        """Serve one HTTP request"""
+        start = time.perf_counter()
+        status = 500
+        path = "?"
+        
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            # Skip the headers, requests never have a body we need
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            
+            if len(request_line) < 2:
+                status = 400
+                await self._send_json(writer, status, {"error": "malformed request"}, start)
+                return
+            
+            method, target = request_line[0], request_line[1]
+            url = urlsplit(target)
+            path = url.path
+            
+            if method != "GET":
+                status = 405
+                await self._send_json(writer, status, {"error": "only GET is supported"}, start)
+                return
+            
+            if path.rstrip("/") == "/reports":
+                status = 200
+                await self._send_json(writer, status, {"reports": list(REPORT_TITLES)}, start)
+                return
+            
+            name = path[len("/reports/"):] if path.startswith("/reports/") else None
+            if name not in REPORT_TITLES:
+                status = 404
+                await self._send_json(writer, status, {"error": f"unknown report {path}"}, start)
+                return
+            
+            try:
+                filters, options = parse_filters(url.query)
+                df, coalesced = await self.get_report(name, filters)
+            except (TypeError, ValueError) as e:
+                status = 400
+                await self._send_json(writer, status, {"error": str(e)}, start)
+                return
+            
+            status = 200
+            if options["stream"]:
+                await self._send_stream(writer, df, options["chunk_size"], start, coalesced)
+            else:
+                body = {
+                    "report": name,
+                    "filters": filters,
+                    "columns": list(df.columns),
+                    "rows": json.loads(df.to_json(orient="records")),
+                    "coalesced": coalesced,
+                    "latency_ms": (time.perf_counter() - start) * 1000
+                }
+                await self._send_json(writer, status, body, start)
+        
+        except Exception as e:
+            print(f"Error while serving {path}: {e}")
+            if not writer.is_closing():
+                await self._send_json(writer, status, {"error": str(e)}, start)
+        finally:
+            self.requests += 1
+            print(f"{status} {path} {(time.perf_counter() - start) * 1000:.1f} ms")
+            writer.close()
+    
+    def _headers(self, status, content_type, start, extra=()):
+        lines = [
+            f"HTTP/1.1 {status} {STATUS_TEXT[status]}",
+            f"Content-Type: {content_type}",
+            f"X-Response-Time-Ms: {(time.perf_counter() - start) * 1000:.3f}",
+            "Connection: close",
+            *extra
+        ]
+        return ("\r\n".join(lines) + "\r\n\r\n").encode()
+    
+    async def _send_json(self, writer, status, body, start):
+        payload = json.dumps(body).encode()
+        writer.write(self._headers(status, "application/json", start, [f"Content-Length: {len(payload)}"]))
+        writer.write(payload)
+        await writer.drain()
+    
+    async def _send_stream(self, writer, df, chunk_size, start, coalesced):
+        """Send rows as NDJSON with chunked transfer encoding, chunk_size rows at a time"""
+        extra = ["Transfer-Encoding: chunked", f"X-Coalesced: {str(coalesced).lower()}"]
+        writer.write(self._headers(200, "application/x-ndjson", start, extra))
+        
+        for offset in range(0, len(df), chunk_size):
+            chunk = df.iloc[offset:offset + chunk_size].to_json(orient="records", lines=True)
+            data = (chunk if chunk.endswith("\n") else chunk + "\n").encode()
+            writer.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+            # Back-pressure: wait for the client before producing the next chunk
+            await writer.drain()
+        
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+    
+    async def serve(self, host="127.0.0.1", port=8080):
+        """Run the HTTP server until cancelled"""
+        server = await asyncio.start_server(self.handle, host, port, backlog=1024)
+        print(f"Report service listening on http://{host}:{port}/reports")
+        async with server:
+            await server.serve_forever()
+
+
+def enable_wal(db_name):
+    """Switch the database file to WAL before serving
+    
+    Requests refresh rollups/sample on the main connection while the pool reads;
+    with a rollback journal that write waits for (and blocks) every reader.
+    """
+    db = EcommerceDatabase(db_name)
+    db.connect()
+    try:
+        db.enable_wal()
+    finally:
+        db.close()
+
+
+def main():
+    """Run the report service"""
+    parser = argparse.ArgumentParser(description="Serve EcommerceAnalyzer reports over HTTP")
+    parser.add_argument("--db", default="ecommerce.db", help="Database file")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind")
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on")
+    parser.add_argument("--pool-size", type=int, default=4, help="Read-only connections / worker threads")
+    parser.add_argument("--cache-size", type=int, default=128, help="Result cache entries (0 disables)")
+    parser.add_argument("--use-rollups", action="store_true", help="Answer reports from daily_rollup")
+    parser.add_argument("--approximate", action="store_true", help="Estimate reports from the stratified sample")
+    args = parser.parse_args()
+    
+    # Before the pool opens its read-only connections
+    if os.path.exists(args.db):
+        enable_wal(args.db)
+    
+    analyzer = EcommerceAnalyzer(args.db, use_rollups=args.use_rollups, approximate=args.approximate,
+                                 cache_size=args.cache_size, pool_size=args.pool_size)
+    if not hasattr(analyzer, "conn"):
+        return 1
+    
+    # Fold the backlog in before listening; requests then only refresh what arrived since
+    if args.use_rollups:
+        analyzer.refresh_rollups()
+    if args.approximate:
+        analyzer.refresh_approximate()
+    
+    try:
+        asyncio.run(ReportService(analyzer).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        analyzer.close()
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,303 @@
+import json
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .analysis import reports_from_cube
+    from .database import (BASIS_POINTS_PER_PERCENT, CENTS_PER_UNIT, SCHEMA_CENTS, STREAM_TABLES_SQL,
+                           TRANSACTION_COLUMNS, schema_flags)
+    from .queries import PRODUCTS_QUERY
+except ImportError:
+    from analysis import reports_from_cube
+    from database import (BASIS_POINTS_PER_PERCENT, CENTS_PER_UNIT, SCHEMA_CENTS, STREAM_TABLES_SQL,
+                          TRANSACTION_COLUMNS, schema_flags)
+    from queries import PRODUCTS_QUERY
+
+
+CUBE_COLUMNS = [
+    "product_id", "geo", "discount_tier", "applied_discount",
+    "transaction_count", "total_revenue", "total_discount_given"
+]
+
+DEFAULT_SNAPSHOT_EVERY = 100_000
+
+
+def iter_jsonl(path):
+    """Yield one transaction dict per non-empty line of a JSONL file"""
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+class StreamingAggregator:
+    """Live report metrics over a transaction stream
+    
+    Keeps the report cube as dense NumPy accumulators indexed by (product, geo,
+    discount tier, applied discount) codes, so every event is a few array
+    increments. Pluggable into EcommerceAnalyzer as a backend; date filters are
+    not supported since the stream is aggregated over all time.
+    
+    With cents=True the events carry integer cents and basis points (as in a
+    SCHEMA_CENTS database), the accumulators are int64 and exact, and values are
+    converted to currency units and percent only in fetch_cube().
+    """
+    
+    def __init__(self, products, users, cents=False):
+        self.products = products[["product_id", "name", "tier"]].reset_index(drop=True)
+        self.cents = cents
+        self.events = 0
+        self.last_transaction_id = None
+        
+        product_ids = self.products["product_id"].to_numpy()
+        self.product_index = np.full(int(product_ids.max()) + 1, -1, dtype=np.int64)
+        self.product_index[product_ids] = np.arange(len(product_ids))
+        self.product_tier = self.products["tier"].to_numpy()
+        
+        # Dense user_id-indexed lookups of the user's geo and discount tier codes
+        self.geo_names, geo_codes = np.unique(users["geo"].to_numpy(), return_inverse=True)
+        self.discount_tiers, tier_codes = np.unique(users["discount_tier"].to_numpy(), return_inverse=True)
+        user_ids = users["user_id"].to_numpy()
+        self.user_geo = np.full(int(user_ids.max()) + 1, -1, dtype=np.int64)
+        self.user_geo[user_ids] = geo_codes
+        self.user_tier = np.full(int(user_ids.max()) + 1, -1, dtype=np.int64)
+        self.user_tier[user_ids] = tier_codes
+        
+        # Applied discounts are only known from the stream, so that axis grows on demand
+        self.discount_values = []
+        self._discount_codes = {}
+        shape = (len(product_ids), len(self.geo_names), len(self.discount_tiers), 4)
+        self.value_type = np.int64 if cents else np.float64
+        self.count = np.zeros(shape, dtype=np.int64)
+        self.revenue = np.zeros(shape, dtype=self.value_type)
+        self.discount_given = np.zeros(shape, dtype=self.value_type)
+    
+    @classmethod
+    def from_database(cls, conn):
+        """Aggregator with the products, users and money units of a database"""
+        products = pd.read_sql_query(PRODUCTS_QUERY, conn)
+        users = pd.read_sql_query("SELECT user_id, geo, discount_tier FROM users", conn)
+        return cls(products, users, cents=bool(schema_flags(conn) & SCHEMA_CENTS))
+    
+    @classmethod
+    def from_snapshot(cls, conn):
+        """Aggregator restored from the last snapshot written to a database
+        
+        Snapshots hold the accumulators in their own units, so an integer-cents
+        aggregator restores exactly.
+        """
+        aggregator = cls.from_database(conn)
+        cube = pd.read_sql_query("SELECT * FROM stream_cube", conn)
+        
+        for row in cube.itertuples(index=False):
+            cell = aggregator._cell(row.product_id, row.geo, row.discount_tier, row.applied_discount)
+            aggregator.count[cell] += row.transaction_count
+            aggregator.revenue[cell] += aggregator.value_type(row.total_revenue)
+            aggregator.discount_given[cell] += aggregator.value_type(row.total_discount_given)
+        
+        state = conn.execute("SELECT events, last_transaction_id FROM stream_state").fetchone()
+        if state:
+            aggregator.events, aggregator.last_transaction_id = state
+        return aggregator
+    
+    def _discount_code(self, value):
+        """Code of an applied discount value, growing the accumulators for new values"""
+        value = float(value)
+        code = self._discount_codes.get(value)
+        if code is not None:
+            return code
+        
+        code = len(self.discount_values)
+        if code == self.count.shape[3]:
+            pad = [(0, 0), (0, 0), (0, 0), (0, code)]
+            self.count = np.pad(self.count, pad)
+            self.revenue = np.pad(self.revenue, pad)
+            self.discount_given = np.pad(self.discount_given, pad)
+        
+        self.discount_values.append(value)
+        self._discount_codes[value] = code
+        return code
+    
+    def _cell(self, product_id, geo, discount_tier, applied_discount):
+        """Accumulator index of a cube cell given by its values (for restoring snapshots)"""
+        return (
+            self._lookup(self.product_index, product_id, "product"),
+            self._sorted_code(self.geo_names, geo, "geo"),
+            self._sorted_code(self.discount_tiers, discount_tier, "discount tier"),
+            self._discount_code(applied_discount)
+        )
+    
+    @staticmethod
+    def _sorted_code(values, value, what):
+        """Position of value in the sorted array values, rejecting values it does not hold"""
+        code = int(np.searchsorted(values, value))
+        if code == len(values) or values[code] != value:
+            raise KeyError(f"Snapshot cell for an unknown {what} {value!r}; "
+                           f"rebuild the aggregator from the current data")
+        return code
+    
+    @staticmethod
+    def _lookup(table, ids, what):
+        """Codes of ids in a dense lookup table, rejecting ids it does not know"""
+        ids = np.asarray(ids)
+        # Negative ids would silently index from the end of the table
+        codes = -1 if np.any((ids < 0) | (ids >= len(table))) else table[ids]
+        if np.any(codes < 0):
+            raise KeyError(f"Transaction for an unknown {what}; rebuild the aggregator from the current data")
+        return codes
+    
+    def add(self, row):
+        """Add one transaction (a row tuple in TRANSACTION_COLUMNS order or a dict)"""
+        if isinstance(row, dict):
+            transaction_id = row.get("transaction_id")
+            product_id, user_id = row["product_id"], row["user_id"]
+            initial_cost, applied_discount, final_cost = (
+                row["initial_cost"], row["applied_discount"], row["final_cost"]
+            )
+        else:
+            transaction_id, product_id, user_id, _, initial_cost, applied_discount, final_cost = row
+        
+        cell = (
+            self._lookup(self.product_index, product_id, "product"),
+            self._lookup(self.user_geo, user_id, "user"),
+            self.user_tier[user_id],
+            self._discount_code(applied_discount)
+        )
+        
+        self.count[cell] += 1
+        self.revenue[cell] += final_cost
+        if self.cents:
+            self.discount_given[cell] += applied_discount * initial_cost
+        else:
+            self.discount_given[cell] += applied_discount * initial_cost / 100
+        
+        self.events += 1
+        if transaction_id is not None:
+            self.last_transaction_id = transaction_id
+    
+    def add_batch(self, rows):
+        """Add a list of transactions (row tuples or dicts) with vectorized updates"""
+        if not len(rows):
+            return
+        
+        if isinstance(rows[0], dict):
+            frame = pd.DataFrame.from_records(rows)
+        else:
+            frame = pd.DataFrame.from_records(rows, columns=TRANSACTION_COLUMNS)
+        
+        applied_discount = frame["applied_discount"].to_numpy(dtype=self.value_type)
+        values, inverse = np.unique(applied_discount, return_inverse=True)
+        discount_codes = np.array([self._discount_code(value) for value in values])[inverse]
+        
+        user_id = frame["user_id"].to_numpy()
+        geo = self._lookup(self.user_geo, user_id, "user")
+        tier = self.user_tier[user_id]
+        product = self._lookup(self.product_index, frame["product_id"].to_numpy(), "product")
+        flat = np.ravel_multi_index((product, geo, tier, discount_codes), self.count.shape)
+        
+        given = applied_discount * frame["initial_cost"].to_numpy(dtype=self.value_type)
+        if not self.cents:
+            given = given / 100
+        
+        # bincount sums in float64, which is exact for integer cents as long as one
+        # batch's sums per cell stay below 2**53; the running totals are int64
+        size = self.count.size
+        self.count += np.bincount(flat, minlength=size).reshape(self.count.shape)
+        revenue = np.bincount(flat, frame["final_cost"].to_numpy(dtype=np.float64), minlength=size)
+        given = np.bincount(flat, given, minlength=size)
+        self.revenue += revenue.astype(self.value_type).reshape(self.count.shape)
+        self.discount_given += given.astype(self.value_type).reshape(self.count.shape)
+        
+        self.events += len(frame)
+        if "transaction_id" in frame:
+            self.last_transaction_id = int(frame["transaction_id"].iloc[-1])
+    
+    def consume(self, rows, snapshot_conn=None, snapshot_every=DEFAULT_SNAPSHOT_EVERY):
+        """Add transactions one by one, snapshotting every snapshot_every events"""
+        next_snapshot = self.events + snapshot_every
+        
+        for row in rows:
+            self.add(row)
+            if snapshot_conn is not None and self.events >= next_snapshot:
+                self.snapshot(snapshot_conn)
+                next_snapshot = self.events + snapshot_every
+        
+        if snapshot_conn is not None:
+            self.snapshot(snapshot_conn)
+    
+    def consume_batches(self, batches, snapshot_conn=None, snapshot_every=DEFAULT_SNAPSHOT_EVERY):
+        """Add batches of transactions (e.g. DataGenerator.iter_transaction_batches())"""
+        next_snapshot = self.events + snapshot_every
+        
+        for batch in batches:
+            self.add_batch(batch)
+            if snapshot_conn is not None and self.events >= next_snapshot:
+                self.snapshot(snapshot_conn)
+                next_snapshot = self.events + snapshot_every
+        
+        if snapshot_conn is not None:
+            self.snapshot(snapshot_conn)
+    
+    def snapshot(self, conn):
+        """Replace the stored cube and stream state with the current figures"""
+        cube = self._cells()
+        
+        conn.executescript(STREAM_TABLES_SQL)
+        cursor = conn.cursor()
+        cursor.execute("BEGIN")
+        cursor.execute("DELETE FROM stream_cube")
+        cursor.executemany(f'''
+            INSERT INTO stream_cube ({", ".join(CUBE_COLUMNS)})
+            VALUES ({", ".join("?" * len(CUBE_COLUMNS))})
+        ''', cube[CUBE_COLUMNS].astype(object).itertuples(index=False, name=None))
+        cursor.execute("DELETE FROM stream_state")
+        cursor.execute("INSERT INTO stream_state (events, last_transaction_id, updated_at) VALUES (?, ?, ?)",
+                       (self.events, self.last_transaction_id, datetime.now().isoformat(timespec="seconds")))
+        conn.commit()
+    
+    def fetch_products(self):
+        """Products with name and tier"""
+        return self.products.copy()
+    
+    def _cells(self):
+        """Non-empty accumulator cells in the units of the events"""
+        product, geo, tier, discount = np.nonzero(self.count)
+        return pd.DataFrame({
+            "product_id": self.products["product_id"].to_numpy()[product],
+            "geo": self.geo_names[geo],
+            "discount_tier": self.discount_tiers[tier],
+            "applied_discount": np.array(self.discount_values, dtype=self.value_type)[discount],
+            "transaction_count": self.count[product, geo, tier, discount],
+            "total_revenue": self.revenue[product, geo, tier, discount],
+            "total_discount_given": self.discount_given[product, geo, tier, discount]
+        })
+    
+    def fetch_cube(self, start_date=None, end_date=None, geos=None, product_tiers=None,
+                   discount_tiers=None):
+        """Current report cube, one row per non-empty cell"""
+        if start_date is not None or end_date is not None:
+            raise ValueError("Streaming aggregates cover all time; date filters are not supported")
+        
+        cube = self._cells()
+        product = self.product_index[cube["product_id"].to_numpy()]
+        if self.cents:
+            cube["applied_discount"] = cube["applied_discount"] / BASIS_POINTS_PER_PERCENT
+            cube["total_revenue"] = cube["total_revenue"] / CENTS_PER_UNIT
+            # basis points * cents -> percent * currency units, then percent -> fraction
+            cube["total_discount_given"] = (cube["total_discount_given"]
+                                            / (BASIS_POINTS_PER_PERCENT * CENTS_PER_UNIT * 100))
+        
+        mask = np.ones(len(cube), dtype=bool)
+        if geos is not None:
+            mask &= cube["geo"].isin(list(geos)).to_numpy()
+        if product_tiers is not None:
+            mask &= np.isin(self.product_tier[product], list(product_tiers))
+        if discount_tiers is not None:
+            mask &= cube["discount_tier"].isin(list(discount_tiers)).to_numpy()
+        return cube[mask].reset_index(drop=True)
+    
+    def reports(self, **filters):
+        """The four report DataFrames from the current figures"""
+        return reports_from_cube(self.fetch_cube(**filters), self.fetch_products())
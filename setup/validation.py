@@ -0,0 +1,203 @@
+import sqlite3
+from datetime import date
+
+import numpy as np
+
+try:
+    from .data_generators import DataGenerator, discounted_cents
+    from .database import (BASIS_POINTS_PER_PERCENT, EPOCH, SCHEMA_ANALYTICS, SCHEMA_CENTS,
+                           schema_flags)
+except ImportError:
+    from data_generators import DataGenerator, discounted_cents
+    from database import (BASIS_POINTS_PER_PERCENT, EPOCH, SCHEMA_ANALYTICS, SCHEMA_CENTS,
+                          schema_flags)
+
+
+# Rows per keyset chunk; memory is bounded by this, not by the size of transactions
+DEFAULT_CHUNK_SIZE = 500_000
+
+# Violating transaction_ids kept per check
+DEFAULT_SAMPLE_SIZE = 10
+
+CHECKS = ("product_fk", "user_fk", "initial_cost", "final_cost", "discount_margin", "date_bounds")
+
+# Day number of transaction_date: stored as is, or from ISO text. Dates that do
+# not survive the round trip through a day number (e.g. 2026-02-30) give NULL
+DAY_SQL = {
+    True: "transaction_date",
+    False: ("CASE WHEN date(julianday(transaction_date)) = transaction_date "
+            "THEN julianday(transaction_date) - 2440587.5 END")
+}
+
+# REAL schema: initial_cost is the retail price rounded to cents, and final_cost is
+# rounded from the unrounded price, so they may be off by half a cent each
+HALF_CENT = 0.005 + 1e-9
+ROUNDING_TOLERANCE = 2 * HALF_CENT
+
+
+def sorted_ids(conn, query):
+    """First column of a query ordered by it, as an int64 array, without a row list"""
+    return np.fromiter((row[0] for row in conn.execute(query)), dtype=np.int64)
+
+
+def lookup(sorted_values, values):
+    """Positions of values in sorted_values and whether they are present (searchsorted membership)"""
+    if len(sorted_values) == 0:
+        return np.zeros(len(values), dtype=np.int64), np.zeros(len(values), dtype=bool)
+    
+    positions = np.minimum(np.searchsorted(sorted_values, values), len(sorted_values) - 1)
+    return positions, sorted_values[positions] == values
+
+
+class TransactionValidator:
+    """Data-integrity checks of transactions, vectorized over keyset chunks
+    
+    Every check counts its violations and keeps the first sample_size
+    violating transaction_ids:
+        product_fk, user_fk  product_id / user_id missing from products / users
+        initial_cost         differs from the product's retail_cost
+        final_cost           differs from initial_cost * (1 - applied_discount / 100)
+                             beyond rounding (exact with integer cents)
+        discount_margin      applied_discount above the margin of the product tier
+                             (DataGenerator.product_tiers)
+        date_bounds          transaction_date invalid or outside [start_date, end_date]
+    Rows with an unknown product_id are only counted under product_fk. Memory
+    stays bounded by chunk_size plus the sorted product and user ids.
+    """
+    
+    def __init__(self, db_name="ecommerce.db", chunk_size=DEFAULT_CHUNK_SIZE,
+                 sample_size=DEFAULT_SAMPLE_SIZE, start_date=None, end_date=None,
+                 product_tiers=None):
+        self.db_name = db_name
+        self.chunk_size = chunk_size
+        self.sample_size = sample_size
+        
+        # Transactions may not be dated in the future unless end_date says otherwise
+        self.start_date = None if start_date is None else date.fromisoformat(str(start_date))
+        self.end_date = date.today() if end_date is None else date.fromisoformat(str(end_date))
+        self.product_tiers = product_tiers
+    
+    def validate(self):
+        """Run every check over all transactions; returns rows, violations and samples per check"""
+        self.rows = 0
+        self.violations = {name: 0 for name in CHECKS}
+        self.samples = {name: [] for name in CHECKS}
+        
+        conn = sqlite3.connect(self.db_name)
+        try:
+            flags = schema_flags(conn)
+            self._load_dimensions(conn)
+            
+            cursor = conn.cursor()
+            last_id = 0
+            while True:
+                cursor.execute(f'''
+                    SELECT transaction_id, product_id, user_id, {DAY_SQL[bool(flags & SCHEMA_ANALYTICS)]},
+                           initial_cost, applied_discount, final_cost
+                    FROM transactions
+                    WHERE transaction_id > ?
+                    ORDER BY transaction_id
+                    LIMIT ?
+                ''', (last_id, self.chunk_size))
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                
+                # Every selected column is numeric, so the chunk converts in one step
+                # (NULL days become NaN)
+                self._check_chunk(np.array(rows, dtype=np.float64), flags)
+                self.rows += len(rows)
+                last_id = rows[-1][0]
+        finally:
+            conn.close()
+        
+        self._print_summary()
+        return {"rows": self.rows, "violations": dict(self.violations), "samples": dict(self.samples)}
+    
+    def _load_dimensions(self, conn):
+        """Sorted product and user ids with product-aligned retail cost and margin"""
+        product_tiers = self.product_tiers or DataGenerator(conn).product_tiers
+        products = conn.execute("SELECT product_id, retail_cost, tier FROM products ORDER BY product_id").fetchall()
+        
+        self.product_ids = np.array([row[0] for row in products], dtype=np.int64)
+        self.retail_cost = np.array([row[1] for row in products])
+        self.margin_pct = np.array([product_tiers[row[2]]["margin"] * 100 for row in products])
+        self.user_ids = sorted_ids(conn, "SELECT user_id FROM users ORDER BY user_id")
+    
+    def _record(self, name, mask, ids):
+        """Add the violations of one check in a chunk"""
+        count = int(np.count_nonzero(mask))
+        if not count:
+            return
+        
+        self.violations[name] += count
+        room = self.sample_size - len(self.samples[name])
+        if room > 0:
+            self.samples[name].extend(ids[mask][:room].tolist())
+    
+    def _check_chunk(self, chunk, flags):
+        """Vectorized checks of one chunk, a float64 array with one column per selected field"""
+        ids = chunk[:, 0].astype(np.int64)
+        product_id = chunk[:, 1].astype(np.int64)
+        user_id = chunk[:, 2].astype(np.int64)
+        days = chunk[:, 3]
+        cents = bool(flags & SCHEMA_CENTS)
+        money_type = np.int64 if cents else np.float64
+        initial_cost = chunk[:, 4].astype(money_type)
+        applied_discount = chunk[:, 5].astype(money_type)
+        final_cost = chunk[:, 6].astype(money_type)
+        
+        positions, known_product = lookup(self.product_ids, product_id)
+        self._record("product_fk", ~known_product, ids)
+        self._record("user_fk", ~lookup(self.user_ids, user_id)[1], ids)
+        
+        retail_cost = self.retail_cost[positions] if len(self.retail_cost) else np.zeros(len(ids))
+        margin_pct = self.margin_pct[positions] if len(self.margin_pct) else np.zeros(len(ids))
+        
+        if cents:
+            wrong_initial = initial_cost != retail_cost
+            wrong_final = final_cost != discounted_cents(initial_cost, applied_discount)
+            discount_pct = applied_discount / BASIS_POINTS_PER_PERCENT
+        else:
+            wrong_initial = np.abs(initial_cost - retail_cost) > HALF_CENT
+            wrong_final = np.abs(final_cost - initial_cost * (1 - applied_discount / 100)) > ROUNDING_TOLERANCE
+            discount_pct = applied_discount
+        
+        self._record("initial_cost", known_product & wrong_initial, ids)
+        self._record("final_cost", wrong_final, ids)
+        self._record("discount_margin", known_product & (discount_pct > margin_pct + 1e-9), ids)
+        
+        # Unparseable dates are NaN and count as violations
+        out_of_bounds = np.isnan(days) | (days > (self.end_date - EPOCH).days)
+        if self.start_date is not None:
+            out_of_bounds |= days < (self.start_date - EPOCH).days
+        self._record("date_bounds", out_of_bounds, ids)
+    
+    def _print_summary(self):
+        """Print violation counts and sample transaction_ids per check"""
+        print(f"\n=== Transaction Validation ({self.rows} rows) ===")
+        for name in CHECKS:
+            count = self.violations[name]
+            sample = f" (e.g. transaction_id {', '.join(map(str, self.samples[name]))})" if count else ""
+            print(f"   {name:<16} {count} violations{sample}")
+
+
+def main():
+    """Validate the e-commerce database"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Validate transactions of the e-commerce database")
+    parser.add_argument("--db", default="ecommerce.db", help="Database file")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows per chunk")
+    parser.add_argument("--start-date", default=None, help="Earliest allowed transaction_date")
+    parser.add_argument("--end-date", default=None, help="Latest allowed transaction_date (default: today)")
+    args = parser.parse_args()
+    
+    validator = TransactionValidator(args.db, args.chunk_size, start_date=args.start_date,
+                                     end_date=args.end_date)
+    result = validator.validate()
+    return 1 if any(result["violations"].values()) else 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,4 @@
+def sort_report(df):
+    """Отчёт, упорядоченный по ключевой колонке (порядок равных строк не определён)"""
+    key = "name" if "name" in df.columns else df.columns[0]
+    return df.sort_values(key).reset_index(drop=True)
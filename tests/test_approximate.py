@@ -0,0 +1,204 @@
+import contextlib
+import io
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from setup.analysis import REPORT_TITLES, EcommerceAnalyzer
+from setup.approximate import STRATA_KEYS, hll_add, hll_estimate, hll_registers, sample_priority
+from setup.data_generators import DataGenerator
+from setup.fixtures import FixtureCache
+
+
+# Наборы фильтров, на которых сравниваются приближённые и точные отчёты
+FILTER_SETS = [
+    {},
+    {"geos": ["USA", "DE", "FR"]},
+    {"product_tiers": [2, 3], "discount_tiers": [5, 10, 15, 20]}
+]
+
+# Минимальная доля точных значений внутри 95% доверительных интервалов
+MIN_COVERAGE = 0.85
+
+# Допустимая относительная ошибка оценок
+MAX_RELATIVE_ERROR = 0.15
+
+
+class ApproximateTester:
+    def __init__(self, num_transactions=100000, sample_size=500):
+        self.num_transactions = num_transactions
+        self.sample_size = sample_size
+        self.tmp_dir = None
+        self.db_name = None
+    
+    def build_database(self):
+        """Создание временной базы данных для сравнения с точными отчётами (копия из кэша фикстур)"""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_name = os.path.join(self.tmp_dir.name, "approximate.db")
+        FixtureCache().restore(self.db_name, 7, self.num_transactions, analytics_schema=True)
+    
+    def test_reports_within_bounds(self):
+        """Тест 1: Точные значения попадают в доверительные интервалы оценок"""
+        print("\n=== Тест 1: Оценки и доверительные интервалы ===")
+        
+        approximate = EcommerceAnalyzer(self.db_name, approximate=True, sample_size=self.sample_size)
+        exact = EcommerceAnalyzer(self.db_name)
+        all_correct = True
+        all_covered = []
+        
+        try:
+            approximate.refresh_approximate()
+            
+            for filters in FILTER_SETS:
+                for name in REPORT_TITLES:
+                    start = time.perf_counter()
+                    estimated = approximate._report(name, filters)
+                    approximate_seconds = time.perf_counter() - start
+                    
+                    start = time.perf_counter()
+                    expected = exact._report(name, filters)
+                    exact_seconds = time.perf_counter() - start
+                    
+                    key = "name" if name == "product_popularity" else expected.columns[0]
+                    merged = expected.merge(estimated, on=key, suffixes=("", "_estimate"))
+                    
+                    covered = []
+                    errors = []
+                    for column in estimated.columns:
+                        if not column.endswith("_ci") or column[:-3] not in expected.columns:
+                            continue
+                        column = column[:-3]
+                        error = (merged[f"{column}_estimate"] - merged[column]).abs()
+                        covered.extend(error <= merged[f"{column}_ci"] + 1e-6)
+                        errors.extend(error / merged[column].abs())
+                    
+                    all_covered.extend(covered)
+                    max_error = max(errors)
+                    label = f"{name} {filters or ''}"
+                    
+                    if len(merged) != len(expected) or max_error > MAX_RELATIVE_ERROR:
+                        print(f"❌ {label}: макс. ошибка {max_error:.1%}, групп {len(merged)}/{len(expected)}")
+                        all_correct = False
+                    else:
+                        print(f"✅ {label}: покрытие {np.mean(covered):.0%}, макс. ошибка {max_error:.1%}, "
+                              f"{approximate_seconds * 1000:.0f} мс против {exact_seconds * 1000:.0f} мс")
+        finally:
+            approximate.close()
+            exact.close()
+        
+        # Покрытие проверяется по всем оценкам сразу: в одном отчёте их слишком мало
+        coverage = np.mean(all_covered)
+        if coverage < MIN_COVERAGE:
+            print(f"❌ Покрытие доверительных интервалов {coverage:.0%} (ожидается не меньше {MIN_COVERAGE:.0%})")
+            return False
+        
+        print(f"✅ Покрытие доверительных интервалов {coverage:.0%} по {len(all_covered)} оценкам")
+        return all_correct
+    
+    def test_unique_users(self):
+        """Тест 2: HyperLogLog оценивает число уникальных пользователей"""
+        print("\n=== Тест 2: Уникальные пользователи (HyperLogLog) ===")
+        all_correct = True
+        
+        # 1000 значений оцениваются линейным счётом, 100000 - самой формулой HyperLogLog
+        for cardinality in (1000, 100000):
+            estimate = hll_estimate(hll_add(hll_registers(), np.arange(cardinality)))
+            error = abs(estimate - cardinality) / cardinality
+            if error > 0.05:
+                print(f"❌ {cardinality} значений: оценка {estimate:.0f}")
+                all_correct = False
+            else:
+                print(f"✅ {cardinality} значений: оценка {estimate:.0f} (ошибка {error:.2%})")
+        
+        analyzer = EcommerceAnalyzer(self.db_name, approximate=True, sample_size=self.sample_size)
+        try:
+            estimated = analyzer._report("geo_performance", {}).set_index("geo")
+            expected = pd.read_sql_query('''
+                SELECT u.geo, COUNT(DISTINCT t.user_id) as unique_users
+                FROM transactions t
+                JOIN users u ON u.user_id = t.user_id
+                GROUP BY u.geo
+            ''', analyzer.conn).set_index("geo")
+        finally:
+            analyzer.close()
+        
+        for geo, row in expected.iterrows():
+            error = abs(estimated.loc[geo, "unique_users"] - row["unique_users"])
+            if error > estimated.loc[geo, "unique_users_ci"]:
+                print(f"❌ {geo}: оценка {estimated.loc[geo, 'unique_users']:.1f}, точно {row['unique_users']}")
+                all_correct = False
+        
+        if all_correct:
+            print(f"✅ Уникальные пользователи по {len(expected)} регионам в пределах интервала")
+        return all_correct
+    
+    def test_incremental_refresh(self):
+        """Тест 3: Инкрементальное обновление даёт ту же выборку, что и полный пересчёт"""
+        print("\n=== Тест 3: Инкрементальное обновление выборки ===")
+        
+        conn = sqlite3.connect(self.db_name)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                DataGenerator(conn).generate_transactions_vectorized(self.num_transactions + 20000,
+                                                                   seed=7, resume=True)
+        finally:
+            conn.close()
+        
+        analyzer = EcommerceAnalyzer(self.db_name, approximate=True, sample_size=self.sample_size)
+        try:
+            new_rows = analyzer.refresh_approximate()
+            if new_rows != 20000:
+                print(f"❌ Обработано {new_rows} новых строк вместо 20000")
+                return False
+            
+            sample = pd.read_sql_query("SELECT transaction_id FROM approx_sample", analyzer.conn)
+            transactions = pd.read_sql_query('''
+                SELECT t.transaction_id, p.tier as product_tier, u.geo
+                FROM transactions t
+                JOIN users u ON u.user_id = t.user_id
+                JOIN products p ON p.product_id = t.product_id
+            ''', analyzer.conn)
+        finally:
+            analyzer.close()
+        
+        transactions["priority"] = sample_priority(transactions["transaction_id"].to_numpy())
+        expected = (transactions.sort_values("priority").groupby(STRATA_KEYS)
+                    .head(self.sample_size)["transaction_id"])
+        
+        if set(sample["transaction_id"]) != set(expected):
+            print("❌ Выборка после обновления отличается от полного пересчёта")
+            return False
+        
+        print(f"✅ Выборка из {len(sample)} строк совпадает с полным пересчётом")
+        return True
+    
+    def run_all_tests(self):
+        """Запуск всех тестов приближённого режима"""
+        print(" Запуск тестов приближённого режима...\n")
+        
+        self.build_database()
+        try:
+            tests = [self.test_reports_within_bounds, self.test_unique_users, self.test_incremental_refresh]
+            passed = sum(1 for test in tests if test())
+        finally:
+            self.tmp_dir.cleanup()
+        
+        print(f"\n Результаты тестов: {passed}/{len(tests)} пройдено")
+        return passed == len(tests)
+
+
+def main():
+    """Основная функция для запуска тестов"""
+    tester = ApproximateTester()
+    return 0 if tester.run_all_tests() else 1
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,310 @@
+import contextlib
+import io
+import os
+import sqlite3
+import sys
+import tempfile
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from setup.analysis import EcommerceAnalyzer
+from setup.database import EPOCH, SCHEMA_ANALYTICS, SCHEMA_CENTS, TRANSACTION_INSERT_SQL, stored_date
+from setup.fixtures import FixtureCache
+from setup.queries import BEHAVIOUR_QUERIES
+
+
+# Покупатели фикстуры покупают почти каждый день и все попадают в первую когорту.
+# Добавляем редких покупателей: (discount_tier, дни покупок от первой даты фикстуры,
+# покупки со скидкой), чтобы были поздние когорты, пропуски месяцев и длинные интервалы
+EXTRA_CUSTOMERS = [
+    (0, (35, 36, 70, 140), (True, False, False, True)),
+    (5, (60, 95), (False, True)),
+    (10, (100,), (True,)),
+    (15, (150, 151, 152), (False, False, True)),
+    (5, (40, 100, 160), (True, True, False))
+]
+
+
+def percentile_score(values):
+    """Оценка 1-5 по PERCENT_RANK, как в RFM_CTE: равные значения получают одну оценку"""
+    ranks = values.rank(method="min").to_numpy()
+    percent_rank = (ranks - 1) / (len(values) - 1) if len(values) > 1 else np.zeros(len(values))
+    return np.minimum(5, 1 + np.floor(5 * percent_rank)).astype(np.int64)
+
+
+def segment(r_score, f_score):
+    """Сегмент RFM по правилам RFM_SEGMENT_SQL"""
+    if r_score >= 4 and f_score >= 4:
+        return "Champions"
+    if r_score >= 3 and f_score >= 3:
+        return "Loyal"
+    if r_score >= 4:
+        return "New"
+    if f_score >= 3:
+        return "At Risk"
+    if r_score <= 2:
+        return "Lost"
+    return "Needs Attention"
+
+
+class BehaviourTester:
+    def __init__(self, num_transactions=20000):
+        self.num_transactions = num_transactions
+        self.tmp_dir = None
+        self.db_name = None
+        self.purchases = None
+    
+    def build_database(self, **schema_options):
+        """Создание временной базы данных (копия из кэша фикстур) с редкими покупателями"""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_name = os.path.join(self.tmp_dir.name, "behaviour.db")
+        FixtureCache().restore(self.db_name, 42, self.num_transactions, **schema_options)
+        
+        conn = sqlite3.connect(self.db_name)
+        try:
+            flags = conn.execute("PRAGMA user_version").fetchone()[0]
+            first_date = pd.Timestamp(self.load_purchases(conn)["date"].min()).date()
+            user_id = conn.execute("SELECT MAX(user_id) FROM users").fetchone()[0]
+            transaction_id = conn.execute("SELECT MAX(transaction_id) FROM transactions").fetchone()[0]
+            price = 5000 if flags & SCHEMA_CENTS else 50.0
+            discount = 1000 if flags & SCHEMA_CENTS else 10.0
+            
+            for discount_tier, offsets, discounted in EXTRA_CUSTOMERS:
+                user_id += 1
+                conn.execute("INSERT INTO users (user_id, name, age, geo, discount_tier) VALUES (?, ?, ?, ?, ?)",
+                             (user_id, f"Sparse_{user_id}", 30, "USA", discount_tier))
+                for offset, has_discount in zip(offsets, discounted):
+                    transaction_id += 1
+                    applied = discount if has_discount else 0
+                    final = price * 9 // 10 if has_discount else price
+                    conn.execute(TRANSACTION_INSERT_SQL, (
+                        transaction_id, 1, user_id, stored_date(first_date + timedelta(days=offset), flags),
+                        price, applied, final
+                    ))
+            conn.commit()
+            
+            self.flags = flags
+            self.purchases = self.load_purchases(conn)
+        finally:
+            conn.close()
+    
+    def load_purchases(self, conn):
+        """Все покупки с датой, днём от EPOCH и месяцем, в порядке покупок каждого покупателя"""
+        flags = conn.execute("PRAGMA user_version").fetchone()[0]
+        df = pd.read_sql_query('''
+            SELECT t.transaction_id, t.user_id, t.transaction_date, t.applied_discount, t.final_cost,
+                   u.discount_tier
+            FROM transactions t
+            JOIN users u ON u.user_id = t.user_id
+        ''', conn)
+        
+        if flags & SCHEMA_ANALYTICS:
+            df["date"] = pd.Timestamp(EPOCH) + pd.to_timedelta(df["transaction_date"], unit="D")
+        else:
+            df["date"] = pd.to_datetime(df["transaction_date"])
+        df["day"] = (df["date"] - pd.Timestamp(EPOCH)).dt.days
+        df["month"] = df["date"].dt.strftime("%Y-%m")
+        df["month_number"] = df["date"].dt.year * 12 + df["date"].dt.month
+        if flags & SCHEMA_CENTS:
+            df["final_cost"] = df["final_cost"] / 100.0
+        return df.sort_values(["user_id", "day", "transaction_id"], ignore_index=True)
+    
+    def run_analyzer(self, method, **filters):
+        """Вызов метода EcommerceAnalyzer без вывода отчёта"""
+        analyzer = EcommerceAnalyzer(self.db_name)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                return getattr(analyzer, method)(**filters)
+        finally:
+            analyzer.close()
+    
+    def compare(self, label, actual, expected):
+        """Сравнение отчёта с эталоном pandas"""
+        try:
+            pd.testing.assert_frame_equal(actual.reset_index(drop=True), expected.reset_index(drop=True),
+                                          check_dtype=False, rtol=1e-9)
+        except AssertionError as e:
+            print(f"❌ {label}: {e}")
+            return False
+        print(f"✅ {label}: {len(expected)} строк совпадают")
+        return True
+    
+    def test_cohorts(self):
+        """Тест 1: Когорты и кривая удержания совпадают с расчётом по каждому покупателю"""
+        print("\n=== Тест 1: Когорты и удержание ===")
+        
+        df = self.purchases
+        first = df.groupby("user_id").first()
+        first["first_purchase"] = np.where(first["applied_discount"] > 0, "Discounted", "Full Price")
+        activity = df[["user_id", "month_number"]].drop_duplicates()
+        activity = activity.join(first[["month", "month_number", "first_purchase"]], on="user_id",
+                                 rsuffix="_first")
+        activity["months_since_first"] = activity["month_number"] - activity["month_number_first"]
+        
+        expected = (activity.groupby(["month", "months_since_first"]).size()
+                    .rename("active_users").reset_index().rename(columns={"month": "cohort"}))
+        sizes = first.groupby("month").size()
+        expected.insert(2, "cohort_size", expected["cohort"].map(sizes))
+        expected["retention_pct"] = expected["active_users"] / expected["cohort_size"] * 100
+        
+        # Месяц N считается только для когорт, которые можно наблюдать N месяцев
+        last_month = df["month_number"].max()
+        active = set(zip(activity["user_id"], activity["months_since_first"]))
+        curve = []
+        for first_purchase in sorted(first["first_purchase"].unique()):
+            group = first[first["first_purchase"] == first_purchase]
+            for months in range(activity["months_since_first"].max() + 1):
+                observed = group.index[group["month_number"] + months <= last_month]
+                if len(observed):
+                    active_users = sum((user_id, months) in active for user_id in observed)
+                    curve.append((first_purchase, months, len(observed), active_users,
+                                  active_users / len(observed) * 100))
+        expected_curve = pd.DataFrame(curve, columns=["first_purchase", "months_since_first", "customers",
+                                                      "active_users", "retention_pct"])
+        
+        if expected["cohort"].nunique() < 3:
+            print(f"❌ Слишком мало когорт для проверки: {expected['cohort'].nunique()}")
+            return False
+        
+        return (self.compare("analyze_cohorts", self.run_analyzer("analyze_cohorts"), expected)
+                and self.compare("analyze_retention", self.run_analyzer("analyze_retention"), expected_curve))
+    
+    def test_repeat_intervals(self):
+        """Тест 2: Интервалы между покупками совпадают с расчётом pandas"""
+        print("\n=== Тест 2: Интервалы между покупками ===")
+        
+        df = self.purchases.copy()
+        by_user = df.groupby("user_id")
+        df["days_since_previous"] = by_user["day"].diff()
+        df["previous_discount"] = by_user["applied_discount"].shift(1)
+        df = df[df["days_since_previous"].notna()]
+        df["previous_purchase"] = np.where(df["previous_discount"] > 0, "After Discount", "After Full Price")
+        df["within_30_days"] = (df["days_since_previous"] <= 30) * 100.0
+        
+        expected = df.groupby(["discount_tier", "previous_purchase"]).agg(
+            repeat_purchases=("days_since_previous", "size"),
+            repeat_customers=("user_id", "nunique"),
+            avg_days_between=("days_since_previous", "mean"),
+            max_days_between=("days_since_previous", "max"),
+            within_30_days_pct=("within_30_days", "mean")
+        ).reset_index()
+        
+        all_correct = self.compare("analyze_repeat_intervals", self.run_analyzer("analyze_repeat_intervals"),
+                                   expected)
+        
+        # С фильтром окно видит только покупки внутри диапазона дат
+        start_date = str(self.purchases["date"].iloc[len(self.purchases) // 2].date())
+        filtered = self.run_analyzer("analyze_repeat_intervals", start_date=start_date)
+        inside = self.purchases[self.purchases["date"] >= pd.Timestamp(start_date)]
+        repeats = len(inside) - inside["user_id"].nunique()
+        if filtered["repeat_purchases"].sum() != repeats:
+            print(f"❌ С фильтром start_date: {filtered['repeat_purchases'].sum()} повторных покупок, "
+                  f"ожидалось {repeats}")
+            all_correct = False
+        else:
+            print(f"✅ С фильтром start_date: {repeats} повторных покупок")
+        
+        return all_correct
+    
+    def test_rfm(self):
+        """Тест 3: Показатели и оценки RFM совпадают с расчётом pandas, сегменты сходятся с оценками"""
+        print("\n=== Тест 3: RFM ===")
+        
+        df = self.purchases.assign(discounted=(self.purchases["applied_discount"] > 0) * 100.0)
+        expected = df.groupby("user_id").agg(
+            last_day=("day", "max"),
+            frequency=("day", "size"),
+            monetary=("final_cost", "sum"),
+            discounted_pct=("discounted", "mean")
+        ).reset_index()
+        expected.insert(1, "recency_days", expected["last_day"].max() - expected["last_day"])
+        expected = expected.drop(columns="last_day")
+        
+        scores = self.run_analyzer("rfm_scores")
+        all_correct = self.compare("rfm_scores: recency, frequency, monetary",
+                                   scores[expected.columns], expected)
+        
+        # Оценки проверяются по значениям из SQLite, чтобы равные суммы не расходились в последнем бите
+        expected_scores = pd.DataFrame({
+            "r_score": percentile_score(-scores["recency_days"]),
+            "f_score": percentile_score(scores["frequency"]),
+            "m_score": percentile_score(scores["monetary"])
+        })
+        expected_scores["segment"] = [segment(r, f) for r, f in zip(expected_scores["r_score"],
+                                                                  expected_scores["f_score"])]
+        all_correct &= self.compare("rfm_scores: оценки и сегменты",
+                                    scores[expected_scores.columns], expected_scores)
+        
+        segments = scores.groupby("segment").agg(
+            customers=("user_id", "size"),
+            avg_recency_days=("recency_days", "mean"),
+            avg_frequency=("frequency", "mean"),
+            avg_monetary=("monetary", "mean"),
+            total_revenue=("monetary", "sum"),
+            avg_discounted_pct=("discounted_pct", "mean")
+        ).reset_index().sort_values("total_revenue", ascending=False)
+        all_correct &= self.compare("analyze_rfm", self.run_analyzer("analyze_rfm"), segments)
+        
+        return all_correct
+    
+    def test_ordered_scan(self):
+        """Тест 4: Запросы читают покупки по индексу (user_id, transaction_date) одним проходом"""
+        print("\n=== Тест 4: Планы запросов ===")
+        
+        analyzer = EcommerceAnalyzer(self.db_name)
+        all_correct = True
+        try:
+            for query_name in BEHAVIOUR_QUERIES:
+                plan = analyzer.explain(query_name)
+                if not any("COVERING INDEX idx_transactions_user_date" in detail for detail in plan):
+                    print(f"❌ {query_name}: индекс idx_transactions_user_date не используется")
+                    for detail in plan:
+                        print(f"   {detail}")
+                    all_correct = False
+                else:
+                    print(f"✅ {query_name}: {'; '.join(plan)}")
+        finally:
+            analyzer.close()
+        
+        return all_correct
+    
+    def run_all_tests(self):
+        """Запуск всех тестов для обычной схемы, схемы в целых центах и секционированной схемы"""
+        print(" Запуск тестов анализа поведения покупателей...\n")
+        
+        passed = 0
+        total = 0
+        
+        for schema_options in ({}, {"analytics_schema": True, "integer_cents": True},
+                               {"analytics_schema": True, "partitioned": True}):
+            self.build_database(**schema_options)
+            
+            try:
+                tests = [self.test_cohorts, self.test_repeat_intervals, self.test_rfm]
+                # Индекс есть только в схеме analytics; представление секций сортируется заново
+                if schema_options.get("analytics_schema") and not schema_options.get("partitioned"):
+                    tests.append(self.test_ordered_scan)
+                
+                for test in tests:
+                    total += 1
+                    if test():
+                        passed += 1
+            finally:
+                self.tmp_dir.cleanup()
+        
+        print(f"\n Результаты тестов: {passed}/{total} пройдено")
+        return passed == total
+
+
+def main():
+    """Основная функция для запуска тестов"""
+    tester = BehaviourTester()
+    return 0 if tester.run_all_tests() else 1
+
+
+if __name__ == "__main__":
+    exit(main())
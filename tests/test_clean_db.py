@@ -0,0 +1,242 @@
+import contextlib
+import io
+import os
+import sqlite3
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clean_db import (SIDECAR_SUFFIXES, clean_database, compact_database, create_template,
+                      reset_database_file, swap_in_template, truncate_database)
+from clean_db import main as clean_main
+from setup.database import SCHEMA_ANALYTICS, SCHEMA_CENTS, SCHEMA_PARTITIONED, EcommerceDatabase
+from setup.fixtures import FixtureCache
+
+# Схема фикстуры: все флаги user_version выставлены
+SCHEMA_OPTIONS = {"analytics_schema": True, "integer_cents": True, "partitioned": True}
+SCHEMA_FLAGS = SCHEMA_ANALYTICS | SCHEMA_CENTS | SCHEMA_PARTITIONED
+
+
+def quietly(func, *args, **kwargs):
+    """Вызов функции clean_db без её вывода"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+
+def describe(db_name):
+    """(user_version, таблицы, индексы, число транзакций) базы данных"""
+    conn = sqlite3.connect(db_name)
+    try:
+        user_version = conn.execute("PRAGMA user_version").fetchone()[0]
+        tables = {row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'view') AND name NOT LIKE 'sqlite_%'")}
+        indexes = {row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL")}
+        transactions = conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0] if tables else None
+    finally:
+        conn.close()
+    return user_version, tables, indexes, transactions
+
+
+def row_counts(db_name):
+    """Число строк в каждой таблице и представлении базы данных"""
+    conn = sqlite3.connect(db_name)
+    try:
+        tables = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'view') AND name NOT LIKE 'sqlite_%'")]
+        return {table: conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0] for table in tables}
+    finally:
+        conn.close()
+
+
+class CleanDbTester:
+    def __init__(self, num_transactions=20000):
+        self.num_transactions = num_transactions
+        self.tmp_dir = None
+        self.db_name = None
+    
+    def restore(self):
+        """Свежая копия фикстуры (копия из кэша фикстур)"""
+        FixtureCache().restore(self.db_name, 42, self.num_transactions, **SCHEMA_OPTIONS)
+        return describe(self.db_name)
+    
+    def test_clean_resets_user_version(self):
+        """Тест 1: Очистка удаляет таблицы и представления и сбрасывает user_version"""
+        print("\n=== Тест 1: Очистка (DROP TABLE) ===")
+        self.restore()
+        
+        if not quietly(clean_database, self.db_name):
+            print("❌ clean_database вернула ошибку")
+            return False
+        
+        user_version, tables, _, _ = describe(self.db_name)
+        if user_version or tables:
+            print(f"❌ user_version = {user_version}, остались {sorted(tables)}")
+            return False
+        
+        print("✅ Таблиц не осталось, user_version = 0")
+        return True
+    
+    def test_truncate_keeps_schema(self):
+        """Тест 2: truncate очищает данные, но сохраняет схему, секции и отложенные индексы"""
+        print("\n=== Тест 2: Очистка таблиц (truncate) ===")
+        user_version, tables, indexes, _ = self.restore()
+        all_correct = True
+        
+        # Прерванная массовая загрузка: индексы удалены, их определения в deferred_indexes
+        db = EcommerceDatabase(self.db_name)
+        with contextlib.redirect_stdout(io.StringIO()):
+            db.connect()
+            db.begin_bulk_load()
+            db.close()
+        
+        if not quietly(truncate_database, self.db_name):
+            print("❌ truncate_database вернула ошибку")
+            return False
+        
+        after = describe(self.db_name)
+        if after[0] != user_version or after[3] != 0 or not tables <= after[1] | {"deferred_indexes"}:
+            print(f"❌ user_version {after[0]}, транзакций {after[3]}, таблицы {sorted(tables - after[1])} пропали")
+            all_correct = False
+        else:
+            print(f"✅ Транзакций 0, user_version = {after[0]}, схема и секции на месте")
+        
+        db = EcommerceDatabase(self.db_name)
+        with contextlib.redirect_stdout(io.StringIO()):
+            db.connect()
+            db.end_bulk_load()
+            db.close()
+        
+        restored = describe(self.db_name)[2]
+        if restored != indexes:
+            print(f"❌ После end_bulk_load не хватает индексов: {sorted(indexes - restored)}")
+            all_correct = False
+        else:
+            print(f"✅ end_bulk_load восстановил {len(indexes)} отложенных индексов")
+        
+        return all_correct
+    
+    def test_reset_removes_files(self):
+        """Тест 3: Сброс удаляет файл базы и файлы -wal/-shm/-journal"""
+        print("\n=== Тест 3: Сброс (удаление файлов) ===")
+        self.restore()
+        for suffix in SIDECAR_SUFFIXES:
+            open(self.db_name + suffix, "wb").close()
+        
+        if not quietly(reset_database_file, self.db_name):
+            print("❌ reset_database_file вернула ошибку")
+            return False
+        
+        left = [path for path in [self.db_name] + [self.db_name + s for s in SIDECAR_SUFFIXES]
+                if os.path.exists(path)]
+        if left:
+            print(f"❌ Остались файлы: {left}")
+            return False
+        
+        print("✅ Файл базы и служебные файлы удалены")
+        return True
+    
+    def test_template_swap(self):
+        """Тест 4: Замена шаблоном даёт пустую базу той же схемы без старых -wal/-shm"""
+        print("\n=== Тест 4: Замена шаблоном ===")
+        user_version, tables, indexes, _ = self.restore()
+        template = os.path.join(self.tmp_dir.name, "template.db")
+        
+        with contextlib.redirect_stdout(io.StringIO()):
+            create_template(template, **SCHEMA_OPTIONS)
+        # Файл -wal от старой базы не должен примениться к подменённому файлу
+        open(self.db_name + "-wal", "wb").close()
+        
+        if not quietly(swap_in_template, self.db_name, template):
+            print("❌ swap_in_template вернула ошибку")
+            return False
+        
+        swapped = describe(self.db_name)
+        # Секции создаются по мере загрузки, в пустом шаблоне их нет
+        expected_tables = {name for name in tables if not name.startswith("transactions_")}
+        if swapped[0] != SCHEMA_FLAGS or swapped[1] != expected_tables or swapped[3] != 0:
+            print(f"❌ user_version {swapped[0]}, таблицы {sorted(swapped[1] ^ expected_tables)}, "
+                  f"транзакций {swapped[3]}")
+            return False
+        
+        print(f"✅ Пустая база, user_version = {swapped[0]}, {len(swapped[1])} таблиц и представлений")
+        return True
+    
+    def test_create_template_keeps_db(self):
+        """Тест 5: --create-template без других действий не очищает базу из --db"""
+        print("\n=== Тест 5: Создание шаблона из командной строки ===")
+        self.restore()
+        template = os.path.join(self.tmp_dir.name, "cli_template.db")
+        before = row_counts(self.db_name)
+        
+        status = quietly(clean_main, ["--db", self.db_name, "--create-template", template, "--analytics-schema"])
+        after = row_counts(self.db_name)
+        
+        if status != 0 or after != before or not os.path.exists(template):
+            print(f"❌ Код возврата {status}, транзакций {before.get('transactions')} -> {after.get('transactions')}")
+            return False
+        
+        print(f"✅ Шаблон создан, {len(after)} таблиц и представлений базы не изменились ({after['transactions']} транзакций)")
+        return True
+    
+    def test_vacuum_modes(self):
+        """Тест 6: VACUUM INTO и incremental_vacuum уменьшают файл после truncate"""
+        print("\n=== Тест 6: Сжатие файла ===")
+        all_correct = True
+        
+        for mode in ("into", "incremental"):
+            self.restore()
+            if mode == "incremental":
+                # incremental_vacuum работает только при auto_vacuum=INCREMENTAL, включаемом через VACUUM
+                conn = sqlite3.connect(self.db_name)
+                conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                conn.execute("VACUUM")
+                conn.close()
+            
+            size_before = os.path.getsize(self.db_name)
+            success = quietly(truncate_database, self.db_name) and quietly(compact_database, self.db_name, mode)
+            size_after = os.path.getsize(self.db_name)
+            user_version, _, _, transactions = describe(self.db_name)
+            
+            # После truncate свободна большая часть страниц: файл должен сжаться хотя бы вдвое
+            if not success or size_after * 2 > size_before or user_version != SCHEMA_FLAGS or transactions:
+                print(f"❌ {mode}: {size_before} -> {size_after} байт, user_version {user_version}")
+                all_correct = False
+            else:
+                print(f"✅ {mode}: {size_before // 1024} КБ -> {size_after // 1024} КБ")
+        
+        return all_correct
+    
+    def run_all_tests(self):
+        """Запуск всех тестов очистки базы данных"""
+        print(" Запуск тестов очистки базы данных...\n")
+        
+        tests = [
+            self.test_clean_resets_user_version,
+            self.test_truncate_keeps_schema,
+            self.test_reset_removes_files,
+            self.test_template_swap,
+            self.test_create_template_keeps_db,
+            self.test_vacuum_modes
+        ]
+        
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_name = os.path.join(self.tmp_dir.name, "clean.db")
+        try:
+            passed = sum(1 for test in tests if test())
+        finally:
+            self.tmp_dir.cleanup()
+        
+        print(f"\n Результаты тестов: {passed}/{len(tests)} пройдено")
+        return passed == len(tests)
+
+
+def main():
+    """Основная функция для запуска тестов"""
+    tester = CleanDbTester()
+    return 0 if tester.run_all_tests() else 1
+
+
+if __name__ == "__main__":
+    exit(main())
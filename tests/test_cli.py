@@ -0,0 +1,263 @@
+import contextlib
+import io
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+from datetime import date, timedelta
+
+import pandas as pd
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from setup.analysis import EcommerceAnalyzer
+from setup.cli import main as cli_main
+from setup.fixtures import FixtureCache
+from setup.queries import QUERY_REGISTRY
+
+# Отчёты реестра и соответствующие методы EcommerceAnalyzer
+ANALYZER_METHODS = {
+    "discount_effectiveness": "analyze_discount_effectiveness",
+    "product_popularity": "analyze_product_popularity",
+    "geo_performance": "analyze_geo_performance",
+    "discount_tier_profitability": "analyze_discount_tier_profitability",
+    "revenue_series": "analyze_revenue_series",
+    "repeat_intervals": "analyze_repeat_intervals",
+    "rfm_segments": "analyze_rfm",
+    "rfm_scores": "rfm_scores"
+}
+
+# Запуск CLI в отдельном процессе: печатает JSON отчётов и загруженные тяжёлые модули
+PURE_RUN = """
+import contextlib, io, json, sys
+from setup.cli import main
+out = io.StringIO()
+with contextlib.redirect_stdout(out):
+    status = main(sys.argv[1:])
+print(json.dumps({"status": status, "output": out.getvalue(),
+                  "modules": [name for name in ("pandas", "numpy") if name in sys.modules]}))
+"""
+
+
+def run_cli(*argv):
+    """Вызов CLI в этом процессе; возвращает (код возврата, вывод)"""
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        status = cli_main(list(argv))
+    return status, out.getvalue()
+
+
+class CliTester:
+    def __init__(self, num_transactions=20000):
+        self.num_transactions = num_transactions
+        self.tmp_dir = None
+        self.db_name = None
+    
+    def build_database(self, **schema_options):
+        """Создание временной базы данных (копия из кэша фикстур)"""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_name = os.path.join(self.tmp_dir.name, "cli.db")
+        FixtureCache().restore(self.db_name, 42, self.num_transactions, **schema_options)
+    
+    def expected_report(self, name, filters):
+        """Тот же отчёт из EcommerceAnalyzer"""
+        analyzer = EcommerceAnalyzer(self.db_name)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                return getattr(analyzer, ANALYZER_METHODS[name])(**filters)
+        finally:
+            analyzer.close()
+    
+    def test_registry_without_pandas(self):
+        """Тест 1: Отчёты реестра через sqlite3 совпадают с EcommerceAnalyzer и не загружают pandas"""
+        print("\n=== Тест 1: Реестр запросов без pandas ===")
+        
+        # Фикстура заканчивается сегодняшним днём; берём последние 60 дней
+        start_date = (date.today() - timedelta(days=60)).isoformat()
+        argv = ["analyze", "--db", self.db_name, "--format", "json", "--start-date", start_date,
+                "--discount-tiers", "0,5,10"] + list(QUERY_REGISTRY)
+        result = subprocess.run([sys.executable, "-c", PURE_RUN] + argv, cwd=REPO_ROOT,
+                                capture_output=True, text=True)
+        if result.returncode:
+            print(f"❌ CLI завершился с ошибкой: {result.stderr}")
+            return False
+        
+        run = json.loads(result.stdout)
+        all_correct = True
+        if run["status"] != 0 or run["modules"]:
+            print(f"❌ Код возврата {run['status']}, загружены модули {run['modules']}")
+            all_correct = False
+        
+        reports = json.loads(run["output"])
+        filters = {"start_date": start_date, "discount_tiers": [0, 5, 10]}
+        for name in QUERY_REGISTRY:
+            expected = self.expected_report(name, filters)
+            actual = pd.DataFrame(reports[name], columns=list(expected.columns))
+            try:
+                pd.testing.assert_frame_equal(actual, expected, check_dtype=False, rtol=1e-9)
+                print(f"✅ {name}: {len(expected)} строк совпадают")
+            except AssertionError as e:
+                print(f"❌ {name}: {e}")
+                all_correct = False
+        
+        return all_correct
+    
+    def test_pandas_reports_csv(self):
+        """Тест 2: Отчёты на DataFrame (прибыль, когорты) выводятся в CSV"""
+        print("\n=== Тест 2: Отчёты pandas в CSV ===")
+        
+        output = os.path.join(self.tmp_dir.name, "reports.csv")
+        status, _ = run_cli("analyze", "--db", self.db_name, "--format", "csv", "--output", output,
+                            "profit", "cohorts")
+        if status != 0:
+            print(f"❌ Код возврата {status}")
+            return False
+        
+        # Отчёты в файле разделены строками '# name'
+        sections = {}
+        with open(output) as f:
+            for line in f:
+                if line.startswith("# "):
+                    name = line[2:].strip()
+                    sections[name] = []
+                else:
+                    sections[name].append(line)
+        
+        analyzer = EcommerceAnalyzer(self.db_name)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                expected = analyzer.analyze_profit()
+                expected["cohorts"] = analyzer.analyze_cohorts()
+        finally:
+            analyzer.close()
+        
+        all_correct = True
+        for name, df in expected.items():
+            if name not in sections:
+                print(f"❌ {name}: нет в выводе")
+                all_correct = False
+                continue
+            actual = pd.read_csv(io.StringIO("".join(sections[name])), dtype={"month": str, "cohort": str})
+            try:
+                pd.testing.assert_frame_equal(actual, df, check_dtype=False, rtol=1e-9)
+                print(f"✅ {name}: {len(df)} строк совпадают")
+            except AssertionError as e:
+                print(f"❌ {name}: {e}")
+                all_correct = False
+        
+        return all_correct
+    
+    def test_table_output_file(self):
+        """Тест 3: Таблицы всех отчётов, включая отчёты pandas, пишутся в --output, а не в stdout"""
+        print("\n=== Тест 3: Табличный вывод в файл ===")
+        
+        output = os.path.join(self.tmp_dir.name, "reports.txt")
+        status, stdout = run_cli("analyze", "--db", self.db_name, "--output", output,
+                                 "geo_performance", "profit", "cohorts")
+        with open(output) as f:
+            text = f.read()
+        
+        analyzer = EcommerceAnalyzer(self.db_name)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                names = ["geo_performance", *analyzer.analyze_profit(), "cohorts"]
+        finally:
+            analyzer.close()
+        
+        missing = [name for name in names if f"=== {name} ===" not in text]
+        if status != 0 or stdout or missing:
+            print(f"❌ Код возврата {status}, в stdout {len(stdout)} символов, нет в файле: {missing}")
+            return False
+        
+        print(f"✅ {len(names)} таблиц в файле, stdout пуст")
+        return True
+    
+    def test_generate_validate_clean(self):
+        """Тест 4: generate создаёт базу, validate её принимает, clean --truncate очищает"""
+        print("\n=== Тест 4: generate / validate / clean ===")
+        
+        db_name = os.path.join(self.tmp_dir.name, "generated.db")
+        status, _ = run_cli("generate", "--db", db_name, "--transactions", "3000", "--seed", "7",
+                            "--analytics-schema")
+        if status != 0:
+            print(f"❌ generate: код возврата {status}")
+            return False
+        
+        status, output = run_cli("validate", "--db", db_name)
+        if status != 0:
+            print(f"❌ validate: код возврата {status}\n{output}")
+            return False
+        
+        status, _ = run_cli("clean", "--db", db_name, "--truncate")
+        conn = sqlite3.connect(db_name)
+        try:
+            remaining = conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+        finally:
+            conn.close()
+        if status != 0 or remaining:
+            print(f"❌ clean: код возврата {status}, осталось {remaining} транзакций")
+            return False
+        
+        print("✅ 3000 транзакций сгенерировано, проверено и удалено")
+        return True
+    
+    def test_invalid_dates(self):
+        """Тест 5: Неверные --start-date/--end-date отклоняются парсером, а не падают в запросе"""
+        print("\n=== Тест 5: Проверка дат ===")
+        all_correct = True
+        
+        for command in ("analyze", "validate"):
+            for option in ("--start-date", "--end-date"):
+                stderr = io.StringIO()
+                try:
+                    with contextlib.redirect_stderr(stderr):
+                        run_cli(command, "--db", self.db_name, option, "2024-13-01")
+                    status = 0
+                except SystemExit as e:
+                    status = e.code
+                
+                if status != 2 or "invalid iso_date value: '2024-13-01'" not in stderr.getvalue():
+                    print(f"❌ {command} {option} 2024-13-01: код возврата {status}\n{stderr.getvalue()}")
+                    all_correct = False
+        
+        if all_correct:
+            print("✅ analyze и validate отклоняют неверные даты с кодом 2")
+        return all_correct
+    
+    def run_all_tests(self):
+        """Запуск всех тестов для обычной и секционированной схем"""
+        print(" Запуск тестов командной строки...\n")
+        
+        passed = 0
+        total = 0
+        
+        for schema_options in ({}, {"analytics_schema": True, "partitioned": True}):
+            self.build_database(**schema_options)
+            
+            try:
+                tests = [self.test_registry_without_pandas, self.test_pandas_reports_csv, self.test_table_output_file]
+                if not schema_options:
+                    tests += [self.test_generate_validate_clean, self.test_invalid_dates]
+                
+                for test in tests:
+                    total += 1
+                    if test():
+                        passed += 1
+            finally:
+                self.tmp_dir.cleanup()
+        
+        print(f"\n Результаты тестов: {passed}/{total} пройдено")
+        return passed == total
+
+
+def main():
+    """Основная функция для запуска тестов"""
+    tester = CliTester()
+    return 0 if tester.run_all_tests() else 1
+
+
+if __name__ == "__main__":
+    exit(main())
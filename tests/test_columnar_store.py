@@ -0,0 +1,126 @@
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from setup.analysis import REPORT_TITLES, EcommerceAnalyzer, reports_from_cube
+from setup.columnar_store import DENSE_CUBE_CELLS, ColumnarStore
+from setup.data_generators import DataGenerator
+from setup.database import EcommerceDatabase
+from helpers import sort_report
+
+# Наборы фильтров, на которых сравниваются отчёты ColumnarStore и SQL
+FILTER_SETS = [
+    {},
+    {"geos": ["USA", "DE"], "product_tiers": [1, 3], "discount_tiers": [0, 5, 10]}
+]
+
+# Предел пикового расхода памяти на построение куба
+MAX_CUBE_MB = 200
+
+
+class ColumnarStoreTester:
+    def __init__(self, num_transactions=100000, products_per_tier=10000, num_users=3000):
+        self.num_transactions = num_transactions
+        self.products_per_tier = products_per_tier
+        self.num_users = num_users
+        self.tmp_dir = None
+        self.db_name = None
+    
+    def build_database(self):
+        """База с большим каталогом товаров: плотный куб занял бы гигабайты"""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_name = os.path.join(self.tmp_dir.name, "columnar.db")
+        random.seed(1)
+        
+        db = EcommerceDatabase(self.db_name)
+        with contextlib.redirect_stdout(io.StringIO()):
+            db.connect()
+            db.create_tables(analytics_schema=True)
+            generator = DataGenerator(db.conn)
+            generator.generate_products_vectorized(self.products_per_tier, seed=1)
+            generator.generate_users_vectorized(self.num_users, seed=1)
+            generator.generate_transactions_vectorized(self.num_transactions, seed=1)
+            db.close()
+    
+    def test_large_catalogue_cube(self):
+        """Тест 1: Куб по большому каталогу строится без плотного массива и совпадает с SQL"""
+        print("\n=== Тест 1: Куб по большому каталогу товаров ===")
+        
+        store = ColumnarStore.from_database(self.db_name)
+        shape = (len(store.dimensions["product_tier"]), len(store.geo_names),
+                 int(store.dimensions["user_discount_tier"].max()) + 1,
+                 int(store.columns["applied_discount"].max()) + 1)
+        dense_mb = np.prod(shape, dtype=np.int64) * 24 / 2 ** 20
+        all_correct = True
+        
+        if np.prod(shape, dtype=np.int64) <= DENSE_CUBE_CELLS:
+            print(f"❌ Пространство ключей {shape} помещается в плотный куб, тест ничего не проверяет")
+            return False
+        
+        # Маленькие фрагменты проверяют слияние частичных сумм между ними
+        tracemalloc.start()
+        try:
+            cube = store.fetch_cube(chunk_size=30000)
+            peak_mb = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        finally:
+            tracemalloc.stop()
+        
+        if peak_mb > MAX_CUBE_MB:
+            print(f"❌ Пик памяти {peak_mb:.0f} МБ (плотный куб: {dense_mb:.0f} МБ)")
+            all_correct = False
+        else:
+            print(f"✅ {len(cube)} ячеек, пик памяти {peak_mb:.0f} МБ вместо {dense_mb:.0f} МБ плотного куба")
+        
+        analyzer = EcommerceAnalyzer(self.db_name)
+        try:
+            for filters in FILTER_SETS:
+                reports = reports_from_cube(store.fetch_cube(chunk_size=30000, **filters), store.fetch_products())
+                for name in REPORT_TITLES:
+                    expected = sort_report(analyzer._report(name, filters))
+                    try:
+                        pd.testing.assert_frame_equal(sort_report(reports[name]), expected,
+                                                      check_dtype=False, rtol=1e-9)
+                    except AssertionError as e:
+                        print(f"❌ {name} {filters or ''}: {e}")
+                        all_correct = False
+        finally:
+            analyzer.close()
+        
+        if all_correct:
+            print(f"✅ Отчёты совпадают с SQL на {len(FILTER_SETS)} наборах фильтров")
+        return all_correct
+    
+    def run_all_tests(self):
+        """Запуск всех тестов колоночного хранилища"""
+        print(" Запуск тестов колоночного хранилища...\n")
+        
+        tests = [self.test_large_catalogue_cube]
+        
+        self.build_database()
+        try:
+            passed = sum(1 for test in tests if test())
+        finally:
+            self.tmp_dir.cleanup()
+        
+        print(f"\n Результаты тестов: {passed}/{len(tests)} пройдено")
+        return passed == len(tests)
+
+
+def main():
+    """Основная функция для запуска тестов"""
+    tester = ColumnarStoreTester()
+    return 0 if tester.run_all_tests() else 1
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,198 @@
+import contextlib
+import io
+import os
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from setup.data_generators import SEASONAL_PEAK_DAY, DataGenerator, popularity_cdf, seasonal_cdf
+from setup.database import EcommerceDatabase
+
+# Фиксированная дата окончания истории, чтобы запуски не зависели от текущего дня
+END_DATE = datetime(2024, 6, 30)
+
+# Доля k самых популярных ключей в распределении Ципфа с показателем skew
+TOP_K = 10
+SKEW = 1.1
+
+
+def zipf_top_share(size, skew, k):
+    """Ожидаемая доля k ключей с наибольшей вероятностью: H(k, skew) / H(size, skew)"""
+    weights = 1.0 / np.arange(1, size + 1, dtype=np.float64) ** skew
+    return weights[:k].sum() / weights.sum()
+
+
+def month_weights(seasonality):
+    """Средний вес дня 1 + seasonality * cos(...) по месяцам невисокосного года"""
+    days = np.arange("2023-01-01", "2024-01-01", dtype="datetime64[D]")
+    day_of_year = np.arange(1, len(days) + 1)
+    weights = 1 + seasonality * np.cos(2 * np.pi * (day_of_year - SEASONAL_PEAK_DAY) / 365.25)
+    months = days.astype("datetime64[M]").astype(np.int64) % 12
+    return np.array([weights[months == month].mean() for month in range(12)])
+
+
+class DataGeneratorTester:
+    def __init__(self, num_users=5000, products_per_tier=200, num_transactions=100000, seed=42):
+        self.num_users = num_users
+        self.products_per_tier = products_per_tier
+        self.num_transactions = num_transactions
+        self.seed = seed
+        self.tmp_dir = None
+    
+    def generate(self, name, seed=None, history_days=180, **generator_options):
+        """База с векторно сгенерированными товарами, пользователями и транзакциями; возвращает путь"""
+        db_name = os.path.join(self.tmp_dir.name, name)
+        seed = self.seed if seed is None else seed
+        
+        db = EcommerceDatabase(db_name)
+        with contextlib.redirect_stdout(io.StringIO()):
+            db.connect()
+            db.create_tables()
+            try:
+                generator = DataGenerator(db.conn, history_days=history_days, **generator_options)
+                generator.generate_products_vectorized(self.products_per_tier, seed=seed)
+                generator.generate_users_vectorized(self.num_users, seed=seed, batch_size=1000)
+                generator.generate_transactions_vectorized(self.num_transactions, seed=seed, end_date=END_DATE)
+            finally:
+                db.close()
+        return db_name
+    
+    def query(self, db_name, sql):
+        """Все строки запроса к базе"""
+        conn = sqlite3.connect(db_name)
+        try:
+            return conn.execute(sql).fetchall()
+        finally:
+            conn.close()
+    
+    def test_zipf_top_share(self):
+        """Тест 1: Доля самых популярных пользователей и товаров соответствует распределению Ципфа"""
+        print("\n=== Тест 1: Распределение Ципфа ===")
+        all_correct = True
+        
+        for size in (10, self.num_users):
+            cdf = popularity_cdf(size, SKEW, self.seed)
+            probabilities = np.diff(cdf, prepend=0.0)
+            expected = zipf_top_share(size, SKEW, min(TOP_K, size))
+            actual = np.sort(probabilities)[::-1][:TOP_K].sum()
+            if abs(cdf[-1] - 1) > 1e-12 or (np.diff(cdf) < 0).any() or abs(actual - expected) > 1e-9:
+                print(f"❌ popularity_cdf({size}): доля топ-{TOP_K} {actual:.4f}, ожидалось {expected:.4f}")
+                all_correct = False
+        
+        uniform = np.diff(popularity_cdf(self.num_users, 0.0, self.seed), prepend=0.0)
+        if not np.allclose(uniform, 1 / self.num_users):
+            print("❌ popularity_cdf со skew=0 не равномерна")
+            all_correct = False
+        
+        db_name = self.generate("zipf.db", user_skew=SKEW, product_skew=SKEW)
+        num_products = self.products_per_tier * 3
+        for column, size in (("user_id", self.num_users), ("product_id", num_products)):
+            counts = [count for (count,) in self.query(
+                db_name, f"SELECT COUNT(*) AS n FROM transactions GROUP BY {column} ORDER BY n DESC LIMIT {TOP_K}"
+            )]
+            actual = sum(counts) / self.num_transactions
+            expected = zipf_top_share(size, SKEW, TOP_K)
+            if abs(actual - expected) > 0.02:
+                print(f"❌ {column}: доля топ-{TOP_K} {actual:.3f}, ожидалось {expected:.3f}")
+                all_correct = False
+            else:
+                print(f"✅ {column}: доля топ-{TOP_K} {actual:.3f} (ожидалось {expected:.3f})")
+        
+        return all_correct
+    
+    def test_seasonal_ratio(self):
+        """Тест 2: Отношение продаж месяца пика к месяцу спада соответствует амплитуде сезонности"""
+        print("\n=== Тест 2: Сезонность ===")
+        all_correct = True
+        
+        try:
+            seasonal_cdf(np.datetime64("2024-01-01"), 10, 1.5)
+            print("❌ seasonality=1.5 принята")
+            all_correct = False
+        except ValueError:
+            pass
+        
+        # Два полных года: каждый месяц встречается дважды
+        for seasonality in (0.0, 0.5):
+            db_name = self.generate(f"seasonal_{seasonality}.db", history_days=730, seasonality=seasonality)
+            rows = self.query(db_name, """
+                SELECT CAST(strftime('%m', transaction_date) AS INTEGER) AS month, COUNT(*)
+                FROM transactions
+                WHERE transaction_date >= '2022-07-01' AND transaction_date < '2024-07-01'
+                GROUP BY month
+            """)
+            # Продажи на день месяца: месяцы разной длины
+            days = np.array([31, 28.5, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+            per_day = np.array([count for _, count in sorted(rows)]) / days
+            
+            weights = month_weights(seasonality)
+            peak, trough = int(np.argmax(weights)), int(np.argmin(weights))
+            expected = weights[peak] / weights[trough]
+            actual = per_day[peak] / per_day[trough]
+            
+            if len(rows) != 12 or abs(actual / expected - 1) > 0.1:
+                print(f"❌ seasonality={seasonality}: месяц {peak + 1} / месяц {trough + 1} = {actual:.2f}, "
+                      f"ожидалось {expected:.2f}")
+                all_correct = False
+            else:
+                print(f"✅ seasonality={seasonality}: месяц {peak + 1} / месяц {trough + 1} = {actual:.2f} "
+                      f"(ожидалось {expected:.2f})")
+        
+        return all_correct
+    
+    def test_same_seed_same_output(self):
+        """Тест 3: Один seed даёт побайтно одинаковые таблицы, другой seed — другие"""
+        print("\n=== Тест 3: Воспроизводимость по seed ===")
+        
+        options = {"user_skew": SKEW, "product_skew": 0.8, "seasonality": 0.5}
+        dumps = []
+        for name, seed in (("seed_a.db", self.seed), ("seed_b.db", self.seed), ("seed_c.db", self.seed + 1)):
+            conn = sqlite3.connect(self.generate(name, seed=seed, **options))
+            try:
+                dumps.append("\n".join(conn.iterdump()).encode())
+            finally:
+                conn.close()
+        
+        if dumps[0] != dumps[1]:
+            print("❌ Один seed дал разные данные")
+            return False
+        if dumps[0] == dumps[2]:
+            print("❌ Разные seed дали одинаковые данные")
+            return False
+        
+        print(f"✅ Дампы с одним seed совпадают побайтно ({len(dumps[0])} байт), с другим — отличаются")
+        return True
+    
+    def run_all_tests(self):
+        """Запуск всех тестов векторной генерации данных"""
+        print(" Запуск тестов генераторов данных...\n")
+        
+        tests = [
+            self.test_zipf_top_share,
+            self.test_seasonal_ratio,
+            self.test_same_seed_same_output
+        ]
+        
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        try:
+            passed = sum(1 for test in tests if test())
+        finally:
+            self.tmp_dir.cleanup()
+        
+        print(f"\n Результаты тестов: {passed}/{len(tests)} пройдено")
+        return passed == len(tests)
+
+
+def main():
+    """Основная функция для запуска тестов"""
+    tester = DataGeneratorTester()
+    return 0 if tester.run_all_tests() else 1
+
+
+if __name__ == "__main__":
+    exit(main())
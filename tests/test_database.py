@@ -1,5 +1,6 @@
 import sqlite3
 import os
+import sys
 
 
 class DatabaseTester:
@@ -34,10 +35,14 @@ class DatabaseTester:
             expected_tables = ['products', 'users', 'transactions']
             existing_tables = []
             
-            self.cursor.execute("""
+            # В секционированной схеме (бит 4 в PRAGMA user_version) transactions - представление
+            self.cursor.execute("PRAGMA user_version")
+            types = ('table', 'view') if self.cursor.fetchone()[0] & 4 else ('table',)
+            
+            self.cursor.execute(f"""
                 SELECT name FROM sqlite_master 
-                WHERE type='table' AND name IN ('products', 'users', 'transactions')
-            """)
+                WHERE type IN ({', '.join('?' * len(types))}) AND name IN ('products', 'users', 'transactions')
+            """, types)
             
             for row in self.cursor.fetchall():
                 existing_tables.append(row[0])
@@ -101,8 +106,18 @@ class DatabaseTester:
         print("\n=== Тест 3: Проверка внешних ключей ===")
         
         try:
-            # Проверяем, что внешние ключи настроены
-            self.cursor.execute("PRAGMA foreign_key_list(transactions)")
+            # Проверяем, что внешние ключи настроены (у секционированной схемы - на секциях)
+            table = "transactions"
+            self.cursor.execute("PRAGMA user_version")
+            if self.cursor.fetchone()[0] & 4:
+                self.cursor.execute("SELECT name FROM transaction_partitions ORDER BY first_date LIMIT 1")
+                row = self.cursor.fetchone()
+                if row is None:
+                    print("❌ Нет ни одной секции transactions")
+                    return False
+                table = row[0]
+            
+            self.cursor.execute(f"PRAGMA foreign_key_list({table})")
             foreign_keys = self.cursor.fetchall()
             
             if foreign_keys:
@@ -131,6 +146,13 @@ class DatabaseTester:
                                'transaction_date': 'DATE', 'initial_cost': 'REAL', 'applied_discount': 'REAL', 'final_cost': 'REAL'}
             }
             
+            # Режим целых центов (бит 2 в PRAGMA user_version) хранит деньги и скидки как INTEGER
+            self.cursor.execute("PRAGMA user_version")
+            if self.cursor.fetchone()[0] & 2:
+                expected_types['products'].update({'production_cost': 'INTEGER', 'retail_cost': 'INTEGER'})
+                expected_types['transactions'].update({'initial_cost': 'INTEGER', 'applied_discount': 'INTEGER',
+                                                       'final_cost': 'INTEGER'})
+            
             all_correct = True
             
             for table_name, expected_column_types in expected_types.items():
@@ -192,9 +214,9 @@ class DatabaseTester:
         if self.conn:
             self.conn.close()
 
-def main():
-    """Основная функция для запуска тестов"""
-    tester = DatabaseTester()
+def run_tests(db_name):
+    """Запуск тестов для указанного файла базы данных"""
+    tester = DatabaseTester(db_name)
     
     try:
         success = tester.run_all_tests()
@@ -202,5 +224,32 @@ def main():
     finally:
         tester.cleanup()
 
+def main():
+    """Основная функция для запуска тестов"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Тесты базы данных e-commerce')
+    parser.add_argument('--db', default='ecommerce.db', help='Имя файла базы данных')
+    parser.add_argument('--fixture-transactions', type=int, default=None,
+                        help='Проверять копию закэшированной базы с этим числом транзакций')
+    parser.add_argument('--seed', type=int, default=42, help='Seed генератора для фикстуры')
+    parser.add_argument('--analytics-schema', action='store_true', help='Фикстура со схемой analytics')
+    parser.add_argument('--integer-cents', action='store_true', help='Фикстура с деньгами в целых центах')
+    parser.add_argument('--partitioned', action='store_true', help='Фикстура с помесячными секциями транзакций')
+    args = parser.parse_args()
+    
+    if args.fixture_transactions is None:
+        return run_tests(args.db)
+    
+    # Каждый запуск получает свою копию, поэтому тесты можно запускать параллельно
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from setup.fixtures import FixtureCache
+    
+    with FixtureCache().temp_copy(args.seed, args.fixture_transactions,
+                                  analytics_schema=args.analytics_schema,
+                                  integer_cents=args.integer_cents,
+                                  partitioned=args.partitioned) as db_name:
+        return run_tests(db_name)
+
 if __name__ == "__main__":
     exit(main())
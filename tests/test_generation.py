@@ -0,0 +1,151 @@
+import contextlib
+import io
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from setup.data_generators import DataGenerator, shard_ranges
+from setup.database import EcommerceDatabase
+
+# Фиксированная дата окончания истории, чтобы запуски не зависели от текущего дня
+END_DATE = datetime(2024, 6, 30)
+
+# Число шардов и процессов параллельной генерации
+SHARD_LAYOUTS = [(1, 1), (3, 2), (4, 4), (8, 3)]
+
+
+def read_transactions(db_name):
+    """Все транзакции базы в порядке transaction_id"""
+    conn = sqlite3.connect(db_name)
+    try:
+        return conn.execute("SELECT * FROM transactions ORDER BY transaction_id").fetchall()
+    finally:
+        conn.close()
+
+
+class GenerationTester:
+    def __init__(self, num_transactions=7500, seed=42, batch_size=1000):
+        self.num_transactions = num_transactions
+        self.seed = seed
+        self.batch_size = batch_size
+        self.tmp_dir = None
+    
+    def build_database(self, name, **schema_options):
+        """Пустая база с одинаковыми товарами и пользователями; возвращает (база, генератор)"""
+        db_name = os.path.join(self.tmp_dir.name, name)
+        random.seed(self.seed)
+        
+        db = EcommerceDatabase(db_name)
+        with contextlib.redirect_stdout(io.StringIO()):
+            db.connect()
+            db.create_tables(**schema_options)
+            generator = DataGenerator(db.conn)
+            generator.generate_products()
+            generator.generate_users()
+        return db, generator
+    
+    def generate(self, name, method, **options):
+        """Генерация транзакций указанным методом; возвращает строки таблицы"""
+        db, generator = self.build_database(name)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                getattr(generator, method)(self.num_transactions, seed=self.seed, batch_size=self.batch_size,
+                                           end_date=END_DATE, **options)
+        finally:
+            db.close()
+        return read_transactions(os.path.join(self.tmp_dir.name, name))
+    
+    def test_shard_ranges(self):
+        """Тест 1: Диапазоны шардов не пересекаются, выровнены по батчам и пусты для 0 транзакций"""
+        print("\n=== Тест 1: Диапазоны шардов ===")
+        all_correct = True
+        
+        for num_transactions, shards in ((0, 4), (1, 4), (999, 3), (7500, 4), (7500, 16)):
+            ranges = shard_ranges(1, num_transactions, shards, self.batch_size)
+            covered = [i for start, count in ranges for i in range(start, start + count)]
+            aligned = all((start - 1) % self.batch_size == 0 for start, _ in ranges)
+            
+            if covered != list(range(1, num_transactions + 1)) or not aligned or len(ranges) > shards:
+                print(f"❌ {num_transactions} транзакций, {shards} шардов: {ranges}")
+                all_correct = False
+            else:
+                print(f"✅ {num_transactions} транзакций, {shards} шардов: {len(ranges)} диапазонов")
+        
+        return all_correct
+    
+    def test_parallel_matches_vectorized(self):
+        """Тест 2: Параллельная генерация даёт те же строки при любом числе шардов и процессов"""
+        print("\n=== Тест 2: Детерминированность параллельной генерации ===")
+        expected = self.generate("vectorized.db", "generate_transactions_vectorized")
+        all_correct = len(expected) == self.num_transactions
+        
+        for shards, workers in SHARD_LAYOUTS:
+            actual = self.generate(f"parallel_{shards}_{workers}.db", "generate_transactions_parallel",
+                                   shards=shards, workers=workers)
+            if actual != expected:
+                differing = sum(a != e for a, e in zip(actual, expected)) + abs(len(actual) - len(expected))
+                print(f"❌ {shards} шардов, {workers} процессов: {differing} строк отличаются")
+                all_correct = False
+            else:
+                print(f"✅ {shards} шардов, {workers} процессов: {len(actual)} строк совпадают")
+        
+        return all_correct
+    
+    def test_empty_parallel_generation(self):
+        """Тест 3: Параллельная генерация 0 транзакций ничего не делает"""
+        print("\n=== Тест 3: Пустая параллельная генерация ===")
+        db, generator = self.build_database("empty.db")
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                generator.generate_transactions_parallel(0, seed=self.seed, end_date=END_DATE)
+            remaining = db.conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+        except Exception as e:
+            print(f"❌ Ошибка: {e}")
+            return False
+        finally:
+            db.close()
+        
+        if remaining:
+            print(f"❌ Сгенерировано {remaining} транзакций")
+            return False
+        print("✅ Таблица транзакций пуста")
+        return True
+    
+    def run_all_tests(self):
+        """Запуск всех тестов генерации"""
+        print(" Запуск тестов генерации данных...\n")
+        
+        tests = [
+            self.test_shard_ranges,
+            self.test_parallel_matches_vectorized,
+            self.test_empty_parallel_generation
+        ]
+        
+        passed = 0
+        total = len(tests)
+        
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        try:
+            for test in tests:
+                if test():
+                    passed += 1
+        finally:
+            self.tmp_dir.cleanup()
+        
+        print(f"\n Результаты тестов: {passed}/{total} пройдено")
+        return passed == total
+
+
+def main():
+    """Основная функция для запуска тестов"""
+    tester = GenerationTester()
+    return 0 if tester.run_all_tests() else 1
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,134 @@
+import contextlib
+import io
+import os
+import sqlite3
+import sys
+import tempfile
+from datetime import date, timedelta
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from setup.analysis import REPORT_TITLES, EcommerceAnalyzer
+from setup.fixtures import FixtureCache
+from setup.parquet_backend import ParquetBackend, export_to_parquet
+from helpers import sort_report
+
+# Фикстура заканчивается сегодняшним днём; фильтры по датам берём относительно него
+START_DATE = (date.today() - timedelta(days=90)).isoformat()
+END_DATE = (date.today() - timedelta(days=30)).isoformat()
+
+# Наборы фильтров, на которых сравниваются отчёты из Parquet и из SQLite
+FILTER_SETS = [
+    {},
+    {"geos": ["USA", "DE", "FR"], "product_tiers": [2, 3]},
+    {"start_date": START_DATE, "end_date": END_DATE, "discount_tiers": [0, 5, 10]}
+]
+
+# Схемы базы: денежные значения в REAL и в целых центах
+SCHEMAS = {
+    "REAL": {"analytics_schema": True},
+    "центы": {"analytics_schema": True, "integer_cents": True}
+}
+
+
+class ParquetTester:
+    def __init__(self, num_transactions=30000):
+        self.num_transactions = num_transactions
+        self.tmp_dir = None
+        self.db_name = None
+        self.export_dir = None
+    
+    def build_database(self, **schema_options):
+        """Создание временной базы данных (копия из кэша фикстур) и её экспорт в Parquet"""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_name = os.path.join(self.tmp_dir.name, "parquet.db")
+        self.export_dir = os.path.join(self.tmp_dir.name, "export")
+        FixtureCache().restore(self.db_name, 42, self.num_transactions, **schema_options)
+        with contextlib.redirect_stdout(io.StringIO()):
+            export_to_parquet(self.db_name, self.export_dir, chunk_size=7000)
+    
+    def test_products_in_units(self, label):
+        """Тест: Товары экспортируются в денежных единицах при любой схеме"""
+        print(f"\n=== Товары в Parquet ({label}) ===")
+        
+        conn = sqlite3.connect(self.db_name)
+        try:
+            scale = 100.0 if conn.execute("PRAGMA user_version").fetchone()[0] & 2 else 1.0
+            expected = pd.read_sql_query(f'''
+                SELECT product_id, name, production_cost / {scale} as production_cost,
+                       retail_cost / {scale} as retail_cost, tier
+                FROM products
+                ORDER BY product_id
+            ''', conn)
+        finally:
+            conn.close()
+        
+        actual = pd.read_parquet(os.path.join(self.export_dir, "products.parquet"))
+        actual = actual.sort_values("product_id").reset_index(drop=True)
+        try:
+            pd.testing.assert_frame_equal(actual, expected, check_dtype=False, rtol=1e-12)
+        except AssertionError as e:
+            print(f"❌ {e}")
+            return False
+        
+        print(f"✅ {len(expected)} товаров, цены в денежных единицах")
+        return True
+    
+    def test_reports_match_sql(self, label):
+        """Тест: Отчёты из ParquetBackend совпадают с отчётами SQL"""
+        print(f"\n=== ParquetBackend и SQL ({label}) ===")
+        
+        parquet = EcommerceAnalyzer(self.db_name, backend=ParquetBackend(self.export_dir))
+        sql = EcommerceAnalyzer(self.db_name)
+        all_correct = True
+        
+        try:
+            for filters in FILTER_SETS:
+                for name in REPORT_TITLES:
+                    expected = sort_report(sql._report(name, filters))
+                    actual = sort_report(parquet._report(name, filters))
+                    try:
+                        pd.testing.assert_frame_equal(actual, expected, check_dtype=False, rtol=1e-9)
+                        print(f"✅ {name} {filters or ''}: {len(expected)} строк совпадают")
+                    except AssertionError as e:
+                        print(f"❌ {name} {filters or ''}: {e}")
+                        all_correct = False
+        finally:
+            parquet.close()
+            sql.close()
+        
+        return all_correct
+    
+    def run_all_tests(self):
+        """Запуск всех тестов для схем REAL и целых центов"""
+        print(" Запуск тестов Parquet...\n")
+        
+        passed = 0
+        total = 0
+        
+        for label, schema_options in SCHEMAS.items():
+            self.build_database(**schema_options)
+            
+            try:
+                for test in (self.test_products_in_units, self.test_reports_match_sql):
+                    total += 1
+                    if test(label):
+                        passed += 1
+            finally:
+                self.tmp_dir.cleanup()
+        
+        print(f"\n Результаты тестов: {passed}/{total} пройдено")
+        return passed == total
+
+
+def main():
+    """Основная функция для запуска тестов"""
+    tester = ParquetTester()
+    return 0 if tester.run_all_tests() else 1
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,266 @@
+import contextlib
+import io
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from setup.analysis import REPORT_TITLES, EcommerceAnalyzer
+from setup.fixtures import FixtureCache
+from setup.profiler import PHASES, QueryProfiler
+
+# Фазы, на которые делится каждое чтение SQL
+SQL_PHASES = {"prepare", "step", "fetch", "dataframe"}
+
+# Запрос с GROUP BY: весь проход по transactions приходится на первый шаг
+GROUP_QUERY = "SELECT product_id, COUNT(*) AS n FROM transactions GROUP BY product_id"
+
+
+class ProfilerTester:
+    def __init__(self, num_transactions=20000):
+        self.num_transactions = num_transactions
+        self.tmp_dir = None
+        self.db_name = None
+    
+    def build_database(self):
+        """Создание временной базы данных в режиме analytics schema (копия из кэша фикстур)"""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_name = os.path.join(self.tmp_dir.name, "profiler.db")
+        FixtureCache().restore(self.db_name, 42, self.num_transactions, analytics_schema=True)
+    
+    def profile_reports(self, profiler, **analyzer_options):
+        """Отчёты EcommerceAnalyzer с профилировщиком (вывод отчётов подавлен)"""
+        analyzer = EcommerceAnalyzer(self.db_name, profiler=profiler, **analyzer_options)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()) as output:
+                reports = analyzer.run_all_analyses()
+        finally:
+            analyzer.close()
+        return reports, output.getvalue()
+    
+    def test_trace_and_progress_hooks(self):
+        """Тест 1: Фазы чтения по trace-обработчику и счётчик шагов VM по progress-обработчику"""
+        print("\n=== Тест 1: Обработчики trace и progress ===")
+        
+        profiler = QueryProfiler()
+        conn = sqlite3.connect(self.db_name)
+        all_correct = True
+        
+        try:
+            df = profiler.read_sql(conn, GROUP_QUERY, name="group")
+            expected = pd.read_sql_query(GROUP_QUERY, conn)
+        finally:
+            conn.close()
+        
+        entry = profiler.records[0]
+        if not df.equals(expected) or entry["rows"] != len(expected):
+            print(f"❌ read_sql вернул {len(df)} строк вместо {len(expected)}")
+            all_correct = False
+        
+        # Без срабатывания trace-обработчика prepare равна ровно 0
+        if set(entry["phases"]) != SQL_PHASES or min(entry["phases"].values()) < 0 or entry["phases"]["prepare"] <= 0:
+            print(f"❌ Фазы чтения: {entry['phases']}")
+            all_correct = False
+        
+        # GROUP BY проходит все транзакции до первой строки: progress-обработчик срабатывает
+        if entry["vm_steps"] < self.num_transactions or entry["phases"]["step"] <= 0:
+            print(f"❌ vm_steps = {entry['vm_steps']}, step = {entry['phases']['step']}")
+            all_correct = False
+        
+        if all_correct:
+            print(f"✅ {entry['rows']} строк, ~{entry['vm_steps']} шагов VM, фазы: {', '.join(entry['phases'])}")
+        return all_correct
+    
+    def test_report_phases(self):
+        """Тест 2: Отчёты записывают чтение SQL, попадания в кэш и печать отдельными фазами"""
+        print("\n=== Тест 2: Фазы отчётов ===")
+        
+        profiler = QueryProfiler()
+        analyzer = EcommerceAnalyzer(self.db_name, profiler=profiler, cache_size=16)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                analyzer.run_all_analyses()
+                analyzer.run_all_analyses()
+        finally:
+            analyzer.close()
+        
+        summary = profiler.summary()
+        all_correct = True
+        
+        queries = [entry for entry in profiler.records if "query_hash" in entry]
+        hits = [entry for entry in profiler.records if entry.get("cache_hit")]
+        if sorted(entry["name"] for entry in queries) != sorted(REPORT_TITLES) or len(hits) != len(REPORT_TITLES):
+            print(f"❌ Чтений SQL {len(queries)}, попаданий в кэш {len(hits)}")
+            all_correct = False
+        
+        if set(summary["name"]) != set(REPORT_TITLES) or not set(summary.columns) <= {"name", *PHASES, "total"}:
+            print(f"❌ Сводка:\n{summary}")
+            all_correct = False
+        elif (summary["print"] <= 0).any() or (summary["cache"] <= 0).any():
+            print(f"❌ Нет фазы print или cache:\n{summary}")
+            all_correct = False
+        
+        if all_correct:
+            print(f"✅ {len(queries)} чтений SQL, {len(hits)} попаданий в кэш, печать учтена отдельно")
+        return all_correct
+    
+    def test_prometheus_text(self):
+        """Тест 3: Счётчики Prometheus совпадают с записями профилировщика"""
+        print("\n=== Тест 3: Формат Prometheus ===")
+        
+        profiler = QueryProfiler()
+        self.profile_reports(profiler)
+        path = os.path.join(self.tmp_dir.name, "profiler.prom")
+        profiler.write_prometheus(path)
+        
+        with open(path) as f:
+            text = f.read()
+        all_correct = text == profiler.prometheus_text() and not os.path.exists(f"{path}.tmp")
+        if not all_correct:
+            print("❌ write_prometheus записал не то, что вернул prometheus_text")
+        
+        samples = {}
+        for line in text.splitlines():
+            if line.startswith("#"):
+                continue
+            metric, value = line.rsplit(" ", 1)
+            samples[metric] = float(value)
+        
+        for counter in ("phase_seconds", "calls", "rows", "vm_steps", "slow"):
+            metric = f"ecommerce_query_{counter}_total"
+            if f"# TYPE {metric} counter" not in text or f"# HELP {metric} " not in text:
+                print(f"❌ Нет HELP/TYPE для {metric}")
+                all_correct = False
+        
+        # Фазы суммируются по всем записям, счётчики — только по чтениям SQL (печать без запроса)
+        expected = {}
+        for entry in profiler.records:
+            name = entry["name"]
+            for phase, seconds in entry["phases"].items():
+                metric = f'ecommerce_query_phase_seconds_total{{query="{name}",phase="{phase}"}}'
+                expected[metric] = expected.get(metric, 0.0) + seconds
+            if "query_hash" in entry:
+                for counter, value in (("calls", 1), ("rows", entry["rows"]),
+                                       ("vm_steps", entry["vm_steps"]), ("slow", 0)):
+                    metric = f'ecommerce_query_{counter}_total{{query="{name}"}}'
+                    expected[metric] = expected.get(metric, 0) + value
+        
+        if samples.keys() != expected.keys():
+            print(f"❌ Лишние или недостающие значения: {sorted(samples.keys() ^ expected.keys())}")
+            all_correct = False
+        for metric, value in expected.items():
+            if abs(samples.get(metric, -1) - value) > 1e-6:
+                print(f"❌ {metric} = {samples.get(metric)}, ожидалось {value}")
+                all_correct = False
+        
+        if all_correct:
+            print(f"✅ {len(samples)} значений, {len(REPORT_TITLES)} запросов совпадают с записями")
+        return all_correct
+    
+    def test_jsonl_log(self):
+        """Тест 4: log_path и write_jsonl пишут по одной JSON-записи на строку"""
+        print("\n=== Тест 4: Журнал JSONL ===")
+        
+        log_path = os.path.join(self.tmp_dir.name, "profiler.log.jsonl")
+        dump_path = os.path.join(self.tmp_dir.name, "profiler.jsonl")
+        # Журнал дописывается: две записи до профилировщика должны сохраниться
+        with open(log_path, "w") as f:
+            f.write('{"name": "earlier"}\n' * 2)
+        
+        profiler = QueryProfiler(log_path=log_path)
+        self.profile_reports(profiler)
+        profiler.write_jsonl(dump_path)
+        
+        with open(log_path) as f:
+            logged = [json.loads(line) for line in f]
+        with open(dump_path) as f:
+            dumped = [json.loads(line) for line in f]
+        
+        records = json.loads(json.dumps(profiler.records))
+        if logged[2:] != records or logged[:2] != [{"name": "earlier"}] * 2:
+            print(f"❌ В журнале {len(logged)} строк, записей {len(records)}")
+            return False
+        if dumped != records:
+            print(f"❌ write_jsonl записал {len(dumped)} строк из {len(records)}")
+            return False
+        
+        print(f"✅ {len(records)} записей в журнале и в write_jsonl")
+        return True
+    
+    def test_slow_query_plan(self):
+        """Тест 5: Медленные запросы печатают и записывают EXPLAIN QUERY PLAN"""
+        print("\n=== Тест 5: Планы медленных запросов ===")
+        
+        all_correct = True
+        
+        # Порог 0: каждое чтение SQL считается медленным
+        profiler = QueryProfiler(slow_query_seconds=0)
+        _, output = self.profile_reports(profiler)
+        
+        analyzer = EcommerceAnalyzer(self.db_name)
+        try:
+            plans = {name: analyzer.explain(name) for name in REPORT_TITLES}
+        finally:
+            analyzer.close()
+        
+        for entry in profiler.records:
+            if "query_hash" not in entry:
+                if entry["slow"] or "plan" in entry:
+                    print(f"❌ {entry['name']}: запись без запроса помечена медленной")
+                    all_correct = False
+                continue
+            
+            name = entry["name"]
+            if not entry["slow"] or entry.get("plan") != plans[name]:
+                print(f"❌ {name}: slow = {entry['slow']}, план {entry.get('plan')}")
+                all_correct = False
+            elif f"Slow query {name}:" not in output or any(f"   {detail}" not in output for detail in plans[name]):
+                print(f"❌ {name}: план не напечатан")
+                all_correct = False
+        
+        # Недостижимый порог: планы не записываются и не печатаются
+        profiler = QueryProfiler(slow_query_seconds=3600)
+        _, output = self.profile_reports(profiler)
+        if "Slow query" in output or any(entry["slow"] or "plan" in entry for entry in profiler.records):
+            print("❌ Быстрые запросы помечены медленными")
+            all_correct = False
+        
+        if all_correct:
+            print(f"✅ Планы {len(plans)} медленных запросов напечатаны и записаны")
+        return all_correct
+    
+    def run_all_tests(self):
+        """Запуск всех тестов профилировщика запросов"""
+        print(" Запуск тестов профилировщика запросов...\n")
+        
+        tests = [
+            self.test_trace_and_progress_hooks,
+            self.test_report_phases,
+            self.test_prometheus_text,
+            self.test_jsonl_log,
+            self.test_slow_query_plan
+        ]
+        
+        self.build_database()
+        try:
+            passed = sum(1 for test in tests if test())
+        finally:
+            self.tmp_dir.cleanup()
+        
+        print(f"\n Результаты тестов: {passed}/{len(tests)} пройдено")
+        return passed == len(tests)
+
+
+def main():
+    """Основная функция для запуска тестов"""
+    tester = ProfilerTester()
+    return 0 if tester.run_all_tests() else 1
+
+
+if __name__ == "__main__":
+    exit(main())
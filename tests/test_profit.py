@@ -0,0 +1,131 @@
+import contextlib
+import io
+import os
+import sys
+import tempfile
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from setup.analysis import PROFIT_KEYS, EcommerceAnalyzer
+from setup.fixtures import FixtureCache
+
+
+# Эталонный запрос: прибыль через JOIN с products в каждой строке
+REFERENCE_QUERY = """
+SELECT
+    {key},
+    COUNT(*) as transaction_count,
+    SUM(t.final_cost){money} as total_revenue,
+    SUM(p.production_cost){money} as total_cost,
+    SUM(t.final_cost - p.production_cost){money} as total_profit
+FROM transactions t
+JOIN users u ON u.user_id = t.user_id
+JOIN products p ON p.product_id = t.product_id
+{where}
+GROUP BY {group}
+"""
+
+# Колонки и группировка эталонного запроса для ключа каждого отчёта о прибыли
+REFERENCE_KEYS = {
+    "discount_tier": ("u.discount_tier", "u.discount_tier"),
+    "geo": ("u.geo", "u.geo"),
+    "product_id": ("p.name, p.tier", "p.product_id"),
+    "month": ("strftime('%Y-%m', t.transaction_date * 86400, 'unixepoch') as month", "month")
+}
+
+FILTER_SETS = [
+    ({}, ""),
+    ({"geos": ["USA", "DE"], "product_tiers": [2, 3]}, "WHERE u.geo IN ('USA', 'DE') AND p.tier IN (2, 3)")
+]
+
+
+class ProfitTester:
+    def __init__(self, num_transactions=50000):
+        self.num_transactions = num_transactions
+        self.tmp_dir = None
+        self.db_name = None
+    
+    def build_database(self, **schema_options):
+        """Создание временной базы данных (копия из кэша фикстур)"""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_name = os.path.join(self.tmp_dir.name, "profit.db")
+        FixtureCache().restore(self.db_name, 42, self.num_transactions, analytics_schema=True, **schema_options)
+    
+    def reference(self, analyzer, key, where):
+        """Отчёт о прибыли эталонным запросом с JOIN"""
+        money = " / 100.0" if analyzer.flags & 2 else ""
+        columns, group = REFERENCE_KEYS[key]
+        df = pd.read_sql_query(REFERENCE_QUERY.format(key=columns, group=group, money=money, where=where),
+                               analyzer.conn)
+        df["margin_pct"] = df["total_profit"] / df["total_revenue"] * 100
+        return df
+    
+    def test_matches_reference(self, label):
+        """Тест: Отчёты о прибыли совпадают с эталонным запросом с JOIN"""
+        print(f"\n=== Прибыль и маржа ({label}) ===")
+        all_correct = True
+        
+        for use_rollups in (False, True):
+            analyzer = EcommerceAnalyzer(self.db_name, use_rollups=use_rollups)
+            try:
+                for filters, where in FILTER_SETS:
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        reports = analyzer.analyze_profit(**filters)
+                    
+                    for name, key in PROFIT_KEYS.items():
+                        merge_on = ["name", "tier"] if key == "product_id" else [key]
+                        expected = self.reference(analyzer, key, where)
+                        actual = reports[name]
+                        merged = expected.merge(actual, on=merge_on, suffixes=("", "_actual"))
+                        
+                        source = "daily_rollup" if use_rollups else "transactions"
+                        if len(merged) != len(expected) or len(actual) != len(expected):
+                            print(f"❌ {name} ({source}, {filters}): группы не совпадают")
+                            all_correct = False
+                            continue
+                        
+                        for column in ("transaction_count", "total_revenue", "total_cost",
+                                       "total_profit", "margin_pct"):
+                            try:
+                                pd.testing.assert_series_equal(merged[f"{column}_actual"], merged[column],
+                                                               check_names=False, check_dtype=False, rtol=1e-9)
+                            except AssertionError:
+                                print(f"❌ {name} ({source}, {filters}): {column} отличается")
+                                all_correct = False
+            finally:
+                analyzer.close()
+        
+        if all_correct:
+            print(f"✅ {len(PROFIT_KEYS)} отчёта о прибыли совпадают с эталоном (transactions и daily_rollup)")
+        return all_correct
+    
+    def run_all_tests(self):
+        """Запуск тестов для REAL-схемы и схемы целых центов"""
+        print(" Запуск тестов отчётов о прибыли...\n")
+        
+        passed = 0
+        total = 0
+        
+        for label, schema_options in (("REAL", {}), ("целые центы", {"integer_cents": True})):
+            self.build_database(**schema_options)
+            try:
+                total += 1
+                if self.test_matches_reference(label):
+                    passed += 1
+            finally:
+                self.tmp_dir.cleanup()
+        
+        print(f"\n Результаты тестов: {passed}/{total} пройдено")
+        return passed == total
+
+
+def main():
+    """Основная функция для запуска тестов"""
+    tester = ProfitTester()
+    return 0 if tester.run_all_tests() else 1
+
+
+if __name__ == "__main__":
+    exit(main())
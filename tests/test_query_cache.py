@@ -0,0 +1,214 @@
+import contextlib
+import io
+import os
+import pickle
+import sqlite3
+import sys
+import tempfile
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from setup.analysis import REPORT_TITLES, EcommerceAnalyzer
+from setup.data_generators import DataGenerator
+from setup.fixtures import FixtureCache
+from setup.query_cache import QueryCache, change_token
+
+QUERY = "SELECT COUNT(*) as transaction_count FROM transactions WHERE user_id <= ?"
+
+
+class QueryCacheTester:
+    def __init__(self, num_transactions=20000):
+        self.num_transactions = num_transactions
+        self.tmp_dir = None
+        self.db_name = None
+    
+    def build_database(self):
+        """Создание временной базы данных (копия из кэша фикстур)"""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_name = os.path.join(self.tmp_dir.name, "cache.db")
+        FixtureCache().restore(self.db_name, 42, self.num_transactions, analytics_schema=True)
+    
+    def add_transactions(self, conn, count=1000):
+        """Дописать транзакции через соединение conn"""
+        total = conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+        with contextlib.redirect_stdout(io.StringIO()):
+            DataGenerator(conn).generate_transactions_vectorized(total + count, seed=42, resume=True)
+    
+    def test_hit_and_miss(self):
+        """Тест 1: Попадание при том же токене и промах после записи через любое соединение"""
+        print("\n=== Тест 1: Попадания и промахи ===")
+        
+        cache = QueryCache(max_entries=8)
+        key = QueryCache.make_key(QUERY, (100,))
+        reader = sqlite3.connect(self.db_name)
+        writer = sqlite3.connect(self.db_name)
+        all_correct = True
+        
+        try:
+            cache.put(key, change_token(reader), "result")
+            checks = [("тот же токен", cache.get(key, change_token(reader)) == "result")]
+            
+            # Запись через другое соединение видна по data_version и файлу базы
+            self.add_transactions(writer)
+            checks.append(("запись другим соединением", cache.get(key, change_token(reader)) is None))
+            
+            # Незафиксированная запись через то же соединение видна по total_changes
+            cache.put(key, change_token(reader), "result")
+            reader.execute("UPDATE products SET tier = tier WHERE product_id = 1")
+            checks.append(("незафиксированная запись", cache.get(key, change_token(reader)) is None))
+            reader.rollback()
+            
+            checks.append(("другие параметры", cache.get(QueryCache.make_key(QUERY, (101,)),
+                                                         change_token(reader)) is None))
+        finally:
+            reader.close()
+            writer.close()
+        
+        for label, correct in checks:
+            print(f"{'✅' if correct else '❌'} {label}")
+            all_correct &= correct
+        
+        stats = cache.stats()
+        if (stats["hits"], stats["misses"]) != (1, 3):
+            print(f"❌ Счётчики: {stats}")
+            all_correct = False
+        else:
+            print(f"✅ Счётчики: {stats['hits']} попадание, {stats['misses']} промаха")
+        
+        return all_correct
+    
+    def test_lru_eviction(self):
+        """Тест 2: При переполнении вытесняется давно не использованная запись"""
+        print("\n=== Тест 2: Вытеснение LRU ===")
+        
+        cache = QueryCache(max_entries=2)
+        conn = sqlite3.connect(self.db_name)
+        try:
+            token = change_token(conn)
+            keys = [QueryCache.make_key(QUERY, (user_id,)) for user_id in (1, 2, 3)]
+            
+            cache.put(keys[0], token, 0)
+            cache.put(keys[1], token, 1)
+            cache.get(keys[0], token)
+            cache.put(keys[2], token, 2)
+            
+            present = [cache.get(key, token) is not None for key in keys]
+        finally:
+            conn.close()
+        
+        if present != [True, False, True] or cache.stats()["entries"] != 2:
+            print(f"❌ В кэше остались записи {present}")
+            return False
+        
+        print("✅ Вытеснена запись, к которой дольше всего не обращались")
+        return True
+    
+    def test_disk_round_trip(self):
+        """Тест 3: Записи на диске переживают процесс и соединение и сбрасываются после изменений"""
+        print("\n=== Тест 3: Кэш на диске ===")
+        
+        cache_dir = os.path.join(self.tmp_dir.name, "query_cache")
+        key = QueryCache.make_key(QUERY, (100,))
+        all_correct = True
+        
+        conn = sqlite3.connect(self.db_name)
+        try:
+            QueryCache(cache_dir=cache_dir).put(key, change_token(conn), "result")
+        finally:
+            conn.close()
+        
+        # На диске хранится только постоянная часть токена, без идентичности соединения
+        with open(os.path.join(cache_dir, f"{key}.pkl"), "rb") as f:
+            persistent, value = pickle.load(f)
+        conn = sqlite3.connect(self.db_name)
+        try:
+            if persistent != change_token(conn)[1] or value != "result":
+                print(f"❌ На диске сохранено {persistent!r}")
+                all_correct = False
+            else:
+                print("✅ На диске сохранена только постоянная часть токена")
+            
+            # Новый кэш в том же каталоге с новым соединением
+            cache = QueryCache(cache_dir=cache_dir)
+            if cache.get(key, change_token(conn)) != "result" or cache.stats()["disk_hits"] != 1:
+                print(f"❌ Запись с диска не прочитана: {cache.stats()}")
+                all_correct = False
+            else:
+                print("✅ Запись прочитана с диска новым кэшем и соединением")
+            
+            self.add_transactions(conn)
+            cache = QueryCache(cache_dir=cache_dir)
+            if cache.get(key, change_token(conn)) is not None:
+                print("❌ Запись с диска использована после изменения базы")
+                all_correct = False
+            else:
+                print("✅ Запись с диска сброшена после изменения базы")
+        finally:
+            conn.close()
+        
+        return all_correct
+    
+    def test_analyzer_cache(self):
+        """Тест 4: Отчёты из кэша совпадают с отчётами без кэша и обновляются после записи"""
+        print("\n=== Тест 4: Кэш в EcommerceAnalyzer ===")
+        
+        cached = EcommerceAnalyzer(self.db_name, cache_size=32)
+        plain = EcommerceAnalyzer(self.db_name)
+        all_correct = True
+        
+        try:
+            for attempt in ("первый запуск", "повтор", "после записи"):
+                if attempt == "после записи":
+                    self.add_transactions(plain.conn)
+                for name in REPORT_TITLES:
+                    try:
+                        pd.testing.assert_frame_equal(cached._report(name), plain._report(name))
+                    except AssertionError as e:
+                        print(f"❌ {name} ({attempt}): {e}")
+                        all_correct = False
+            
+            stats = cached.cache_stats()
+        finally:
+            cached.close()
+            plain.close()
+        
+        # Попадания только при повторе: после записи все отчёты пересчитываются
+        if stats["hits"] != len(REPORT_TITLES) or stats["misses"] != 2 * len(REPORT_TITLES):
+            print(f"❌ Счётчики кэша: {stats}")
+            return False
+        
+        if all_correct:
+            print(f"✅ Отчёты совпадают, {stats['hits']} попаданий и {stats['misses']} промахов")
+        return all_correct
+    
+    def run_all_tests(self):
+        """Запуск всех тестов кэша запросов"""
+        print(" Запуск тестов кэша запросов...\n")
+        
+        tests = [
+            self.test_hit_and_miss,
+            self.test_lru_eviction,
+            self.test_disk_round_trip,
+            self.test_analyzer_cache
+        ]
+        
+        self.build_database()
+        try:
+            passed = sum(1 for test in tests if test())
+        finally:
+            self.tmp_dir.cleanup()
+        
+        print(f"\n Результаты тестов: {passed}/{len(tests)} пройдено")
+        return passed == len(tests)
+
+
+def main():
+    """Основная функция для запуска тестов"""
+    tester = QueryCacheTester()
+    return 0 if tester.run_all_tests() else 1
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,315 @@
+import contextlib
+import io
+import os
+import sqlite3
+import sys
+import tempfile
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from setup.analysis import REPORT_TITLES, EcommerceAnalyzer, reports_from_cube
+from setup.columnar_store import ColumnarStore
+from setup.database import drop_partitions, transaction_partitions
+from setup.fixtures import FixtureCache
+from setup.queries import QUERIES, cube_query, profit_cube_query, report_query, series_query
+from setup.streaming import TRANSACTION_COLUMNS, StreamingAggregator
+from test_database import DatabaseTester
+
+
+class QueryPlanTester:
+    def __init__(self, num_transactions=20000):
+        self.num_transactions = num_transactions
+        self.tmp_dir = None
+        self.db_name = None
+    
+    def build_database(self, **schema_options):
+        """Создание временной базы данных в режиме analytics schema (копия из кэша фикстур)"""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_name = os.path.join(self.tmp_dir.name, "analytics.db")
+        
+        FixtureCache().restore(self.db_name, 42, self.num_transactions,
+                               analytics_schema=True, **schema_options)
+    
+    def test_schema_compatible(self):
+        """Тест 1: Схема analytics проходит проверки test_database.py"""
+        print("\n=== Тест 1: Совместимость схемы ===")
+        
+        tester = DatabaseTester(self.db_name)
+        try:
+            if not tester.connect_to_database():
+                return False
+            return (tester.test_tables_exist() and tester.test_table_schemas()
+                    and tester.test_foreign_keys() and tester.test_data_types())
+        finally:
+            tester.cleanup()
+    
+    def test_queries_use_indexes(self):
+        """Тест 2: Все запросы EcommerceAnalyzer используют индексы"""
+        print("\n=== Тест 2: Планы запросов ===")
+        
+        analyzer = EcommerceAnalyzer(self.db_name)
+        all_correct = True
+        
+        try:
+            for query_name in QUERIES:
+                plan = analyzer.explain(query_name)
+                
+                # Полный проход по transactions без индекса недопустим
+                full_scans = [
+                    detail for detail in plan
+                    if detail.startswith("SCAN") and detail.split()[1] in ("t", "transactions")
+                    and "INDEX" not in detail
+                ]
+                
+                if full_scans:
+                    print(f"❌ {query_name}: полный проход таблицы")
+                    for detail in plan:
+                        print(f"   {detail}")
+                    all_correct = False
+                else:
+                    print(f"✅ {query_name}: {'; '.join(plan)}")
+        finally:
+            analyzer.close()
+        
+        return all_correct
+    
+    def test_integer_cents_reports(self):
+        """Тест 3: Отчёты по целым центам совпадают с отчётами по REAL-схеме"""
+        print("\n=== Тест 3: Режим целых центов ===")
+        
+        all_correct = True
+        with FixtureCache().temp_copy(42, self.num_transactions, analytics_schema=True) as legacy_db:
+            expected = EcommerceAnalyzer(legacy_db)
+            try:
+                expected_reports = {name: expected._report(name) for name in REPORT_TITLES}
+            finally:
+                expected.close()
+        
+        conn = sqlite3.connect(self.db_name)
+        try:
+            aggregator = StreamingAggregator.from_database(conn)
+            aggregator.add_batch(conn.execute(f"SELECT {', '.join(TRANSACTION_COLUMNS)} FROM transactions").fetchall())
+        finally:
+            conn.close()
+        store = ColumnarStore.from_database(self.db_name)
+        
+        sources = {
+            "SQL": lambda analyzer: {name: analyzer._report(name) for name in REPORT_TITLES},
+            "куб": lambda analyzer: reports_from_cube(analyzer._fetch_cube(), analyzer._fetch_products()),
+            "ColumnarStore": lambda analyzer: reports_from_cube(store.fetch_cube(), store.fetch_products()),
+            "StreamingAggregator": lambda analyzer: aggregator.reports()
+        }
+        
+        for use_rollups in (False, True):
+            analyzer = EcommerceAnalyzer(self.db_name, use_rollups=use_rollups)
+            try:
+                for source, compute in sources.items():
+                    if use_rollups and source != "куб":
+                        continue
+                    label = f"{source} (daily_rollup)" if use_rollups else source
+                    reports = compute(analyzer)
+                    
+                    for name, df in expected_reports.items():
+                        try:
+                            pd.testing.assert_frame_equal(reports[name], df, check_dtype=False, rtol=1e-9)
+                        except AssertionError as e:
+                            print(f"❌ {label}, {name}: {e}")
+                            all_correct = False
+                    if all_correct:
+                        print(f"✅ {label}: отчёты совпадают")
+            finally:
+                analyzer.close()
+        
+        return all_correct
+    
+    def test_partition_pruning(self):
+        """Тест 4: Секционированная схема читает только нужные месяцы и совпадает с обычной"""
+        print("\n=== Тест 4: Помесячные секции ===")
+        
+        conn = sqlite3.connect(self.db_name)
+        try:
+            partitions = transaction_partitions(conn)
+        finally:
+            conn.close()
+        
+        # Окно из двух последних месяцев
+        window_start = partitions[-2][0].replace("transactions_", "").replace("_", "-") + "-01"
+        recent = {"start_date": window_start}
+        all_correct = True
+        
+        with FixtureCache().temp_copy(42, self.num_transactions, analytics_schema=True) as legacy_db:
+            expected = EcommerceAnalyzer(legacy_db)
+            analyzer = EcommerceAnalyzer(self.db_name)
+            try:
+                for filters in ({}, recent):
+                    for name in REPORT_TITLES:
+                        try:
+                            pd.testing.assert_frame_equal(analyzer._report(name, filters),
+                                                          expected._report(name, filters))
+                        except AssertionError as e:
+                            print(f"❌ {name} {filters}: {e}")
+                            all_correct = False
+                
+                for query_name in QUERIES:
+                    plan = " ".join(analyzer.explain(query_name, **recent))
+                    read = [name for name, _, _ in partitions if name in plan]
+                    if read != [name for name, _, _ in partitions[-2:]]:
+                        print(f"❌ {query_name}: прочитаны секции {read}")
+                        all_correct = False
+                
+                # Удаление старых секций не меняет отчёты по оставшемуся окну
+                dropped = drop_partitions(analyzer.conn, window_start)
+                if len(dropped) != len(partitions) - 2:
+                    print(f"❌ Удалено секций: {len(dropped)} из {len(partitions) - 2}")
+                    all_correct = False
+                
+                count = analyzer.conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+                expected_count = expected._report("discount_effectiveness", recent)["transaction_count"].sum()
+                if count != expected_count:
+                    print(f"❌ После удаления секций осталось {count} транзакций, ожидалось {expected_count}")
+                    all_correct = False
+                
+                for name in REPORT_TITLES:
+                    try:
+                        pd.testing.assert_frame_equal(analyzer._report(name), expected._report(name, recent))
+                    except AssertionError as e:
+                        print(f"❌ {name} после удаления секций: {e}")
+                        all_correct = False
+            finally:
+                analyzer.close()
+                expected.close()
+        
+        if all_correct:
+            print(f"✅ {len(partitions)} секций, окно читает 2, удаление старых секций корректно")
+        return all_correct
+    
+    def test_partitioned_not_materialized(self):
+        """Тест 5: Отчёты по секциям группируют каждую секцию, а не материализуют UNION ALL"""
+        print("\n=== Тест 5: Планы отчётов по секциям ===")
+        
+        analyzer = EcommerceAnalyzer(self.db_name)
+        partitions = analyzer._partitions()
+        window_start = partitions[-2][0].replace("transactions_", "").replace("_", "-") + "-01"
+        all_correct = True
+        
+        try:
+            for filters in ({}, {"start_date": window_start}, {"geos": ["USA"], "product_tiers": [1]}):
+                queries = {name: report_query(name, filters, analyzer.flags, partitions) for name in QUERIES}
+                queries["cube"] = cube_query(filters, analyzer.flags, partitions=partitions)
+                queries["profit_cube"] = profit_cube_query(filters, analyzer.flags, partitions=partitions)
+                queries["revenue_series"] = series_query("weekly", filters, analyzer.flags, partitions=partitions)
+                
+                for name, (query, params) in queries.items():
+                    plan = [row[3] for row in analyzer.conn.execute("EXPLAIN QUERY PLAN " + query, params)]
+                    materialized = [detail for detail in plan if detail.startswith("MATERIALIZE")]
+                    if materialized:
+                        print(f"❌ {name} {filters or ''}: {'; '.join(materialized)}")
+                        all_correct = False
+        finally:
+            analyzer.close()
+        
+        if all_correct:
+            print(f"✅ {len(queries)} запросов на 3 наборах фильтров без MATERIALIZE")
+        return all_correct
+    
+    def test_fused_reports(self):
+        """Тест 6: Объединённый отчёт совпадает с четырьмя отдельными и читает transactions без индекса"""
+        print("\n=== Тест 6: Объединённый отчёт (куб) ===")
+        
+        all_correct = True
+        schemas = {
+            "обычная": {},
+            "analytics": {"analytics_schema": True},
+            "целые центы": {"analytics_schema": True, "integer_cents": True},
+            "секции": {"analytics_schema": True, "partitioned": True}
+        }
+        
+        for label, schema_options in schemas.items():
+            with FixtureCache().temp_copy(42, self.num_transactions, **schema_options) as db_name:
+                analyzer = EcommerceAnalyzer(db_name)
+                try:
+                    for filters in ({}, {"geos": ["USA", "Europe"], "discount_tiers": [1, 2]}):
+                        # Индекс по (user_id, ...) не покрывает куб: поиск по нему на каждого пользователя
+                        # медленнее четырёх отдельных запросов, поэтому transactions (и секции) читаются целиком
+                        query, params = cube_query(filters, analyzer.flags, partitions=analyzer._partitions())
+                        plan = [row[3] for row in analyzer.conn.execute("EXPLAIN QUERY PLAN " + query, params)]
+                        indexed = [
+                            detail for detail in plan
+                            if detail.split()[0] in ("SCAN", "SEARCH") and "INDEX" in detail
+                            and (detail.split()[1] == "t" or detail.split()[1].startswith("transactions"))
+                        ]
+                        indexed += [detail for detail in plan if detail.startswith("MATERIALIZE")]
+                        if indexed:
+                            print(f"❌ {label} {filters or ''}: куб читает {'; '.join(indexed)}")
+                            all_correct = False
+                        
+                        with contextlib.redirect_stdout(io.StringIO()):
+                            expected = analyzer.run_all_analyses(**filters)
+                            results = {
+                                "run_all_analyses(fused=True)": analyzer.run_all_analyses(fused=True, **filters),
+                                "analyze_all_fused": analyzer.analyze_all_fused(**filters)
+                            }
+                        for method, reports in results.items():
+                            for name, df in expected.items():
+                                try:
+                                    pd.testing.assert_frame_equal(reports[name], df, check_dtype=False, rtol=1e-9)
+                                except AssertionError as e:
+                                    print(f"❌ {label}, {method}, {name} {filters or ''}: {e}")
+                                    all_correct = False
+                finally:
+                    analyzer.close()
+        
+        if all_correct:
+            print(f"✅ {len(schemas)} схемы: куб читает transactions без индекса, отчёты совпадают")
+        return all_correct
+    
+    def run_all_tests(self):
+        """Запуск всех тестов для обычной и STRICT/WITHOUT ROWID схем"""
+        print(" Запуск тестов планов запросов...\n")
+        
+        passed = 0
+        total = 0
+        
+        for schema_options in ({}, {"strict": True, "without_rowid": True}, {"integer_cents": True},
+                               {"partitioned": True}):
+            self.build_database(**schema_options)
+            
+            try:
+                # Полный проход секционированной схемы читает каждую секцию целиком
+                if schema_options.get("partitioned"):
+                    tests = [self.test_partition_pruning, self.test_partitioned_not_materialized]
+                else:
+                    tests = [self.test_queries_use_indexes]
+                # Проверка типов ожидает DATE, а STRICT-таблицы его не допускают
+                if not schema_options.get("strict"):
+                    tests.insert(0, self.test_schema_compatible)
+                if schema_options.get("integer_cents"):
+                    tests.append(self.test_integer_cents_reports)
+                
+                for test in tests:
+                    total += 1
+                    if test():
+                        passed += 1
+            finally:
+                self.tmp_dir.cleanup()
+        
+        # Объединённый отчёт сравнивается на всех схемах сразу, в том числе без индексов analytics
+        total += 1
+        if self.test_fused_reports():
+            passed += 1
+        
+        print(f"\n Результаты тестов: {passed}/{total} пройдено")
+        return passed == total
+
+
+def main():
+    """Основная функция для запуска тестов"""
+    tester = QueryPlanTester()
+    return 0 if tester.run_all_tests() else 1
+
+
+if __name__ == "__main__":
+    exit(main())
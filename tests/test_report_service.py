@@ -0,0 +1,250 @@
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from setup.analysis import REPORT_TITLES, EcommerceAnalyzer
+from setup.data_generators import DataGenerator
+from setup.fixtures import FixtureCache
+from setup.report_service import ReportService, enable_wal
+from helpers import sort_report
+
+
+async def http_get(port, target):
+    """GET-запрос к сервису; возвращает (статус, заголовки, тело)"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    
+    head, body = response.split(b"\r\n\r\n", 1)
+    status_line, *header_lines = head.decode("latin-1").split("\r\n")
+    headers = dict(line.split(": ", 1) for line in header_lines)
+    
+    # Разбор chunked-ответа: длина в hex, данные, пустой фрагмент в конце
+    if headers.get("Transfer-Encoding") == "chunked":
+        data = b""
+        while True:
+            size, rest = body.split(b"\r\n", 1)
+            size = int(size, 16)
+            if size == 0:
+                break
+            data += rest[:size]
+            body = rest[size + 2:]
+        body = data
+    return int(status_line.split()[1]), headers, body
+
+
+async def serve_requests(analyzer, targets):
+    """Поднять сервис на свободном порту и выполнить запросы по очереди"""
+    service = ReportService(analyzer)
+    server = await asyncio.start_server(service.handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            return [await http_get(port, target) for target in targets]
+    finally:
+        server.close()
+        await server.wait_closed()
+
+
+class ReportServiceTester:
+    def __init__(self, num_transactions=20000):
+        self.num_transactions = num_transactions
+        self.tmp_dir = None
+        self.db_name = None
+    
+    def build_database(self):
+        """Создание временной базы данных (копия из кэша фикстур)"""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_name = os.path.join(self.tmp_dir.name, "service.db")
+        FixtureCache().restore(self.db_name, 42, self.num_transactions, analytics_schema=True)
+    
+    def add_transactions(self, count=5000):
+        """Дописать транзакции отдельным соединением, как это сделал бы загрузчик"""
+        conn = sqlite3.connect(self.db_name)
+        try:
+            total = conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+            with contextlib.redirect_stdout(io.StringIO()):
+                DataGenerator(conn).generate_transactions_vectorized(total + count, seed=42, resume=True)
+        finally:
+            conn.close()
+        return total + count
+    
+    def test_report_async_refreshes(self):
+        """Тест 1: report_async видит транзакции, добавленные после запуска"""
+        print("\n=== Тест 1: Обновление свёрток и выборки в report_async ===")
+        
+        rollups = EcommerceAnalyzer(self.db_name, use_rollups=True, pool_size=2)
+        approximate = EcommerceAnalyzer(self.db_name, approximate=True, pool_size=2)
+        all_correct = True
+        
+        try:
+            asyncio.run(rollups.run_all_async())
+            asyncio.run(approximate.run_all_async())
+            total = self.add_transactions()
+            
+            exact = EcommerceAnalyzer(self.db_name)
+            try:
+                for name in REPORT_TITLES:
+                    expected = sort_report(exact._report(name))
+                    actual = sort_report(asyncio.run(rollups.report_async(name)))
+                    try:
+                        pd.testing.assert_frame_equal(actual, expected, check_dtype=False, rtol=1e-9)
+                        print(f"✅ {name}: совпадает с точным отчётом после добавления строк")
+                    except AssertionError as e:
+                        print(f"❌ {name}: {e}")
+                        all_correct = False
+            finally:
+                exact.close()
+            
+            asyncio.run(approximate.report_async("geo_performance"))
+            watermark = approximate.conn.execute("SELECT last_transaction_id FROM approx_state").fetchone()[0]
+            if watermark != total:
+                print(f"❌ Выборка обновлена до transaction_id {watermark} вместо {total}")
+                all_correct = False
+            else:
+                print(f"✅ Выборка обновлена до transaction_id {watermark}")
+            
+            # Обновление идёт на потоке исполнителя, а не на потоке цикла событий
+            refresh_threads = []
+            refresh = rollups._refresh_maintained
+            rollups._refresh_maintained = lambda: refresh_threads.append(threading.get_ident()) or refresh()
+            
+            async def report_on_loop():
+                return threading.get_ident(), await rollups.report_async("geo_performance")
+            
+            loop_thread, _ = asyncio.run(report_on_loop())
+            if not refresh_threads or loop_thread in refresh_threads:
+                print("❌ report_async обновляет свёртки на потоке цикла событий")
+                all_correct = False
+            else:
+                print("✅ Свёртки обновляются в исполнителе")
+        finally:
+            rollups.close()
+            approximate.close()
+        
+        return all_correct
+    
+    def test_stream_chunk_size(self):
+        """Тест 2: Потоковый ответ совпадает с обычным, chunk_size < 1 отклоняется с 400"""
+        print("\n=== Тест 2: Потоковые ответы и chunk_size ===")
+        
+        analyzer = EcommerceAnalyzer(self.db_name, pool_size=2)
+        try:
+            plain, stream, zero, negative = asyncio.run(serve_requests(analyzer, [
+                "/reports/geo_performance",
+                "/reports/geo_performance?stream=1&chunk_size=2",
+                "/reports/geo_performance?stream=1&chunk_size=0",
+                "/reports/geo_performance?chunk_size=-5"
+            ]))
+        finally:
+            analyzer.close()
+        
+        all_correct = True
+        rows = [json.loads(line) for line in stream[2].decode().splitlines()]
+        if plain[0] != 200 or stream[0] != 200 or rows != json.loads(plain[2])["rows"]:
+            print(f"❌ Потоковый ответ {stream[0]} не совпадает с обычным {plain[0]}")
+            all_correct = False
+        else:
+            print(f"✅ {len(rows)} строк по 2 в фрагменте совпадают с обычным ответом")
+        
+        for label, (status, headers, body) in (("chunk_size=0", zero), ("chunk_size=-5", negative)):
+            if status != 400 or "Transfer-Encoding" in headers:
+                print(f"❌ {label}: статус {status}, заголовки {headers}")
+                all_correct = False
+            else:
+                print(f"✅ {label}: 400 {json.loads(body)['error']}")
+        
+        return all_correct
+    
+    def test_service_sees_new_rows(self):
+        """Тест 3: Сервис со свёртками отвечает с учётом транзакций, добавленных после запуска"""
+        print("\n=== Тест 3: Свежие данные в ответах сервиса ===")
+        
+        analyzer = EcommerceAnalyzer(self.db_name, use_rollups=True, pool_size=2, cache_size=16)
+        try:
+            analyzer.refresh_rollups()
+            (before,) = asyncio.run(serve_requests(analyzer, ["/reports/geo_performance"]))
+            self.add_transactions()
+            (after,) = asyncio.run(serve_requests(analyzer, ["/reports/geo_performance"]))
+        finally:
+            analyzer.close()
+        
+        exact = EcommerceAnalyzer(self.db_name)
+        try:
+            expected = int(exact._report("geo_performance")["transaction_count"].sum())
+        finally:
+            exact.close()
+        
+        counts = [sum(row["transaction_count"] for row in json.loads(response[2])["rows"])
+                  for response in (before, after)]
+        if counts[1] != expected:
+            print(f"❌ Транзакций в отчёте: {counts[0]} до и {counts[1]} после добавления, ожидается {expected}")
+            return False
+        
+        print(f"✅ Транзакций в отчёте: {counts[0]} до и {counts[1]} после добавления")
+        return True
+    
+    def test_enable_wal(self):
+        """Тест 4: enable_wal переводит базу данных с журналом отката в режим WAL"""
+        print("\n=== Тест 4: Режим WAL при запуске сервиса ===")
+        
+        conn = sqlite3.connect(self.db_name)
+        try:
+            conn.execute("PRAGMA journal_mode=DELETE").fetchone()
+        finally:
+            conn.close()
+        
+        with contextlib.redirect_stdout(io.StringIO()):
+            enable_wal(self.db_name)
+        
+        conn = sqlite3.connect(self.db_name)
+        try:
+            journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        finally:
+            conn.close()
+        
+        if journal_mode != "wal":
+            print(f"❌ journal_mode = {journal_mode}")
+            return False
+        
+        print("✅ journal_mode = wal")
+        return True
+    
+    def run_all_tests(self):
+        """Запуск всех тестов асинхронных отчётов"""
+        print(" Запуск тестов асинхронных отчётов...\n")
+        
+        tests = [self.test_report_async_refreshes, self.test_stream_chunk_size, self.test_service_sees_new_rows,
+                 self.test_enable_wal]
+        
+        self.build_database()
+        try:
+            passed = sum(1 for test in tests if test())
+        finally:
+            self.tmp_dir.cleanup()
+        
+        print(f"\n Результаты тестов: {passed}/{len(tests)} пройдено")
+        return passed == len(tests)
+
+
+def main():
+    """Основная функция для запуска тестов"""
+    tester = ReportServiceTester()
+    return 0 if tester.run_all_tests() else 1
+
+
+if __name__ == "__main__":
+    exit(main())
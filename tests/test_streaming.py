@@ -0,0 +1,137 @@
+import os
+import sqlite3
+import sys
+import tempfile
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from setup.analysis import REPORT_TITLES
+from setup.fixtures import FixtureCache
+from setup.streaming import TRANSACTION_COLUMNS, StreamingAggregator
+
+
+class StreamingTester:
+    def __init__(self, num_transactions=20000):
+        self.num_transactions = num_transactions
+        self.tmp_dir = None
+        self.db_name = None
+    
+    def build_database(self):
+        """Создание временной базы данных (копия из кэша фикстур)"""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_name = os.path.join(self.tmp_dir.name, "streaming.db")
+        FixtureCache().restore(self.db_name, 42, self.num_transactions, analytics_schema=True)
+    
+    def transactions(self, conn, limit):
+        """Первые limit транзакций как кортежи в порядке TRANSACTION_COLUMNS"""
+        return conn.execute(f"SELECT {', '.join(TRANSACTION_COLUMNS)} FROM transactions "
+                            f"ORDER BY transaction_id LIMIT ?", (limit,)).fetchall()
+    
+    def test_unknown_ids_rejected(self):
+        """Тест 1: Отрицательные и неизвестные id отклоняются и не меняют агрегаты"""
+        print("\n=== Тест 1: Неизвестные товары и пользователи ===")
+        
+        conn = sqlite3.connect(self.db_name)
+        try:
+            aggregator = StreamingAggregator.from_database(conn)
+            row = self.transactions(conn, 1)[0]
+        finally:
+            conn.close()
+        
+        # (transaction_id, product_id, user_id, ...): -1 раньше читал последнюю запись таблицы
+        bad_rows = {
+            "отрицательный user_id": row[:2] + (-1,) + row[3:],
+            "отрицательный product_id": row[:1] + (-1,) + row[2:],
+            "неизвестный user_id": row[:2] + (10 ** 9,) + row[3:]
+        }
+        all_correct = True
+        
+        for label, bad_row in bad_rows.items():
+            for method, argument in (("add", bad_row), ("add_batch", [row, bad_row])):
+                try:
+                    getattr(aggregator, method)(argument)
+                    print(f"❌ {method}, {label}: строка принята")
+                    all_correct = False
+                except KeyError:
+                    pass
+        
+        if aggregator.events or aggregator.count.any():
+            print(f"❌ После отклонённых строк учтено {aggregator.events} событий")
+            all_correct = False
+        elif all_correct:
+            print(f"✅ {len(bad_rows)} видов неверных строк отклонены в add и add_batch")
+        return all_correct
+    
+    def test_snapshot_round_trip(self):
+        """Тест 2: Снимок восстанавливается с теми же отчётами"""
+        print("\n=== Тест 2: Снимок и восстановление ===")
+        
+        conn = sqlite3.connect(self.db_name)
+        try:
+            aggregator = StreamingAggregator.from_database(conn)
+            aggregator.consume_batches([self.transactions(conn, self.num_transactions)], snapshot_conn=conn)
+            restored = StreamingAggregator.from_snapshot(conn)
+        finally:
+            conn.close()
+        
+        expected = aggregator.reports()
+        actual = restored.reports()
+        all_correct = restored.events == aggregator.events
+        
+        for name in REPORT_TITLES:
+            try:
+                pd.testing.assert_frame_equal(actual[name], expected[name], rtol=1e-12)
+            except AssertionError as e:
+                print(f"❌ {name}: {e}")
+                all_correct = False
+        
+        if all_correct:
+            print(f"✅ {restored.events} событий, отчёты совпадают")
+        return all_correct
+    
+    def test_snapshot_unknown_geo(self):
+        """Тест 3: Снимок с регионом, которого нет среди пользователей, не восстанавливается"""
+        print("\n=== Тест 3: Снимок с неизвестным регионом ===")
+        
+        conn = sqlite3.connect(self.db_name)
+        try:
+            # Снимок записан тестом 2. Регион между существующими: searchsorted раньше отдавал его ячейки соседу
+            conn.execute("UPDATE stream_cube SET geo = 'DD' WHERE rowid = (SELECT MIN(rowid) FROM stream_cube)")
+            conn.commit()
+            try:
+                StreamingAggregator.from_snapshot(conn)
+            except KeyError as e:
+                print(f"✅ Снимок отклонён: {e}")
+                return True
+        finally:
+            conn.close()
+        
+        print("❌ Снимок с неизвестным регионом восстановлен")
+        return False
+    
+    def run_all_tests(self):
+        """Запуск всех тестов потоковой агрегации"""
+        print(" Запуск тестов потоковой агрегации...\n")
+        
+        tests = [self.test_unknown_ids_rejected, self.test_snapshot_round_trip, self.test_snapshot_unknown_geo]
+        
+        self.build_database()
+        try:
+            passed = sum(1 for test in tests if test())
+        finally:
+            self.tmp_dir.cleanup()
+        
+        print(f"\n Результаты тестов: {passed}/{len(tests)} пройдено")
+        return passed == len(tests)
+
+
+def main():
+    """Основная функция для запуска тестов"""
+    tester = StreamingTester()
+    return 0 if tester.run_all_tests() else 1
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,126 @@
+import contextlib
+import io
+import os
+import sqlite3
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from setup.fixtures import FixtureCache
+from setup.validation import CHECKS, TransactionValidator
+
+
+# Испорченные транзакции и проверки, которые должны их найти.
+# Деньги в долларах и скидки в процентах; для схемы в целых центах умножаются на 100
+CORRUPTIONS = [
+    (10, "final_cost = final_cost + {one}", ("final_cost",)),
+    (20, "product_id = 999", ("product_fk",)),
+    (30, "user_id = 999999", ("user_fk",)),
+    (40, "initial_cost = initial_cost + {one}", ("initial_cost", "final_cost")),
+    (50, "applied_discount = 90 * {one}", ("discount_margin", "final_cost")),
+    (60, "transaction_date = {future}", ("date_bounds",)),
+    (70, "transaction_date = {invalid}", ("date_bounds",))
+]
+
+
+class ValidationTester:
+    def __init__(self, num_transactions=20000):
+        self.num_transactions = num_transactions
+        self.tmp_dir = None
+        self.db_name = None
+    
+    def build_database(self, **schema_options):
+        """Создание временной базы данных (копия из кэша фикстур)"""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_name = os.path.join(self.tmp_dir.name, "validation.db")
+        FixtureCache().restore(self.db_name, 42, self.num_transactions, **schema_options)
+    
+    def validate(self):
+        """Проверка базы небольшими порциями, чтобы задействовать чтение по частям"""
+        validator = TransactionValidator(self.db_name, chunk_size=3000, sample_size=5)
+        with contextlib.redirect_stdout(io.StringIO()):
+            return validator.validate()
+    
+    def test_clean_database(self):
+        """Тест 1: Сгенерированные данные проходят все проверки"""
+        print("\n=== Тест 1: Корректные данные ===")
+        
+        result = self.validate()
+        violations = {name: count for name, count in result["violations"].items() if count}
+        
+        if result["rows"] != self.num_transactions:
+            print(f"❌ Проверено {result['rows']} строк из {self.num_transactions}")
+            return False
+        if violations:
+            print(f"❌ Найдены нарушения: {violations}")
+            return False
+        
+        print(f"✅ {result['rows']} транзакций без нарушений")
+        return True
+    
+    def test_corrupted_rows(self):
+        """Тест 2: Каждая испорченная транзакция найдена своей проверкой"""
+        print("\n=== Тест 2: Испорченные данные ===")
+        
+        conn = sqlite3.connect(self.db_name)
+        try:
+            flags = conn.execute("PRAGMA user_version").fetchone()[0]
+            one = 100 if flags & 2 else 1
+            future = 73049 if flags & 1 else "'2170-01-01'"
+            invalid = 10 ** 9 if flags & 1 else "'2026-02-30'"
+            for transaction_id, assignment, _ in CORRUPTIONS:
+                conn.execute(f"UPDATE transactions SET {assignment.format(one=one, future=future, invalid=invalid)} "
+                             f"WHERE transaction_id = ?", (transaction_id,))
+            conn.commit()
+        finally:
+            conn.close()
+        
+        expected = {name: [] for name in CHECKS}
+        for transaction_id, _, checks in CORRUPTIONS:
+            for name in checks:
+                expected[name].append(transaction_id)
+        
+        result = self.validate()
+        all_correct = True
+        
+        for name in CHECKS:
+            if result["violations"][name] != len(expected[name]) or result["samples"][name] != expected[name]:
+                print(f"❌ {name}: найдено {result['violations'][name]} {result['samples'][name]}, "
+                      f"ожидалось {expected[name]}")
+                all_correct = False
+            else:
+                print(f"✅ {name}: {expected[name]}")
+        
+        return all_correct
+    
+    def run_all_tests(self):
+        """Запуск всех тестов для схемы с REAL и текстовыми датами и для схемы в целых центах"""
+        print(" Запуск тестов проверки данных...\n")
+        
+        passed = 0
+        total = 0
+        
+        for schema_options in ({}, {"analytics_schema": True, "integer_cents": True}):
+            self.build_database(**schema_options)
+            
+            try:
+                for test in (self.test_clean_database, self.test_corrupted_rows):
+                    total += 1
+                    if test():
+                        passed += 1
+            finally:
+                self.tmp_dir.cleanup()
+        
+        print(f"\n Результаты тестов: {passed}/{total} пройдено")
+        return passed == total
+
+
+def main():
+    """Основная функция для запуска тестов"""
+    tester = ValidationTester()
+    return 0 if tester.run_all_tests() else 1
+
+
+if __name__ == "__main__":
+    exit(main())